@@ -0,0 +1,201 @@
+# anfis_inference.py
+"""
+NumPy-only inference for the trained ANFIS scaffold-level model.
+
+model.py exports the trained parameters (Gaussian membership centers/widths,
+rule consequents, MinMaxScaler min/scale and OrdinalEncoder categories) into
+plain arrays. This module serves predictions from those arrays without
+importing torch, sklearn or xanfis.
+
+An artifact may also carry a shallow decision tree distilled from the ANFIS
+outputs (model.py --distill); TreeInference answers from it with a few
+comparisons per row, over the same scaled/encoded features.
+"""
+import numpy as np
+
+
+INFERENCE_ARRAY_KEYS = (
+    "centers",        # (num_rules, input_dim) Gaussian membership centers
+    "widths",         # (num_rules, input_dim) Gaussian membership widths
+    "coeffs",         # (num_rules, input_dim + 1, output_dim) rule consequents, bias last
+    "scaler_min",     # (n_numerical,) MinMaxScaler.min_
+    "scaler_scale",   # (n_numerical,) MinMaxScaler.scale_
+    "categories",     # (n_categories,) OrdinalEncoder.categories_[0]
+)
+
+# Optional distilled surrogate, in sklearn tree_ layout (children -1 at leaves)
+SURROGATE_ARRAY_KEYS = (
+    "tree_feature",   # (n_nodes,) feature index tested at each split node
+    "tree_threshold", # (n_nodes,) go left when feature <= threshold
+    "tree_left",      # (n_nodes,) left child index, -1 at leaves
+    "tree_right",     # (n_nodes,) right child index, -1 at leaves
+    "tree_class",     # (n_nodes,) class predicted at each leaf
+)
+
+PREDICTORS = ("anfis", "surrogate")
+
+
+class ArrayMinMaxScaler:
+    """Drop-in for a fitted sklearn MinMaxScaler's transform()."""
+
+    def __init__(self, min_, scale_):
+        self.min_ = np.asarray(min_, dtype=float)
+        self.scale_ = np.asarray(scale_, dtype=float)
+
+    def transform(self, X):
+        return np.asarray(X, dtype=float) * self.scale_ + self.min_
+
+
+class ArrayOrdinalEncoder:
+    """Drop-in for a fitted single-column sklearn OrdinalEncoder's transform()."""
+
+    def __init__(self, categories):
+        self.categories_ = [np.asarray(categories)]
+        self._index = {str(c): float(i) for i, c in enumerate(self.categories_[0])}
+
+    def transform(self, X):
+        values = np.asarray(X).reshape(-1)
+        try:
+            codes = [self._index[str(v)] for v in values]
+        except KeyError as e:
+            raise ValueError(f"Found unknown categories [{e.args[0]}] during transform")
+        return np.array(codes, dtype=float).reshape(-1, 1)
+
+
+class AnfisInference:
+    """
+    Forward pass of a Gaussian/product-rule ANFIS classifier.
+
+    Mirrors xanfis CustomANFIS.forward followed by AnfisClassifier.predict:
+    membership -> rule strength (product) -> normalization -> linear
+    consequents -> argmax. The output softmax is skipped since it does not
+    change the argmax.
+    """
+
+    def __init__(self, centers, widths, coeffs):
+        self.centers = np.asarray(centers, dtype=np.float64)
+        self.widths = np.asarray(widths, dtype=np.float64)
+        self.coeffs = np.asarray(coeffs, dtype=np.float64)
+        # exp(-(x - c)^2 / (2 w^2)) == exp(-(x - c)^2 * inv_two_var)
+        self._inv_two_var = 1.0 / (2.0 * np.maximum(self.widths, 1e-8) ** 2)
+        self._weights = self.coeffs[:, :-1, :]
+        self._bias = self.coeffs[:, -1, :]
+
+    def decision_function(self, X):
+        """
+        Args:
+            X: array (n_samples, input_dim) - preprocessed features
+
+        Returns:
+            ndarray (n_samples, output_dim) - pre-activation ANFIS outputs
+        """
+        X = np.asarray(X, dtype=np.float64)
+        # Layers 1+2: the product of per-feature memberships is exp of the summed exponents
+        diff = X[:, None, :] - self.centers[None, :, :]
+        strengths = np.exp(-np.einsum("nrd,rd->nr", diff * diff, self._inv_two_var))
+        # Layer 3: normalize rule strengths
+        strengths /= strengths.sum(axis=1, keepdims=True) + 1e-8
+        # Layers 4+5: rule consequents weighted by normalized strengths
+        rule_outputs = np.einsum("ni,rij->nrj", X, self._weights) + self._bias
+        return np.einsum("nr,nrj->nj", strengths, rule_outputs)
+
+    def predict(self, X):
+        """
+        Args:
+            X: array (n_samples, input_dim) - preprocessed features
+
+        Returns:
+            ndarray (n_samples,) - predicted class indices
+        """
+        return np.argmax(self.decision_function(X), axis=1)
+
+
+class TreeInference:
+    """
+    Vectorized traversal of a decision tree exported from sklearn.
+
+    Every row steps down one level per iteration, so a depth-d tree costs d
+    rounds of gather + compare over the batch.
+    """
+
+    def __init__(self, feature, threshold, left, right, leaf_class):
+        self.feature = np.asarray(feature, dtype=np.intp)
+        self.threshold = np.asarray(threshold, dtype=np.float64)
+        self.left = np.asarray(left, dtype=np.intp)
+        self.right = np.asarray(right, dtype=np.intp)
+        self.leaf_class = np.asarray(leaf_class, dtype=np.int64)
+        self.is_leaf = self.left < 0
+        # Leaves carry sklearn's -2 placeholder; any valid column keeps the gather in bounds
+        self._feature = np.where(self.is_leaf, 0, self.feature)
+        self._left = np.where(self.is_leaf, np.arange(len(self.left)), self.left)
+        self._right = np.where(self.is_leaf, np.arange(len(self.right)), self.right)
+        self.depth = self._depth()
+
+    def _depth(self) -> int:
+        depth, frontier = 0, np.array([0])
+        while not self.is_leaf[frontier].all():
+            frontier = frontier[~self.is_leaf[frontier]]
+            frontier = np.concatenate((self.left[frontier], self.right[frontier]))
+            depth += 1
+        return depth
+
+    def apply(self, X):
+        """
+        Args:
+            X: array (n_samples, input_dim) - preprocessed features
+
+        Returns:
+            ndarray (n_samples,) - index of the leaf each row lands in
+        """
+        # sklearn compares float32 features against its thresholds; do the same for identical splits
+        X = np.asarray(X, dtype=np.float32)
+        rows = np.arange(len(X))
+        nodes = np.zeros(len(X), dtype=np.intp)
+        for _ in range(self.depth):
+            go_left = X[rows, self._feature[nodes]] <= self.threshold[nodes]
+            nodes = np.where(go_left, self._left[nodes], self._right[nodes])
+        return nodes
+
+    def predict(self, X):
+        """
+        Args:
+            X: array (n_samples, input_dim) - preprocessed features
+
+        Returns:
+            ndarray (n_samples,) - predicted class indices
+        """
+        return self.leaf_class[self.apply(X)]
+
+
+def servable_predictor(arrays, predictor: str) -> str:
+    """The predictor to build for these arrays: "anfis" when the surrogate was requested but never distilled."""
+    if predictor == "surrogate" and not all(k in arrays for k in SURROGATE_ARRAY_KEYS):
+        return "anfis"
+    return predictor
+
+
+def build_inference_components(arrays, predictor: str = "anfis"):
+    """
+    Build the serving objects from exported arrays.
+
+    Args:
+        arrays: mapping with INFERENCE_ARRAY_KEYS (plus SURROGATE_ARRAY_KEYS for the surrogate)
+        predictor: str - "anfis" for the full network or "surrogate" for the distilled tree
+
+    Returns:
+        tuple - (model, scaler, encoder) exposing predict/transform like the training objects
+    """
+    if predictor not in PREDICTORS:
+        raise ValueError(f"Unknown predictor {predictor!r}; expected one of {', '.join(PREDICTORS)}")
+    required = INFERENCE_ARRAY_KEYS + (SURROGATE_ARRAY_KEYS if predictor == "surrogate" else ())
+    missing = [k for k in required if k not in arrays]
+    if missing:
+        raise KeyError(f"Inference arrays missing: {', '.join(missing)}")
+    if predictor == "surrogate":
+        model = TreeInference(*(arrays[k] for k in SURROGATE_ARRAY_KEYS))
+    else:
+        model = AnfisInference(arrays["centers"], arrays["widths"], arrays["coeffs"])
+    scaler = ArrayMinMaxScaler(arrays["scaler_min"], arrays["scaler_scale"])
+    encoder = ArrayOrdinalEncoder(arrays["categories"])
+    return model, scaler, encoder
+
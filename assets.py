@@ -0,0 +1,349 @@
+# assets.py
+"""
+Static asset pipeline: content-hashed filenames, precompression and WebP variants.
+
+Build (at deploy time, after any change under static/ or badges/):
+
+    python assets.py build            # writes static/dist/ and static/dist/manifest.json
+    python assets.py build --clean    # also drops files from earlier builds
+
+Every file under static/ (css, js, utils, images, sounds) and badges/ is
+copied to static/dist/<dir>/<name>.<hash>.<ext>. Relative ES-module imports
+in JS and url() references in CSS are rewritten to the hashed names before
+hashing, so a changed dependency changes its importers' URLs too. Text
+assets and SVG badges get .gz (and .br when the brotli package is
+installed) siblings; raster images under images/ get WebP variants at
+RESPONSIVE_WIDTHS when Pillow is installed.
+
+At runtime AssetManifest maps logical paths ("css/quiz.css") to
+/assets/... URLs for the templates and sends hashed files with the best
+precompressed encoding, a strong ETag and immutable Cache-Control. Without a
+build, URLs fall back to the plain /static/ files.
+"""
+import argparse
+import gzip
+import hashlib
+import json
+import mimetypes
+import os
+import posixpath
+import re
+import shutil
+import sys
+from io import BytesIO
+
+
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+STATIC_DIR = os.path.join(BASE_DIR, 'static')
+BADGES_DIR = os.path.join(BASE_DIR, 'badges')
+DIST_DIR = os.path.join(STATIC_DIR, 'dist')
+MANIFEST_NAME = 'manifest.json'
+
+mimetypes.add_type('image/webp', '.webp')
+
+# Source roots: logical prefix -> directory. static/dist itself is skipped.
+SOURCE_ROOTS = (('', STATIC_DIR), ('badges/', BADGES_DIR))
+
+COMPRESSIBLE_EXTENSIONS = ('.css', '.js', '.svg', '.json', '.html', '.txt')
+RASTER_EXTENSIONS = ('.jpg', '.jpeg', '.png')
+RESPONSIVE_WIDTHS = (640, 1280, 1920)
+WEBP_QUALITY = 80
+HASH_LENGTH = 10
+
+# One year; hashed URLs never change content
+IMMUTABLE_MAX_AGE = 31536000
+
+_JS_IMPORT_RE = re.compile(r'''(\bfrom\s*|\bimport\s*\(?\s*)(['"])(\.{1,2}/[^'"]+)\2''')
+_CSS_URL_RE = re.compile(r'''url\(\s*(['"]?)([^'")]+)\1\s*\)''')
+
+
+# ----------------------
+# Build
+# ----------------------
+
+def _content_hash(data: bytes) -> str:
+    return hashlib.sha256(data).hexdigest()[:HASH_LENGTH]
+
+
+def _hashed_name(logical: str, digest: str) -> str:
+    stem, ext = posixpath.splitext(logical)
+    return f"{stem}.{digest}{ext}"
+
+
+def _collect_sources():
+    """Returns {logical path: absolute source path}."""
+    sources = {}
+    for prefix, root in SOURCE_ROOTS:
+        if not os.path.isdir(root):
+            continue
+        for dirpath, dirnames, filenames in os.walk(root):
+            dirnames[:] = [d for d in dirnames if os.path.join(dirpath, d) != DIST_DIR]
+            for filename in filenames:
+                path = os.path.join(dirpath, filename)
+                rel = os.path.relpath(path, root).replace(os.sep, '/')
+                sources[prefix + rel] = path
+    return sources
+
+
+def _is_local_reference(ref: str) -> bool:
+    return not (ref.startswith(('/', '#', 'data:')) or '://' in ref)
+
+
+class _Builder:
+    def __init__(self, out_dir: str, sources: dict):
+        self.out_dir = out_dir
+        self.sources = sources
+        self.assets = {}
+        self.files = {}
+        self._in_progress = set()
+        try:
+            import brotli
+            self._brotli = brotli
+        except ImportError:
+            self._brotli = None
+
+    def _write(self, served: str, data: bytes, digest: str):
+        path = os.path.join(self.out_dir, served)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        with open(path, 'wb') as f:
+            f.write(data)
+        encodings = []
+        if served.endswith(COMPRESSIBLE_EXTENSIONS):
+            if self._brotli is not None:
+                compressed = self._brotli.compress(data, quality=11)
+                if len(compressed) < len(data):
+                    with open(path + '.br', 'wb') as f:
+                        f.write(compressed)
+                    encodings.append('br')
+            compressed = gzip.compress(data, compresslevel=9, mtime=0)
+            if len(compressed) < len(data):
+                with open(path + '.gz', 'wb') as f:
+                    f.write(compressed)
+                encodings.append('gzip')
+        self.files[served] = {'hash': digest, 'size': len(data), 'encodings': encodings}
+
+    def _resolve(self, importer: str, ref: str):
+        """Hashed relative reference for `ref` as seen from `importer`, or None if not an asset."""
+        path, sep, suffix = ref.partition('?')
+        path, hash_sep, fragment = path.partition('#')
+        target = posixpath.normpath(posixpath.join(posixpath.dirname(importer), path))
+        if target not in self.sources:
+            return None
+        served = self.build(target)
+        relative = posixpath.relpath(served, posixpath.dirname(importer) or '.')
+        if not relative.startswith('.'):
+            relative = './' + relative
+        return relative + (hash_sep + fragment if hash_sep else '') + (sep + suffix if sep else '')
+
+    def _rewrite(self, logical: str, data: bytes) -> bytes:
+        if logical.endswith('.js'):
+            text = data.decode('utf-8')
+
+            def js_ref(match):
+                resolved = self._resolve(logical, match.group(3))
+                return match.group(0) if resolved is None else f"{match.group(1)}{match.group(2)}{resolved}{match.group(2)}"
+
+            return _JS_IMPORT_RE.sub(js_ref, text).encode('utf-8')
+        if logical.endswith('.css'):
+            text = data.decode('utf-8')
+
+            def css_ref(match):
+                ref = match.group(2).strip()
+                resolved = self._resolve(logical, ref) if _is_local_reference(ref) else None
+                return match.group(0) if resolved is None else f"url({match.group(1)}{resolved}{match.group(1)})"
+
+            return _CSS_URL_RE.sub(css_ref, text).encode('utf-8')
+        return data
+
+    def _webp_variants(self, logical: str, source: str):
+        try:
+            from PIL import Image
+        except ImportError:
+            return [], None
+        variants = []
+        stem = posixpath.splitext(logical)[0]
+        original_size = os.path.getsize(source)
+        with Image.open(source) as image:
+            image.load()
+            if image.mode not in ('RGB', 'RGBA'):
+                image = image.convert('RGBA' if 'transparency' in image.info else 'RGB')
+            widths = [w for w in RESPONSIVE_WIDTHS if w < image.width] + [image.width]
+            for width in widths:
+                if width == image.width:
+                    resized = image
+                else:
+                    resized = image.resize((width, round(image.height * width / image.width)), Image.LANCZOS)
+                buffer = BytesIO()
+                resized.save(buffer, 'WEBP', quality=WEBP_QUALITY, method=6)
+                data = buffer.getvalue()
+                if len(data) >= original_size:
+                    continue  # already-small originals (flat PNGs) gain nothing
+                digest = _content_hash(data)
+                served = _hashed_name(f"{stem}-{width}w.webp", digest)
+                self._write(served, data, digest)
+                variants.append({'width': width, 'file': served})
+            return variants, image.width
+
+    def build(self, logical: str) -> str:
+        """Build one asset (and, first, whatever it references). Returns its served path."""
+        if logical in self.assets:
+            return self.assets[logical]['file']
+        if logical in self._in_progress:
+            raise ValueError(f"Circular asset reference through {logical}")
+        self._in_progress.add(logical)
+        source = self.sources[logical]
+        with open(source, 'rb') as f:
+            data = self._rewrite(logical, f.read())
+        digest = _content_hash(data)
+        served = _hashed_name(logical, digest)
+        self._write(served, data, digest)
+        entry = {'file': served}
+        if logical.startswith('images/') and logical.lower().endswith(RASTER_EXTENSIONS):
+            variants, width = self._webp_variants(logical, source)
+            if width:
+                entry['width'] = width
+            if variants:
+                entry['variants'] = {'webp': variants}
+        self.assets[logical] = entry
+        self._in_progress.discard(logical)
+        return served
+
+
+def build_assets(out_dir: str = DIST_DIR, clean: bool = False) -> dict:
+    """
+    Fingerprint, precompress and write every static asset plus the manifest.
+
+    Files from earlier builds are kept unless `clean` is set, so pages rendered
+    by still-running workers keep resolving during a rolling deploy.
+
+    Returns:
+        dict - the manifest
+    """
+    if clean and os.path.isdir(out_dir):
+        shutil.rmtree(out_dir)
+    os.makedirs(out_dir, exist_ok=True)
+    sources = _collect_sources()
+    builder = _Builder(out_dir, sources)
+    for logical in sorted(sources):
+        builder.build(logical)
+    manifest = {'assets': builder.assets, 'files': builder.files}
+    tmp_path = os.path.join(out_dir, MANIFEST_NAME + '.tmp')
+    with open(tmp_path, 'w', encoding='utf-8') as f:
+        json.dump(manifest, f, indent=2, sort_keys=True)
+    os.replace(tmp_path, os.path.join(out_dir, MANIFEST_NAME))
+    return manifest
+
+
+# ----------------------
+# Runtime
+# ----------------------
+
+class AssetManifest:
+    """Resolves logical asset paths to hashed URLs and serves the built files."""
+
+    def __init__(self, dist_dir: str = DIST_DIR, url_prefix: str = '/assets/'):
+        self.dist_dir = dist_dir
+        self.url_prefix = url_prefix
+        self.assets = {}
+        self.files = {}
+        self.load()
+
+    def load(self) -> bool:
+        """(Re)read manifest.json. Returns False when no build is present."""
+        try:
+            with open(os.path.join(self.dist_dir, MANIFEST_NAME), encoding='utf-8') as f:
+                manifest = json.load(f)
+        except (OSError, ValueError):
+            self.assets, self.files = {}, {}
+            return False
+        self.assets = manifest.get('assets', {})
+        self.files = manifest.get('files', {})
+        return True
+
+    def url(self, logical: str, variant: str = None):
+        """
+        URL for a logical asset path such as 'css/quiz.css'.
+
+        Args:
+            logical: str - path relative to static/ (or 'badges/<name>')
+            variant: str - e.g. 'webp' for the full-size WebP variant
+
+        Returns:
+            str - hashed /assets/ URL; the unbuilt /static/ (or /badges/) URL when
+            there is no build; None when no full-size variant was built (or it
+            was no smaller than the original)
+        """
+        logical = logical.lstrip('/')
+        entry = self.assets.get(logical)
+        if variant is not None:
+            entry = entry or {}
+            for v in entry.get('variants', {}).get(variant, ()):
+                if v['width'] == entry.get('width'):
+                    return self.url_prefix + v['file']
+            return None
+        if entry is not None:
+            return self.url_prefix + entry['file']
+        if logical.startswith('badges/'):
+            return '/' + logical
+        return '/static/' + logical
+
+    def srcset(self, logical: str, variant: str = 'webp') -> str:
+        """'url 640w, url 1280w, ...' for a variant, or '' when it was not built."""
+        variants = self.assets.get(logical.lstrip('/'), {}).get('variants', {}).get(variant) or []
+        return ', '.join(f"{self.url_prefix}{v['file']} {v['width']}w" for v in variants)
+
+    def has(self, logical: str) -> bool:
+        return logical.lstrip('/') in self.assets
+
+    def send(self, served: str, request, max_age: int = IMMUTABLE_MAX_AGE, immutable: bool = True):
+        """
+        Response for a built file, choosing a precompressed sibling the client accepts.
+
+        Args:
+            served: str - path under the dist directory (an entry of the manifest's files)
+            request: the current Flask request
+            max_age: int - Cache-Control max-age in seconds
+            immutable: bool - add Cache-Control immutable (only for hashed URLs)
+        """
+        from flask import abort, send_from_directory
+
+        info = self.files.get(served)
+        if info is None:
+            abort(404)
+        encoding = None
+        for candidate in info['encodings']:
+            if candidate in request.accept_encodings:
+                encoding = candidate
+                break
+        path = served + {'br': '.br', 'gzip': '.gz'}.get(encoding, '')
+        etag = info['hash'] + (f"-{encoding}" if encoding else '')
+        mimetype = mimetypes.guess_type(served)[0] or 'application/octet-stream'
+        response = send_from_directory(self.dist_dir, path, mimetype=mimetype, etag=etag, max_age=max_age)
+        if info['encodings']:
+            response.vary.add('Accept-Encoding')
+        if encoding and response.status_code in (200, 206):
+            response.content_encoding = encoding
+        if immutable:
+            response.cache_control.immutable = True
+        return response
+
+    def send_logical(self, logical: str, request, max_age: int):
+        """Serve a built asset by its logical path at an unhashed URL (revalidated via ETag)."""
+        return self.send(self.assets[logical.lstrip('/')]['file'], request, max_age=max_age, immutable=False)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Build fingerprinted, precompressed static assets.")
+    sub = parser.add_subparsers(dest="command", required=True)
+    build_parser = sub.add_parser("build", help="Write static/dist and its manifest")
+    build_parser.add_argument("--out", default=DIST_DIR)
+    build_parser.add_argument("--clean", action="store_true", help="Remove files from earlier builds first")
+    args = parser.parse_args()
+
+    manifest = build_assets(args.out, clean=args.clean)
+    files = manifest['files']
+    raw = sum(info['size'] for info in files.values())
+    variants = sum(len(entry.get('variants', {}).get('webp', [])) for entry in manifest['assets'].values())
+    print(f"✅ Built {len(manifest['assets'])} assets ({variants} WebP variants, {raw / 1024:.0f} KiB) into {args.out}")
+    if not any('br' in info['encodings'] for info in files.values()):
+        print("ℹ️ brotli not installed; wrote gzip siblings only", file=sys.stderr)
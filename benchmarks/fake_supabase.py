@@ -0,0 +1,63 @@
+# benchmarks/fake_supabase.py
+"""
+In-process stand-in for the Supabase client so benchmarks measure the app,
+not the network. Every query builder call is accepted and chained; reads
+return no rows and writes are counted.
+"""
+import threading
+
+
+class FakeResponse:
+    def __init__(self, data=None):
+        self.data = data if data is not None else []
+        self.count = None
+
+
+class FakeQuery:
+    def __init__(self, client, table: str):
+        self.client = client
+        self.table = table
+        self.payload = None
+
+    def insert(self, payload, *args, **kwargs):
+        self.payload = payload
+        return self
+
+    upsert = insert
+    update = insert
+
+    def __getattr__(self, name):
+        # select / eq / in_ / order / range / limit / ... all chain
+        def chain(*args, **kwargs):
+            return self
+        return chain
+
+    def execute(self):
+        with self.client.lock:
+            self.client.calls += 1
+            if self.payload is not None:
+                self.client.writes += 1
+        if self.payload is None:
+            return FakeResponse()
+        rows = self.payload if isinstance(self.payload, list) else [self.payload]
+        return FakeResponse([dict(row) for row in rows])
+
+
+class FakeSupabase:
+    def __init__(self):
+        self.calls = 0
+        self.writes = 0
+        self.lock = threading.Lock()
+
+    def table(self, name: str) -> FakeQuery:
+        return FakeQuery(self, name)
+
+    from_ = table
+
+
+def install():
+    """Make supabase.create_client return a FakeSupabase (call before importing app)."""
+    import supabase
+    fake = FakeSupabase()
+    supabase.create_client = lambda *args, **kwargs: fake
+    return fake
@@ -0,0 +1,299 @@
+# benchmarks/run_benchmarks.py
+"""
+Reproducible performance benchmarks for the scaffold-level service.
+
+Measures:
+    cold_load         load_ml_models() in a fresh interpreter: seconds and peak RSS
+    single_latency    predict_scaffold_level() per-call latency percentiles
+    batch_throughput  predict_scaffold_levels() rows/sec for several batch sizes
+    endpoint_latency  Flask test-client POST /predict-scaffold-level latency percentiles
+
+Supabase is replaced by an in-process fake (benchmarks/fake_supabase.py) and
+inputs come from a fixed seed, so runs are comparable. Results are JSON:
+
+    python -m benchmarks.run_benchmarks --output bench.json
+    python -m benchmarks.run_benchmarks --baseline bench.json --threshold 0.15
+
+With --baseline, every metric is compared against the saved run and the
+process exits with status 1 if any regressed by more than the threshold.
+"""
+import argparse
+import json
+import os
+import platform
+import random
+import resource
+import subprocess
+import sys
+import time
+
+
+REPO_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+DEFAULT_BATCH_SIZES = (1, 8, 64, 256, 1000)
+
+# Metrics whose names end with these are better when higher (the rest: lower is better)
+HIGHER_IS_BETTER = ('rows_per_second',)
+
+
+def _peak_rss_mb() -> float:
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # ru_maxrss is KiB on Linux, bytes on macOS
+    return round(peak / (1024 * 1024) if sys.platform == 'darwin' else peak / 1024, 2)
+
+
+def _percentiles(samples_seconds, scale: float) -> dict:
+    ordered = sorted(samples_seconds)
+    n = len(ordered)
+
+    def pct(p):
+        return round(ordered[min(n - 1, int(round(p / 100.0 * (n - 1))))] * scale, 3)
+
+    return {
+        'n': n,
+        'p50': pct(50),
+        'p90': pct(90),
+        'p99': pct(99),
+        'max': round(ordered[-1] * scale, 3),
+        'mean': round(sum(ordered) / n * scale, 3),
+    }
+
+
+def _feature_rows(n: int, seed: int):
+    """Rows on the quiz.js input grid, as the endpoints receive them."""
+    rng = random.Random(seed)
+    rows = []
+    for _ in range(n):
+        questions = rng.randint(3, 10)
+        rows.append({
+            'accuracy': round(rng.randint(0, questions) / questions, 3),
+            'hint_usage': round(rng.randint(0, questions) / questions, 3),
+            'mistake_count': rng.randint(0, 10),
+            'ability': rng.choice((-1, 0, 1)),
+            'difficulty': rng.choice(('easy', 'medium', 'hard')),
+        })
+    return rows
+
+
+def _import_app():
+    """Import app.py against the fake Supabase without starting the background loader."""
+    os.environ.setdefault('SCAFFOLD_MODEL_LOAD', 'manual')
+    os.environ.setdefault('SCAFFOLD_PROFILE_STORE', 'memory')
+    os.environ.setdefault('SCAFFOLD_MODEL_RELOAD_INTERVAL', '0')
+    if REPO_DIR not in sys.path:
+        sys.path.insert(0, REPO_DIR)
+    from benchmarks import fake_supabase
+    fake_supabase.install()
+    import app
+    return app
+
+
+# ----------------------
+# Benchmarks
+# ----------------------
+
+def _cold_load_child():
+    """Runs in a fresh interpreter; prints one JSON line."""
+    started = time.perf_counter()
+    app = _import_app()
+    imported = time.perf_counter()
+    model, scaler, encoder = app.load_ml_models()
+    loaded = time.perf_counter()
+    print(json.dumps({
+        'import_seconds': round(imported - started, 4),
+        'load_seconds': round(loaded - imported, 4),
+        'peak_rss_mb': _peak_rss_mb(),
+        'loaded': model is not None,
+        'model_version': app.model_state['version'],
+    }))
+
+
+def bench_cold_load(repeats: int) -> dict:
+    runs = []
+    for _ in range(repeats):
+        out = subprocess.run(
+            [sys.executable, '-m', 'benchmarks.run_benchmarks', '--cold-load-child'],
+            cwd=REPO_DIR, capture_output=True, text=True, check=True,
+        )
+        runs.append(json.loads(out.stdout.strip().splitlines()[-1]))
+    if not all(run['loaded'] for run in runs):
+        raise RuntimeError("load_ml_models() did not return a model")
+    return {
+        'repeats': repeats,
+        'model_version': runs[0]['model_version'],
+        'import_seconds': min(run['import_seconds'] for run in runs),
+        'load_seconds': min(run['load_seconds'] for run in runs),
+        'peak_rss_mb': max(run['peak_rss_mb'] for run in runs),
+    }
+
+
+def bench_single_latency(app, iterations: int, seed: int) -> dict:
+    rows = _feature_rows(iterations, seed)
+    for row in rows[:min(50, iterations)]:  # warm-up
+        app.predict_scaffold_level(**row)
+    samples = []
+    for row in rows:
+        started = time.perf_counter()
+        app.predict_scaffold_level(**row)
+        samples.append(time.perf_counter() - started)
+    return {'latency_us': _percentiles(samples, 1e6)}
+
+
+def bench_batch_throughput(app, batch_sizes, rows_per_size: int, seed: int) -> dict:
+    results = {}
+    for size in batch_sizes:
+        rows = _feature_rows(size, seed + size)
+        app.predict_scaffold_levels(rows)  # warm-up
+        rounds = max(1, rows_per_size // size)
+        started = time.perf_counter()
+        for _ in range(rounds):
+            app.predict_scaffold_levels(rows)
+        elapsed = time.perf_counter() - started
+        results[str(size)] = {
+            'rows_per_second': round(rounds * size / elapsed, 1),
+            'batch_ms': round(elapsed / rounds * 1000, 3),
+        }
+    return results
+
+
+def bench_endpoint_latency(app, iterations: int, seed: int) -> dict:
+    client = app.app.test_client()
+    rows = _feature_rows(iterations, seed)
+    payloads = [dict(row, student_id=f"bench-{i % 500}") for i, row in enumerate(rows)]
+    for payload in payloads[:min(50, iterations)]:  # warm-up
+        client.post('/predict-scaffold-level', json=payload)
+    samples = []
+    for payload in payloads:
+        started = time.perf_counter()
+        response = client.post('/predict-scaffold-level', json=payload)
+        samples.append(time.perf_counter() - started)
+        if response.status_code != 200:
+            raise RuntimeError(f"/predict-scaffold-level returned {response.status_code}: {response.get_data(as_text=True)}")
+    if app.scaffold_writer is not None:
+        app.scaffold_writer.flush()
+    return {'latency_ms': _percentiles(samples, 1e3)}
+
+
+# ----------------------
+# Comparison
+# ----------------------
+
+def flatten_metrics(results: dict, prefix: str = '') -> dict:
+    """Numeric leaves as 'a.b.c' -> value (counts like 'n'/'repeats' are not metrics)."""
+    flat = {}
+    for key, value in results.items():
+        name = f"{prefix}{key}"
+        if isinstance(value, dict):
+            flat.update(flatten_metrics(value, name + '.'))
+        elif isinstance(value, (int, float)) and not isinstance(value, bool) and key not in ('n', 'repeats'):
+            flat[name] = value
+    return flat
+
+
+def compare(current: dict, baseline: dict, threshold: float) -> list:
+    """
+    Returns:
+        list[dict] - metrics that got worse than the baseline by more than `threshold` (a fraction)
+    """
+    regressions = []
+    now = flatten_metrics(current['results'])
+    before = flatten_metrics(baseline['results'])
+    for name, old in before.items():
+        new = now.get(name)
+        if new is None or old == 0:
+            continue
+        change = (new - old) / abs(old)
+        worse = -change if name.endswith(HIGHER_IS_BETTER) else change
+        if worse > threshold:
+            regressions.append({'metric': name, 'baseline': old, 'current': new, 'change': round(change, 4)})
+    return regressions
+
+
+def _git_commit():
+    try:
+        return subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], cwd=REPO_DIR,
+                              capture_output=True, text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def run(args) -> dict:
+    results = {}
+    if 'cold_load' in args.only:
+        results['cold_load'] = bench_cold_load(args.cold_repeats)
+
+    app = _import_app()
+    if {'single_latency', 'batch_throughput', 'endpoint_latency'} & set(args.only):
+        app.start_model_loading(background=False)
+        if app.model_state['status'] != 'ready':
+            raise RuntimeError("Model failed to load")
+    if 'single_latency' in args.only:
+        results['single_latency'] = bench_single_latency(app, args.iterations, args.seed)
+    if 'batch_throughput' in args.only:
+        results['batch_throughput'] = bench_batch_throughput(app, args.batch_sizes, args.batch_rows, args.seed)
+    if 'endpoint_latency' in args.only:
+        results['endpoint_latency'] = bench_endpoint_latency(app, args.iterations, args.seed)
+
+    return {
+        'meta': {
+            'timestamp': time.strftime('%Y-%m-%dT%H:%M:%SZ', time.gmtime()),
+            'git_commit': _git_commit(),
+            'python': platform.python_version(),
+            'platform': platform.platform(),
+            'cpu_count': os.cpu_count(),
+            'seed': args.seed,
+            'config': {
+                'model_version': app.model_state['version'],
+                'prediction_cache': app.PREDICTION_CACHE_MODE,
+                'micro_batching': app.MICRO_BATCHING_ENABLED,
+                'write_behind': app.scaffold_writer is not None,
+            },
+        },
+        'results': results,
+    }
+
+
+BENCHMARKS = ('cold_load', 'single_latency', 'batch_throughput', 'endpoint_latency')
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Run the scaffold-level performance benchmarks.")
+    parser.add_argument("--only", nargs="+", choices=BENCHMARKS, default=list(BENCHMARKS))
+    parser.add_argument("--iterations", type=int, default=2000, help="Calls for the latency benchmarks")
+    parser.add_argument("--batch-sizes", type=int, nargs="+", default=list(DEFAULT_BATCH_SIZES))
+    parser.add_argument("--batch-rows", type=int, default=20000, help="Rows scored per batch size")
+    parser.add_argument("--cold-repeats", type=int, default=3, help="Fresh interpreters for cold_load (best of)")
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--output", help="Write results JSON here (default: stdout)")
+    parser.add_argument("--baseline", help="Results JSON from an earlier run to compare against")
+    parser.add_argument("--threshold", type=float, default=0.15,
+                        help="Allowed relative regression before failing (default 0.15 = 15%%)")
+    parser.add_argument("--cold-load-child", action="store_true", help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.cold_load_child:
+        _cold_load_child()
+        sys.exit(0)
+
+    # The app and its modules log to stderr, so stdout carries only the JSON
+    # report (SCAFFOLD_LOG_LEVEL=WARNING quiets the log)
+    report = run(args)
+    if args.baseline:
+        with open(args.baseline, encoding='utf-8') as f:
+            baseline = json.load(f)
+        report['regressions'] = compare(report, baseline, args.threshold)
+        report['baseline'] = {'path': args.baseline, 'git_commit': baseline.get('meta', {}).get('git_commit'),
+                              'threshold': args.threshold}
+
+    text = json.dumps(report, indent=2)
+    if args.output:
+        with open(args.output, 'w', encoding='utf-8') as f:
+            f.write(text + '\n')
+        print(f"✅ Benchmark results written to {args.output}")
+    else:
+        print(text)
+
+    if report.get('regressions'):
+        for item in report['regressions']:
+            print(f"❌ {item['metric']}: {item['baseline']} -> {item['current']} ({item['change']:+.1%})",
+                  file=sys.stderr)
+        sys.exit(1)
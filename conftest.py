@@ -0,0 +1,3 @@
+# conftest.py
+# test_model_loading.py is a UTF-16 manual check script (run it directly), not a pytest module
+collect_ignore = ['test_model_loading.py']
@@ -0,0 +1,73 @@
+# gunicorn.conf.py
+"""
+Production server settings. gunicorn picks this file up automatically
+(`gunicorn app:app`), and serve.py runs with it.
+
+The app is imported once in the master (preload_app) with the model loaded
+synchronously, then workers are forked and share the memory-mapped model
+and every other read-only object copy-on-write. Each worker runs a few
+threads; background threads (write-behind flusher, micro-batcher, model
+watcher, leaderboard reconciler) start in each worker after fork, never in
+the master.
+
+Settings come from the environment:
+    SCAFFOLD_BIND (default 0.0.0.0:$PORT or :8000), SCAFFOLD_WORKERS (CPU count),
+    SCAFFOLD_THREADS (4), SCAFFOLD_WORKER_TIMEOUT (30), SCAFFOLD_GRACEFUL_TIMEOUT (30),
+    SCAFFOLD_KEEPALIVE (5), SCAFFOLD_MAX_REQUESTS (0 = never recycle workers),
+    SCAFFOLD_ACCESS_LOG (path or "-" for stdout; off by default)
+"""
+import gc
+import os
+
+
+# Load the model before forking rather than in a background thread per worker
+os.environ.setdefault("SCAFFOLD_MODEL_LOAD", "sync")
+
+bind = os.environ.get("SCAFFOLD_BIND", f"0.0.0.0:{os.environ.get('PORT', '8000')}")
+workers = int(os.environ.get("SCAFFOLD_WORKERS", str(os.cpu_count() or 1)))
+worker_class = "gthread"
+# Keep at or below SCAFFOLD_SUPABASE_MAX_CONNECTIONS so threads rarely wait for a pooled connection
+threads = int(os.environ.get("SCAFFOLD_THREADS", "4"))
+preload_app = True
+timeout = int(os.environ.get("SCAFFOLD_WORKER_TIMEOUT", "30"))
+graceful_timeout = int(os.environ.get("SCAFFOLD_GRACEFUL_TIMEOUT", "30"))
+keepalive = int(os.environ.get("SCAFFOLD_KEEPALIVE", "5"))
+max_requests = int(os.environ.get("SCAFFOLD_MAX_REQUESTS", "0"))
+max_requests_jitter = max_requests // 10
+accesslog = os.environ.get("SCAFFOLD_ACCESS_LOG") or None
+
+
+def when_ready(server):
+    """Runs in the master after the app is preloaded, before the first fork."""
+    import app as scaffold_app
+
+    status = scaffold_app.model_state['status']
+    if status == 'ready':
+        server.log.info(f"Model {scaffold_app.model_state['version']} loaded before fork "
+                        f"in {scaffold_app.model_state['load_seconds']}s")
+    else:
+        server.log.warning(f"Model status is '{status}'; prediction endpoints will return 503")
+
+    # Objects allocated so far are never freed; freezing them keeps the workers'
+    # garbage collector from touching (and so copying) the shared pages
+    gc.collect()
+    gc.freeze()
+
+
+def post_fork(server, worker):
+    """
+    Runs in each worker right after fork: start the model watcher and the write-behind
+    flusher (which replays spill files left by crashed workers) before the first request.
+    """
+    from app import ensure_model_watcher, scaffold_writer
+
+    ensure_model_watcher()
+    if scaffold_writer is not None:
+        scaffold_writer.start()
+
+
+def worker_exit(server, worker):
+    """Runs in each worker after it stops serving: flush queued writes, close the pool."""
+    from app import shutdown
+
+    shutdown()
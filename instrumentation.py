@@ -0,0 +1,285 @@
+# instrumentation.py
+"""
+Lightweight request/phase instrumentation and Prometheus text exposition.
+
+    REGISTRY            process-wide counters, histograms and gauge callbacks
+    span(phase)         times a block into scaffold_phase_seconds{phase=...}
+    install_request_metrics(app)
+                        Flask before/after hooks feeding http_request_* metrics
+    get_logger / log_sampled
+                        leveled logging (SCAFFOLD_LOG_LEVEL) with sampling for
+                        per-request messages (SCAFFOLD_LOG_SAMPLE_RATE)
+
+Metrics are per process; under a multi-worker server each worker exposes its own.
+"""
+import bisect
+import logging
+import os
+import random
+import threading
+import time
+from contextlib import contextmanager
+
+
+# Latency buckets in seconds
+LATENCY_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0)
+
+
+class Histogram:
+    """Cumulative-bucket histogram with count/sum/max, safe to share between threads."""
+
+    def __init__(self, buckets):
+        self.buckets = tuple(buckets)
+        self._counts = [0] * (len(self.buckets) + 1)  # last slot is +Inf
+        self.count = 0
+        self.total = 0.0
+        self.max = 0.0
+        self._lock = threading.Lock()
+
+    def observe(self, value: float):
+        with self._lock:
+            self._counts[bisect.bisect_left(self.buckets, value)] += 1
+            self.count += 1
+            self.total += value
+            if value > self.max:
+                self.max = value
+
+    def cumulative(self):
+        """Returns (list of (upper bound, cumulative count) incl. '+Inf', count, sum)."""
+        with self._lock:
+            running = 0
+            buckets = []
+            for bound, n in zip(self.buckets + ('+Inf',), self._counts):
+                running += n
+                buckets.append((bound, running))
+            return buckets, self.count, self.total
+
+    def snapshot(self) -> dict:
+        buckets, count, total = self.cumulative()
+        with self._lock:
+            peak = self.max
+        return {
+            'count': count,
+            'sum': round(total, 4),
+            'mean': round(total / count, 4) if count else 0.0,
+            'max': round(peak, 4),
+            'buckets': {str(bound): n for bound, n in buckets},
+        }
+
+
+def _format_labels(labelnames, values, extra: str = '') -> str:
+    parts = [f'{name}="{_escape(value)}"' for name, value in zip(labelnames, values)]
+    if extra:
+        parts.append(extra)
+    return '{' + ','.join(parts) + '}' if parts else ''
+
+
+def _escape(value) -> str:
+    return str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+
+def _format_value(value) -> str:
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+
+class Counter:
+    def __init__(self, name: str, documentation: str, labelnames=()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._values = {}
+        self._lock = threading.Lock()
+
+    def inc(self, amount: float = 1, **labels):
+        key = tuple(str(labels.get(name, '')) for name in self.labelnames)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def value(self, **labels):
+        key = tuple(str(labels.get(name, '')) for name in self.labelnames)
+        with self._lock:
+            return self._values.get(key, 0)
+
+    def render(self):
+        lines = [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} counter"]
+        with self._lock:
+            items = sorted(self._values.items())
+        for key, value in items:
+            lines.append(f"{self.name}{_format_labels(self.labelnames, key)} {_format_value(value)}")
+        return lines
+
+
+class LabeledHistogram:
+    def __init__(self, name: str, documentation: str, labelnames=(), buckets=LATENCY_BUCKETS):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self.buckets = tuple(buckets)
+        self._children = {}
+        self._lock = threading.Lock()
+
+    def labels(self, **labels) -> Histogram:
+        key = tuple(str(labels.get(name, '')) for name in self.labelnames)
+        child = self._children.get(key)
+        if child is None:
+            with self._lock:
+                child = self._children.setdefault(key, Histogram(self.buckets))
+        return child
+
+    def observe(self, value: float, **labels):
+        self.labels(**labels).observe(value)
+
+    def render(self):
+        lines = [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} histogram"]
+        with self._lock:
+            children = sorted(self._children.items())
+        for key, histogram in children:
+            buckets, count, total = histogram.cumulative()
+            for bound, n in buckets:
+                le = 'le="+Inf"' if bound == '+Inf' else f'le="{bound}"'
+                lines.append(f"{self.name}_bucket{_format_labels(self.labelnames, key, le)} {n}")
+            lines.append(f"{self.name}_sum{_format_labels(self.labelnames, key)} {_format_value(float(total))}")
+            lines.append(f"{self.name}_count{_format_labels(self.labelnames, key)} {count}")
+        return lines
+
+
+class Gauge:
+    """Value read from a callback at scrape time; the callback may return a number or {label value: number}."""
+
+    def __init__(self, name: str, documentation: str, func, labelname: str = None, kind: str = 'gauge'):
+        self.name = name
+        self.documentation = documentation
+        self.func = func
+        self.labelname = labelname
+        self.kind = kind
+
+    def render(self):
+        try:
+            value = self.func()
+        except Exception:
+            return []
+        if value is None:
+            return []
+        lines = [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} {self.kind}"]
+        if isinstance(value, dict):
+            for label_value, v in sorted(value.items(), key=lambda item: str(item[0])):
+                lines.append(f"{self.name}{_format_labels((self.labelname,), (label_value,))} {_format_value(v)}")
+        else:
+            lines.append(f"{self.name} {_format_value(value)}")
+        return lines
+
+
+class MetricsRegistry:
+    def __init__(self):
+        self._metrics = {}
+        self._lock = threading.Lock()
+
+    def _register(self, metric):
+        with self._lock:
+            existing = self._metrics.get(metric.name)
+            if existing is not None:
+                return existing
+            self._metrics[metric.name] = metric
+            return metric
+
+    def counter(self, name, documentation, labelnames=()) -> Counter:
+        return self._register(Counter(name, documentation, labelnames))
+
+    def histogram(self, name, documentation, labelnames=(), buckets=LATENCY_BUCKETS) -> LabeledHistogram:
+        return self._register(LabeledHistogram(name, documentation, labelnames, buckets))
+
+    def gauge(self, name, documentation, func, labelname=None, kind='gauge') -> Gauge:
+        return self._register(Gauge(name, documentation, func, labelname, kind))
+
+    def render(self) -> str:
+        """Prometheus text exposition format (version 0.0.4)."""
+        with self._lock:
+            metrics = list(self._metrics.values())
+        lines = []
+        for metric in metrics:
+            lines.extend(metric.render())
+        return '\n'.join(lines) + '\n'
+
+
+REGISTRY = MetricsRegistry()
+
+PROMETHEUS_CONTENT_TYPE = 'text/plain; version=0.0.4; charset=utf-8'
+
+PHASE_SECONDS = REGISTRY.histogram(
+    'scaffold_phase_seconds', 'Time spent in each phase of request handling.', ('phase',)
+)
+HTTP_REQUEST_SECONDS = REGISTRY.histogram(
+    'http_request_duration_seconds', 'Flask request latency by route.', ('method', 'route', 'status')
+)
+HTTP_REQUESTS = REGISTRY.counter(
+    'http_requests_total', 'Flask requests handled by route.', ('method', 'route', 'status')
+)
+PREDICTIONS = REGISTRY.counter(
+    'scaffold_predictions_total', 'Scaffold levels returned, by level.', ('level',)
+)
+PREDICTION_DEFAULTS = REGISTRY.counter(
+    'scaffold_prediction_defaults_total', 'Rows answered with the default scaffold level instead of a model score.',
+    ('reason',)
+)
+DB_ERRORS = REGISTRY.counter(
+    'scaffold_db_errors_total', 'Failed Supabase/profile-store operations.', ('operation',)
+)
+
+
+@contextmanager
+def span(phase: str):
+    """Time the enclosed block into scaffold_phase_seconds{phase=...}."""
+    started = time.perf_counter()
+    try:
+        yield
+    finally:
+        PHASE_SECONDS.observe(time.perf_counter() - started, phase=phase)
+
+
+def install_request_metrics(app):
+    """Register Flask hooks that time every request by route template and status."""
+    from flask import g, request
+
+    @app.before_request
+    def _start_request_timer():
+        g._request_started = time.perf_counter()
+
+    @app.after_request
+    def _record_request_metrics(response):
+        started = g.pop('_request_started', None)
+        if started is not None:
+            route = request.url_rule.rule if request.url_rule is not None else 'unmatched'
+            labels = {'method': request.method, 'route': route, 'status': response.status_code}
+            HTTP_REQUEST_SECONDS.observe(time.perf_counter() - started, **labels)
+            HTTP_REQUESTS.inc(**labels)
+        return response
+
+    return app
+
+
+# ----------------------
+# Logging
+# ----------------------
+
+LOG_SAMPLE_RATE = float(os.environ.get("SCAFFOLD_LOG_SAMPLE_RATE", "0.01"))
+
+
+def get_logger(name: str = 'scaffold') -> logging.Logger:
+    """Logger writing plain messages to stderr at SCAFFOLD_LOG_LEVEL (default INFO)."""
+    logger = logging.getLogger(name)
+    if not logger.handlers:
+        handler = logging.StreamHandler()
+        handler.setFormatter(logging.Formatter('%(message)s'))
+        logger.addHandler(handler)
+        logger.setLevel(os.environ.get("SCAFFOLD_LOG_LEVEL", "INFO").upper())
+        logger.propagate = False
+    return logger
+
+
+def log_sampled(logger: logging.Logger, level: int, msg: str, *args, rate: float = None):
+    """Log only a `rate` fraction of calls (everything when the logger is at DEBUG)."""
+    if not logger.isEnabledFor(level):
+        return
+    rate = LOG_SAMPLE_RATE if rate is None else rate
+    if rate >= 1.0 or logger.isEnabledFor(logging.DEBUG) or random.random() < rate:
+        logger.log(level, msg, *args)
@@ -0,0 +1,330 @@
+# leaderboard.py
+"""
+In-memory ranked leaderboard.
+
+Mirrors the Supabase `leaderboard` table (student_id, username,
+total_points, average_accuracy) in an indexable skip list ordered by rank
+key, so a points update and a student's rank are O(log n) and top-K walks
+the first K nodes. Points recorded through the app are applied
+immediately; a periodic reconciliation reloads the table to pick up
+writes from elsewhere and correct any drift.
+"""
+import hashlib
+import json
+import os
+import random
+import threading
+import time
+
+from instrumentation import get_logger
+
+
+log = get_logger()
+
+
+# Rows per page when reloading the leaderboard table
+RECONCILE_PAGE_SIZE = 1000
+
+DEFAULT_TOP_K = 10
+MAX_TOP_K = 100
+
+
+def _rank_key(student_id, entry: dict) -> tuple:
+    # Highest points first, then highest accuracy; student_id keeps keys unique
+    return (-entry['total_points'], -(entry['average_accuracy'] or 0), str(student_id))
+
+
+class _SkipNode:
+    __slots__ = ('key', 'next', 'width')
+
+    def __init__(self, key, level: int):
+        self.key = key
+        self.next = [None] * level
+        # width[i]: level-0 steps from this node to next[i] (to one past the end when next[i] is None)
+        self.width = [1] * level
+
+
+class RankedSkipList:
+    """
+    Sorted unique keys with O(log n) insert, remove and rank (an indexable skip list).
+
+    Not thread-safe; Leaderboard calls it with its lock held.
+    """
+
+    MAX_LEVEL = 32
+
+    def __init__(self, seed: int = 0):
+        self._head = _SkipNode(None, self.MAX_LEVEL)
+        self._level = 1
+        self._size = 0
+        self._random = random.Random(seed)
+
+    @classmethod
+    def from_sorted(cls, keys, seed: int = 0):
+        """Build from already-sorted unique keys in O(n)."""
+        ranked = cls(seed)
+        last = [ranked._head] * cls.MAX_LEVEL
+        last_pos = [0] * cls.MAX_LEVEL
+        pos = 0
+        for key in keys:
+            pos += 1
+            level = ranked._random_level()
+            node = _SkipNode(key, level)
+            for i in range(level):
+                last[i].next[i] = node
+                last[i].width[i] = pos - last_pos[i]
+                last[i], last_pos[i] = node, pos
+            ranked._level = max(ranked._level, level)
+        for i in range(cls.MAX_LEVEL):
+            last[i].width[i] = pos + 1 - last_pos[i]
+        ranked._size = pos
+        return ranked
+
+    def __len__(self) -> int:
+        return self._size
+
+    def _random_level(self) -> int:
+        level = 1
+        while level < self.MAX_LEVEL and self._random.random() < 0.5:
+            level += 1
+        return level
+
+    def _predecessors(self, key):
+        """Last node before key on every level, and each one's 1-based position (head is 0)."""
+        update = [self._head] * self.MAX_LEVEL
+        positions = [0] * self.MAX_LEVEL
+        node, pos = self._head, 0
+        for i in reversed(range(self._level)):
+            while node.next[i] is not None and node.next[i].key < key:
+                pos += node.width[i]
+                node = node.next[i]
+            update[i], positions[i] = node, pos
+        return update, positions
+
+    def insert(self, key):
+        update, positions = self._predecessors(key)
+        level = self._random_level()
+        if level > self._level:
+            for i in range(self._level, level):
+                self._head.next[i] = None
+                self._head.width[i] = self._size + 1
+            self._level = level
+        node = _SkipNode(key, level)
+        new_pos = positions[0] + 1
+        for i in range(level):
+            prev = update[i]
+            node.next[i] = prev.next[i]
+            prev.next[i] = node
+            node.width[i] = prev.width[i] - (new_pos - positions[i]) + 1
+            prev.width[i] = new_pos - positions[i]
+        for i in range(level, self._level):
+            update[i].width[i] += 1
+        self._size += 1
+
+    def remove(self, key):
+        update, _ = self._predecessors(key)
+        node = update[0].next[0]
+        if node is None or node.key != key:
+            raise KeyError(key)
+        for i in range(self._level):
+            if update[i].next[i] is node:
+                update[i].next[i] = node.next[i]
+                update[i].width[i] += node.width[i] - 1
+            else:
+                update[i].width[i] -= 1
+        while self._level > 1 and self._head.next[self._level - 1] is None:
+            self._level -= 1
+        self._size -= 1
+
+    def rank(self, key) -> int:
+        """0-based position key has (or would have) in sorted order."""
+        return self._predecessors(key)[1][0]
+
+    def first(self, k: int) -> list:
+        """The k smallest keys in order."""
+        keys, node = [], self._head.next[0]
+        while node is not None and len(keys) < k:
+            keys.append(node.key)
+            node = node.next[0]
+        return keys
+
+
+class Leaderboard:
+    """
+    Args:
+        client: Supabase client
+        table: str - leaderboard table to reconcile against
+    """
+
+    def __init__(self, client, table: str = 'leaderboard'):
+        self.client = client
+        self.table = table
+        self._entries = {}       # student_id -> {'username', 'total_points', 'average_accuracy'}
+        self._ranked = RankedSkipList()     # rank keys
+        self._version = 0
+        self._lock = threading.Lock()
+        self._reconciler = None
+        self._reconciler_pid = None
+        self.loaded = False
+        self.reconciled_at = None
+        self.reconciliations = 0
+        self.drift_corrected = 0
+        self.increments = 0
+
+    # --- ranked structure (lock held) ---
+
+    def _remove(self, student_id):
+        entry = self._entries.pop(student_id, None)
+        if entry is not None:
+            self._ranked.remove(_rank_key(student_id, entry))
+
+    def _insert(self, student_id, entry: dict):
+        self._entries[student_id] = entry
+        self._ranked.insert(_rank_key(student_id, entry))
+
+    @staticmethod
+    def _public(student_id, entry: dict, rank: int) -> dict:
+        return {
+            'rank': rank,
+            'student_id': student_id,
+            'username': entry['username'],
+            'total_points': entry['total_points'],
+            'average_accuracy': entry['average_accuracy'],
+        }
+
+    # --- reads ---
+
+    def top(self, k: int = DEFAULT_TOP_K) -> list:
+        with self._lock:
+            return [
+                self._public(key[2], self._entries[key[2]], rank)
+                for rank, key in enumerate(self._ranked.first(k), start=1)
+            ]
+
+    def rank_of(self, student_id):
+        """Return the student's leaderboard row with its 1-based rank, or None if unranked."""
+        with self._lock:
+            entry = self._entries.get(student_id)
+            if entry is None:
+                return None
+            rank = self._ranked.rank(_rank_key(student_id, entry)) + 1
+            return self._public(student_id, entry, rank)
+
+    def snapshot(self, k: int = DEFAULT_TOP_K, student_id=None):
+        """
+        Top-K (plus the caller's own row) and an ETag over exactly that content.
+
+        Returns:
+            tuple - (body dict, etag str)
+        """
+        body = {'top': self.top(k), 'me': self.rank_of(student_id) if student_id else None}
+        etag = hashlib.sha1(json.dumps(body, sort_keys=True, default=str).encode('utf-8')).hexdigest()
+        return body, etag
+
+    # --- writes ---
+
+    def record_points(self, student_id, points, username: str = None):
+        """Add a round's points to a student; unknown students join the board."""
+        with self._lock:
+            entry = self._entries.get(student_id)
+            updated = {
+                'username': username or (entry['username'] if entry else None),
+                'total_points': (entry['total_points'] if entry else 0) + (points or 0),
+                # Averages need the round count the table keeps; reconciliation refreshes them
+                'average_accuracy': entry['average_accuracy'] if entry else None,
+            }
+            self._remove(student_id)
+            self._insert(student_id, updated)
+            self._version += 1
+            self.increments += 1
+
+    def knows(self, student_id) -> bool:
+        with self._lock:
+            return student_id in self._entries
+
+    def _load_table(self) -> dict:
+        rows = {}
+        start = 0
+        while True:
+            response = (
+                self.client.table(self.table)
+                .select('student_id, username, total_points, average_accuracy')
+                .order('student_id')
+                .range(start, start + RECONCILE_PAGE_SIZE - 1)
+                .execute()
+            )
+            page = response.data or []
+            for row in page:
+                rows[row['student_id']] = {
+                    'username': row.get('username'),
+                    'total_points': row.get('total_points') or 0,
+                    'average_accuracy': row.get('average_accuracy'),
+                }
+            if len(page) < RECONCILE_PAGE_SIZE:
+                return rows
+            start += RECONCILE_PAGE_SIZE
+
+    def reconcile(self) -> int:
+        """
+        Replace the in-memory board with the table's contents.
+
+        Returns:
+            int - number of students whose in-memory row differed from the table
+        """
+        rows = self._load_table()
+        # Built outside the lock so readers and point updates aren't blocked by the reload
+        ranked = RankedSkipList.from_sorted(sorted(_rank_key(sid, entry) for sid, entry in rows.items()))
+        with self._lock:
+            drift = sum(
+                1 for sid in set(rows) | set(self._entries)
+                if rows.get(sid) != self._entries.get(sid)
+            ) if self.loaded else 0
+            self._entries = rows
+            self._ranked = ranked
+            self._version += 1
+            self.loaded = True
+            self.reconciled_at = time.time()
+            self.reconciliations += 1
+            self.drift_corrected += drift
+        if drift:
+            log.info(f"ℹ️ Leaderboard reconciliation corrected {drift} rows")
+        return drift
+
+    def ensure_loaded(self):
+        if not self.loaded:
+            self.reconcile()
+
+    def start_reconciler(self, interval: float):
+        """Reconcile every `interval` seconds in a daemon thread (once per process)."""
+        if interval <= 0:
+            return
+        if self._reconciler_pid == os.getpid() and self._reconciler is not None and self._reconciler.is_alive():
+            return
+        with self._lock:
+            if self._reconciler_pid == os.getpid() and self._reconciler is not None and self._reconciler.is_alive():
+                return
+            self._reconciler_pid = os.getpid()
+            self._reconciler = threading.Thread(
+                target=self._reconcile_forever, args=(interval,), name="leaderboard-reconciler", daemon=True
+            )
+            self._reconciler.start()
+
+    def _reconcile_forever(self, interval: float):
+        while True:
+            time.sleep(interval)
+            try:
+                self.reconcile()
+            except Exception as e:
+                log.error(f"❌ Leaderboard reconciliation failed: {e}")
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {
+                'students': len(self._entries),
+                'version': self._version,
+                'loaded': self.loaded,
+                'reconciled_at': self.reconciled_at,
+                'reconciliations': self.reconciliations,
+                'drift_corrected': self.drift_corrected,
+                'increments': self.increments,
+            }
@@ -0,0 +1,114 @@
+# micro_batcher.py
+"""
+Request coalescing for single-row predictions.
+
+Concurrent requests each submit one row; a background thread collects
+pending rows for up to max_wait_ms (or until max_batch_size rows are
+queued), scores them as one matrix and hands every caller its own result.
+A row that finds nobody else queued is dispatched at once, so a lone
+request never pays max_wait_ms; under load, rows pile up while the
+previous batch is being scored and get batched anyway.
+"""
+import os
+import queue
+import threading
+import time
+from concurrent.futures import Future
+
+from instrumentation import Histogram
+
+
+# Histogram bucket upper bounds
+BATCH_SIZE_BUCKETS = (1, 2, 4, 8, 16, 32, 64, 128, 256)
+QUEUE_WAIT_MS_BUCKETS = (0.1, 0.5, 1, 2, 5, 10, 25, 50, 100, 250)
+
+
+class MicroBatcher:
+    """
+    Coalesces concurrent single-item calls into batched calls.
+
+    Args:
+        predict_batch: callable(list of items) -> list of results, same order
+        max_batch_size: int - dispatch as soon as this many items are queued
+        max_wait_ms: float - longest time the first item of a batch waits for company
+            (only when other items are already queued behind it)
+    """
+
+    def __init__(self, predict_batch, max_batch_size: int = 64, max_wait_ms: float = 2.0):
+        self.predict_batch = predict_batch
+        self.max_batch_size = max(1, int(max_batch_size))
+        self.max_wait = max(0.0, float(max_wait_ms)) / 1000.0
+        self.batch_sizes = Histogram(BATCH_SIZE_BUCKETS)
+        self.queue_wait_ms = Histogram(QUEUE_WAIT_MS_BUCKETS)
+        self._queue = queue.Queue()
+        self._lock = threading.Lock()
+        self._thread = None
+        self._pid = None
+        self.immediate = 0
+
+    def _ensure_worker(self):
+        # Threads do not survive fork(); start (or restart) lazily in each process
+        if self._thread is not None and self._pid == os.getpid() and self._thread.is_alive():
+            return
+        with self._lock:
+            if self._thread is not None and self._pid == os.getpid() and self._thread.is_alive():
+                return
+            self._queue = queue.Queue()
+            self._pid = os.getpid()
+            self._thread = threading.Thread(target=self._run, name="prediction-micro-batcher", daemon=True)
+            self._thread.start()
+
+    def submit(self, item, timeout: float = 5.0):
+        """
+        Queue one item and block until its batch has been scored.
+
+        Returns:
+            the result predict_batch produced for this item
+        """
+        self._ensure_worker()
+        future = Future()
+        self._queue.put((item, future, time.perf_counter()))
+        return future.result(timeout=timeout)
+
+    def _collect(self):
+        first = self._queue.get()
+        batch = [first]
+        if self._queue.empty():
+            # Nobody else is waiting: don't make a lone request pay max_wait
+            self.immediate += 1
+            return batch
+        deadline = time.perf_counter() + self.max_wait
+        while len(batch) < self.max_batch_size:
+            remaining = deadline - time.perf_counter()
+            try:
+                batch.append(self._queue.get(timeout=remaining) if remaining > 0 else self._queue.get_nowait())
+            except queue.Empty:
+                break
+        return batch
+
+    def _run(self):
+        while True:
+            batch = self._collect()
+            started = time.perf_counter()
+            for _, _, enqueued in batch:
+                self.queue_wait_ms.observe((started - enqueued) * 1000.0)
+            self.batch_sizes.observe(len(batch))
+            try:
+                results = list(self.predict_batch([item for item, _, _ in batch]))
+                if len(results) != len(batch):
+                    raise RuntimeError(f"predict_batch returned {len(results)} results for {len(batch)} items")
+                for (_, future, _), result in zip(batch, results):
+                    future.set_result(result)
+            except Exception as e:
+                for _, future, _ in batch:
+                    if not future.done():
+                        future.set_exception(e)
+
+    def stats(self) -> dict:
+        return {
+            'max_batch_size': self.max_batch_size,
+            'max_wait_ms': self.max_wait * 1000.0,
+            'immediate_dispatches': self.immediate,
+            'batch_size': self.batch_sizes.snapshot(),
+            'queue_wait_ms': self.queue_wait_ms.snapshot(),
+        }
@@ -1,12 +1,19 @@
 # model.py
 import os
+import time
+import itertools
+from concurrent.futures import ProcessPoolExecutor, as_completed
 import dill
 import numpy as np
 import pandas as pd
-from sklearn.model_selection import train_test_split
+from sklearn.model_selection import train_test_split, StratifiedKFold
 from sklearn.preprocessing import MinMaxScaler, OrdinalEncoder
 from sklearn.metrics import accuracy_score
+from sklearn.tree import DecisionTreeClassifier
 from xanfis.models.classic_anfis import AnfisClassifier
+from anfis_inference import INFERENCE_ARRAY_KEYS, SURROGATE_ARRAY_KEYS, build_inference_components
+from prediction_cache import ABILITY_VALUES, MAX_ROUND_QUESTIONS, round_fraction_values
+from model_artifact import write_artifact, clear_current_version, default_artifact_root
 
 
 def _is_picklable(obj) -> bool:
@@ -29,9 +36,221 @@ def _build_model_bundle(model: AnfisClassifier, init_params: dict) -> dict:
     }
 
 
-def train_and_save_model():
-    # 1. Load dataset
+def export_inference_arrays(network, scaler, encoder) -> dict:
+    """Flatten a trained Gaussian ANFIS network and its preprocessing into plain arrays."""
+    if getattr(network, "mf_class", None) != "GaussianMembership":
+        raise ValueError(f"Only Gaussian memberships can be exported, got {getattr(network, 'mf_class', None)}")
+    if getattr(network, "vanishing_strategy", "prod") != "prod":
+        raise ValueError(f"Only the 'prod' rule strength can be exported, got {network.vanishing_strategy}")
+    centers = np.stack([m.centers.detach().cpu().numpy() for m in network.memberships])
+    widths = np.stack([m.widths.detach().cpu().numpy() for m in network.memberships])
+    coeffs = network.coeffs.detach().cpu().numpy()
+    return {
+        "centers": centers.astype(np.float64),
+        "widths": widths.astype(np.float64),
+        "coeffs": coeffs.astype(np.float64),
+        "scaler_min": np.asarray(scaler.min_, dtype=np.float64),
+        "scaler_scale": np.asarray(scaler.scale_, dtype=np.float64),
+        "categories": np.asarray(encoder.categories_[0]).astype(str),
+    }
+
+
+def check_inference_parity(model: AnfisClassifier, arrays: dict, X) -> float:
+    """Return the fraction of rows where the NumPy engine agrees with AnfisClassifier.predict."""
+    engine, _, _ = build_inference_components(arrays)
+    expected = np.asarray(model.predict(X))
+    actual = engine.predict(X)
+    return float(np.mean(expected == actual)) if len(expected) else 1.0
+
+
+# Input/output contract recorded in every artifact manifest
+FEATURE_SCHEMA = {
+    "numerical": ["accuracy", "hint_usage", "mistake", "ability"],
+    "categorical": {"difficulty": ["Easy", "Medium", "Hard"]},
+    "column_order": ["accuracy", "hint_usage", "mistake", "ability", "difficulty"],
+    "target": "scaffold_level",
+    "classes": [0, 1, 2],
+}
+
+
+# Depth of the distilled surrogate tree (--distill)
+SURROGATE_MAX_DEPTH = 8
+
+
+def distillation_grid(scaler, encoder):
+    """
+    Every end-of-round input the app can score, preprocessed like training rows.
+
+    Accuracy and hint usage are k/n ratios, mistakes 0..MAX_ROUND_QUESTIONS,
+    ability -1/0/1 and difficulty each encoder category (the same grid the
+    app's prediction cache enumerates), so the surrogate is fitted where
+    live traffic actually lands, beyond the ranges seen in scaffold_data.csv.
+    """
+    fractions = round_fraction_values()
+    numerical = np.array(list(itertools.product(
+        fractions, fractions, range(MAX_ROUND_QUESTIONS + 1), ABILITY_VALUES
+    )), dtype=float)
+    categories = encoder.categories_[0]
+    return np.vstack([
+        np.column_stack((
+            scaler.transform(numerical),
+            encoder.transform(np.full((len(numerical), 1), category)).astype(float),
+        ))
+        for category in categories
+    ])
+
+
+def export_surrogate_arrays(tree: DecisionTreeClassifier) -> dict:
+    """Flatten a fitted sklearn decision tree into SURROGATE_ARRAY_KEYS arrays."""
+    structure = tree.tree_
+    leaf_class = tree.classes_[np.argmax(structure.value[:, 0, :], axis=1)]
+    return {
+        "tree_feature": structure.feature.astype(np.int64),
+        "tree_threshold": structure.threshold.astype(np.float64),
+        "tree_left": structure.children_left.astype(np.int64),
+        "tree_right": structure.children_right.astype(np.int64),
+        "tree_class": np.asarray(leaf_class, dtype=np.int64),
+    }
+
+
+def distill_surrogate(arrays: dict, scaler, encoder, X_train, X_test, y_test,
+                      max_depth: int = SURROGATE_MAX_DEPTH):
+    """
+    Fit a shallow decision tree on the ANFIS outputs and report how faithful it is.
+
+    The teacher labels come from the exported NumPy engine (identical to
+    AnfisClassifier.predict) over the training rows plus distillation_grid().
+
+    Args:
+        arrays: dict - exported ANFIS inference arrays
+        scaler, encoder: fitted preprocessing (used to build the synthetic grid)
+        X_train: array - preprocessed training rows
+        X_test, y_test: held-out rows and their true scaffold levels
+        max_depth: int - surrogate tree depth
+
+    Returns:
+        tuple - (surrogate arrays dict, report dict)
+    """
+    teacher, _, _ = build_inference_components(arrays)
+    X_grid = distillation_grid(scaler, encoder)
+    X_fit = np.vstack((X_train, X_grid))
+    y_fit = teacher.predict(X_fit)
+
+    print(f"🌳 Distilling a depth-{max_depth} surrogate from {len(X_train)} training + {len(X_grid)} grid rows...")
+    tree = DecisionTreeClassifier(max_depth=max_depth, random_state=42)
+    tree.fit(X_fit, y_fit)
+    surrogate_arrays = export_surrogate_arrays(tree)
+    surrogate, _, _ = build_inference_components({**arrays, **surrogate_arrays}, predictor="surrogate")
+
+    def agreement(X):
+        return float(np.mean(surrogate.predict(X) == teacher.predict(X))) if len(X) else 1.0
+
+    report = {
+        "max_depth": int(max_depth),
+        "depth": int(surrogate.depth),
+        "n_leaves": int(tree.get_n_leaves()),
+        "n_nodes": int(tree.tree_.node_count),
+        "agreement_train": agreement(X_train),
+        "agreement_grid": agreement(X_grid),
+        "agreement_test": agreement(X_test),
+        "anfis_test_accuracy": float(accuracy_score(y_test, teacher.predict(X_test))),
+        "test_accuracy": float(accuracy_score(y_test, surrogate.predict(X_test))),
+        # The NumPy traversal must reproduce sklearn's own tree exactly
+        "export_parity": float(np.mean(surrogate.predict(X_fit) == tree.predict(X_fit))),
+    }
+    print(f"🔍 Surrogate vs ANFIS agreement: train={report['agreement_train']:.4f} "
+          f"grid={report['agreement_grid']:.4f} test={report['agreement_test']:.4f}")
+    print(f"✅ Test accuracy: surrogate={report['test_accuracy']:.4f} "
+          f"ANFIS={report['anfis_test_accuracy']:.4f} "
+          f"({report['n_leaves']} leaves, depth {report['depth']})")
+    if report["export_parity"] != 1.0:
+        raise ValueError(f"Exported surrogate disagrees with the fitted tree (parity {report['export_parity']:.4f})")
+    return surrogate_arrays, report
+
+
+def publish_inference_artifact(arrays: dict, metadata: dict, artifact_root: str = None) -> str:
+    """Write the serving arrays (and the surrogate, if distilled) as a new versioned artifact and make it current."""
+    artifact_root = artifact_root or default_artifact_root()
+    version = write_artifact(
+        artifact_root,
+        {key: arrays[key] for key in INFERENCE_ARRAY_KEYS + SURROGATE_ARRAY_KEYS if key in arrays},
+        metadata=metadata,
+        feature_schema=FEATURE_SCHEMA,
+    )
+    print(f"✅ Model artifact published -> {os.path.join(artifact_root, version)}")
+    return version
+
+
+def export_saved_model(model_dir: str = None, distill: bool = False, surrogate_depth: int = SURROGATE_MAX_DEPTH):
+    """
+    Publish a serving artifact from the existing pickles in model_files/ without retraining.
+
+    Args:
+        model_dir: str - directory holding the pickles (defaults to model_files/)
+        distill: bool - also distill and publish the surrogate tree
+        surrogate_depth: int - surrogate tree depth
+
+    Raises:
+        ValueError - the NumPy engine does not reproduce the pickled model on the held-out split
+    """
     base_dir = os.path.dirname(os.path.abspath(__file__))
+    model_dir = model_dir or os.path.join(base_dir, "model_files")
+    bundle = load_model_bundle(model_dir)
+    with open(os.path.join(model_dir, "scaler.pkl"), "rb") as f:
+        scaler = dill.load(f)
+    with open(os.path.join(model_dir, "encoder.pkl"), "rb") as f:
+        encoder = dill.load(f)
+    arrays = export_inference_arrays(bundle["state"]["network"], scaler, encoder)
+
+    # Same held-out split train_and_save_model checks, preprocessed with the saved pickles
+    numerical_features, categorical_features, y = _read_training_frame(base_dir)
+    X_preprocessed = np.column_stack((
+        scaler.transform(numerical_features),
+        encoder.transform(categorical_features).astype(float),
+    ))
+    X_train, X_test, _, y_test = train_test_split(X_preprocessed, y, test_size=0.2, random_state=42)
+    parity = check_inference_parity(restore_model(bundle), arrays, X_test)
+    print(f"🔍 NumPy/AnfisClassifier agreement on test split: {parity:.4f}")
+    if parity != 1.0:
+        # Leave the current artifact in place rather than publish one that serves different levels
+        raise ValueError(f"Exported arrays disagree with the pickled model (parity {parity:.4f}); not publishing")
+
+    metadata = {
+        "source": "export_saved_model",
+        "init_params": bundle.get("init_params", {}),
+        "parity": parity,
+        "n_test": int(len(X_test)),
+    }
+    if distill:
+        surrogate_arrays, metadata["surrogate"] = distill_surrogate(
+            arrays, scaler, encoder, X_train, X_test, y_test, surrogate_depth
+        )
+        arrays.update(surrogate_arrays)
+    return publish_inference_artifact(arrays, metadata, os.path.join(model_dir, "artifacts"))
+
+
+# Default ANFIS training settings; search candidates override a subset of these
+BASE_INIT_PARAMS = dict(
+    mf_class="Gaussian",
+    num_rules=15,
+    epochs=200,
+    n_patience=10,
+    batch_size=32,
+    optim="Adam",
+    verbose=False,
+)
+
+# Hyperparameter grid explored by --search
+SEARCH_SPACE = {
+    "num_rules": [5, 10, 15, 20],
+    "mf_class": ["Gaussian", "GBell", "Sigmoid"],
+    "lr": [0.01, 0.001],
+}
+
+
+def _read_training_frame(base_dir: str):
+    """Load scaffold_data.csv as shuffled (numerical, categorical, y) in the fixed training order."""
+    # 1. Load dataset
     dataset_path = os.path.join(base_dir, "scaffold_data.csv")
     print(f"📄 Loading dataset from: {dataset_path}")
     df = pd.read_csv(dataset_path)
@@ -50,6 +269,12 @@ def train_and_save_model():
     numerical_features = numerical_features.iloc[indices]
     categorical_features = categorical_features.iloc[indices]
     y = y[indices]
+    return numerical_features, categorical_features, y
+
+
+def _load_training_data(base_dir: str):
+    """Load scaffold_data.csv and fit the preprocessing used for training and serving."""
+    numerical_features, categorical_features, y = _read_training_frame(base_dir)
 
     # 5. Scale numerical
     print("🔧 Fitting MinMaxScaler on numerical features...")
@@ -63,29 +288,289 @@ def train_and_save_model():
 
     # 7. Combine
     X_preprocessed = np.column_stack((numerical_scaled, categorical_encoded))
+    return X_preprocessed, y, scaler, encoder
+
+
+def _candidate_init_params(candidate: dict) -> dict:
+    """Turn a search-space point into AnfisClassifier init params."""
+    init_params = dict(BASE_INIT_PARAMS)
+    init_params["num_rules"] = candidate["num_rules"]
+    init_params["mf_class"] = candidate["mf_class"]
+    init_params["optim_params"] = {"lr": candidate["lr"]}
+    return init_params
+
+
+def _evaluate_fold(candidate_idx: int, init_params: dict, seed: int, X_train, y_train, X_val, y_val):
+    """Process-pool job: fit one candidate on one CV fold / seed and score it."""
+    import torch
+    # One BLAS/OpenMP thread per process; the pool provides the parallelism
+    torch.set_num_threads(1)
+    started = time.perf_counter()
+    model = AnfisClassifier(**init_params, seed=seed)
+    model.fit(X_train, y_train)
+    acc = accuracy_score(y_val, model.predict(X_val))
+    return candidate_idx, float(acc), time.perf_counter() - started
+
+
+def search_hyperparameters(X, y, search_space: dict = None, n_folds: int = 5, seeds=(42,),
+                           workers: int = None, abort_margin: float = 0.05):
+    """
+    Cross-validated grid search over ANFIS configurations, fanned out across a process pool.
+
+    Jobs are submitted fold-major: a round is one (fold, seed) job per
+    candidate. Rounds are settled in order once every live candidate has
+    reported; from the second fold on, a candidate whose mean over the
+    settled rounds falls more than abort_margin below the leader's mean
+    over the same rounds is aborted and its not-yet-started jobs are
+    cancelled. Decisions therefore depend only on the scores, never on the
+    order in which workers happen to finish.
+
+    Args:
+        X, y: preprocessed training features and labels
+        search_space: dict of lists (num_rules, mf_class, lr); defaults to SEARCH_SPACE
+        n_folds: int - stratified CV folds
+        seeds: iterable of int - model seeds; every fold is trained once per seed
+        workers: int - pool size (defaults to os.cpu_count())
+        abort_margin: float - accuracy gap that aborts a losing candidate
+
+    Returns:
+        tuple - (best_init_params, results) where results is one dict per candidate
+    """
+    search_space = search_space or SEARCH_SPACE
+    keys = sorted(search_space)
+    candidates = [dict(zip(keys, values)) for values in itertools.product(*(search_space[k] for k in keys))]
+    folds = list(StratifiedKFold(n_splits=n_folds, shuffle=True, random_state=42).split(X, y))
+    seeds = list(seeds)
+    jobs_per_candidate = len(folds) * len(seeds)
+    # Rounds (fold x seed) every live candidate must have settled before anyone is aborted: two folds
+    min_rounds = min(jobs_per_candidate, 2 * len(seeds))
+
+    results = [
+        {"candidate": c, "init_params": _candidate_init_params(c), "scores": [],
+         "train_seconds": 0.0, "status": "running", "finished": None, "rounds": 0}
+        for c in candidates
+    ]
+    print(f"🔎 Searching {len(candidates)} candidates x {n_folds} folds x {len(seeds)} seeds "
+          f"on {workers or os.cpu_count()} workers...")
+
+    search_started = time.perf_counter()
+    futures_by_candidate = {i: [] for i in range(len(candidates))}
+    job_of = {}                                     # future -> (candidate, round)
+    round_scores = [{} for _ in candidates]         # candidate -> {round: accuracy}
+    settled = 0                                     # rounds decided for every live candidate
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        for round_idx, ((train_idx, val_idx), seed) in enumerate(itertools.product(folds, seeds)):
+            for i, result in enumerate(results):
+                future = pool.submit(
+                    _evaluate_fold, i, result["init_params"], seed,
+                    X[train_idx], y[train_idx], X[val_idx], y[val_idx],
+                )
+                futures_by_candidate[i].append(future)
+                job_of[future] = (i, round_idx)
+        all_futures = [f for fs in futures_by_candidate.values() for f in fs]
+
+        for future in as_completed(all_futures):
+            if future.cancelled():
+                continue
+            i, round_idx = job_of[future]
+            result = results[i]
+            if result["status"] != "running":
+                continue
+            try:
+                _, acc, seconds = future.result()
+            except Exception as e:
+                # Treat a crashing configuration as a loser rather than failing the search
+                print(f"❌ Candidate {result['candidate']} failed: {e}")
+                result["status"] = "failed"
+                for f in futures_by_candidate[i]:
+                    f.cancel()
+            else:
+                round_scores[i][round_idx] = acc
+                result["train_seconds"] += seconds
+                if len(round_scores[i]) == jobs_per_candidate:
+                    result["finished"] = time.perf_counter() - search_started
+
+            # Settle rounds in order as soon as every live candidate has reported them
+            while settled < jobs_per_candidate:
+                live = [k for k, r in enumerate(results) if r["status"] == "running"]
+                if not all(settled in round_scores[k] for k in live):
+                    break
+                settled += 1
+                for k in live:
+                    results[k]["rounds"] = settled
+                if settled < min_rounds or not live:
+                    continue
+                # Early abort: every live candidate is compared over the same settled rounds
+                means = {k: np.mean([round_scores[k][q] for q in range(settled)]) for k in live}
+                leader = max(means.values())
+                for k in live:
+                    if means[k] < leader - abort_margin:
+                        results[k]["status"] = "aborted"
+                        results[k]["finished"] = time.perf_counter() - search_started
+                        for f in futures_by_candidate[k]:
+                            f.cancel()
+
+    for k, r in enumerate(results):
+        if r["status"] == "running":
+            r["status"] = "done"
+        # Only settled rounds count, so late results of aborted candidates don't change the report
+        settled_rounds = range(r["rounds"]) if r["status"] != "failed" else sorted(round_scores[k])
+        r["scores"] = [round_scores[k][q] for q in settled_rounds]
+
+    for r in results:
+        r["mean_accuracy"] = float(np.mean(r["scores"])) if r["scores"] else 0.0
+        r["std_accuracy"] = float(np.std(r["scores"])) if r["scores"] else 0.0
+        print(f"   {r['status']:>8} {r['candidate']}: acc={r['mean_accuracy']:.4f}±{r['std_accuracy']:.4f} "
+              f"({len(r['scores'])}/{jobs_per_candidate} jobs, {r['train_seconds']:.1f}s train time, "
+              f"settled at {r['finished'] or 0:.1f}s wall)")
+
+    # Deterministic pick: highest mean, then lowest spread, then grid order
+    finished = [(k, r) for k, r in enumerate(results) if r["status"] == "done"]
+    if not finished:
+        raise RuntimeError("Hyperparameter search finished without a completed candidate")
+    best_idx, best = min(finished, key=lambda kr: (-round(kr[1]["mean_accuracy"], 6), round(kr[1]["std_accuracy"], 6), kr[0]))
+    print(f"🏁 Search finished in {time.perf_counter() - search_started:.1f}s; "
+          f"best {best['candidate']} acc={best['mean_accuracy']:.4f}")
+    return best["init_params"], results
+
+
+def load_model_bundle(model_dir: str = None) -> dict:
+    """Read the pickled model bundle written by train_and_save_model."""
+    base_dir = os.path.dirname(os.path.abspath(__file__))
+    model_dir = model_dir or os.path.join(base_dir, "model_files")
+    with open(os.path.join(model_dir, "anfis_model.pkl"), "rb") as f:
+        return dill.load(f)
+
+
+def restore_model(bundle: dict) -> AnfisClassifier:
+    """Rebuild the pickled AnfisClassifier from its bundle (init_params + picklable state)."""
+    model = AnfisClassifier(**bundle.get("init_params", {}))
+    for key, value in bundle.get("state", {}).items():
+        setattr(model, key, value)
+    return model
+
+
+def warm_start_model(bundle: dict, arrays: dict) -> AnfisClassifier:
+    """
+    Rebuild the pickled AnfisClassifier and load a serving artifact's parameters into it.
+
+    The bundle provides the architecture and training settings; the
+    artifact provides the weights, so a warm start continues from whatever
+    version is live rather than from the last full retrain.
+
+    Args:
+        bundle: dict - pickled bundle (init_params + picklable state)
+        arrays: dict - exported inference arrays of the version to continue from
+
+    Returns:
+        AnfisClassifier - ready for fine_tune_model / predict
+    """
+    import torch
+    model = restore_model(bundle)
+    network = getattr(model, "network", None)
+    if network is None:
+        raise ValueError("Model bundle has no trained network to warm-start from")
+    membership_shape = (len(network.memberships),) + tuple(network.memberships[0].centers.shape)
+    expected = {"centers": membership_shape, "widths": membership_shape, "coeffs": tuple(network.coeffs.shape)}
+    for key, shape in expected.items():
+        if tuple(np.shape(arrays[key])) != shape:
+            raise ValueError(f"Artifact {key} shape {np.shape(arrays[key])} does not match the pickled network {shape}")
+    with torch.no_grad():
+        for i, membership in enumerate(network.memberships):
+            membership.centers.copy_(torch.as_tensor(np.array(arrays["centers"][i]), dtype=membership.centers.dtype))
+            membership.widths.copy_(torch.as_tensor(np.array(arrays["widths"][i]), dtype=membership.widths.dtype))
+        network.coeffs.copy_(torch.as_tensor(np.array(arrays["coeffs"]), dtype=network.coeffs.dtype))
+    return model
+
+
+# Fine-tuning step size; the warm-started network only needs small corrections
+FINE_TUNE_LR = 0.01
+
+
+def fine_tune_model(model: AnfisClassifier, X, y, epochs: int, lr: float = FINE_TUNE_LR,
+                    seed: int = 42) -> AnfisClassifier:
+    """
+    Continue training a fitted AnfisClassifier in place for at most `epochs` epochs.
+
+    Every parameter (memberships and consequents) is updated by the model's
+    configured optimizer on the cross-entropy of its class probabilities.
+    xanfis' own hybrid loop is not reused: it re-solves the consequents by
+    least squares on every mini-batch, which would throw the warm-started
+    consequents away and leave them fitted to the last batch.
+
+    Args:
+        model: AnfisClassifier - e.g. from warm_start_model
+        X, y: preprocessed rows and class labels
+        epochs: int - upper bound on epochs (the model's early stopping may end sooner)
+        lr: float - optimizer learning rate
+        seed: int - mini-batch shuffling seed
+
+    Returns:
+        AnfisClassifier - the same model
+    """
+    import torch
+    from xanfis.models.base_anfis import EarlyStopper
+    network = model.network
+    optimizer = getattr(torch.optim, model.optim)(network.parameters(), **dict(model.optim_params or {}, lr=lr))
+    stopper = EarlyStopper(patience=model.n_patience, epsilon=model.epsilon) if model.early_stopping else None
+    X_tensor = torch.tensor(np.asarray(X, dtype=float), dtype=torch.float32).to(model.device)
+    y_tensor = torch.tensor(np.asarray(y), dtype=torch.long).to(model.device)
+    generator = torch.Generator().manual_seed(seed)
+
+    for _ in range(int(epochs)):
+        network.train()
+        total_loss, batches = 0.0, 0
+        for idx in torch.randperm(len(X_tensor), generator=generator).split(model.batch_size):
+            optimizer.zero_grad()
+            probabilities = network(X_tensor[idx])
+            loss = torch.nn.functional.nll_loss(torch.log(probabilities + 1e-12), y_tensor[idx])
+            loss.backward()
+            optimizer.step()
+            total_loss += loss.item()
+            batches += 1
+        if stopper is not None and batches and stopper.early_stop(total_loss / batches):
+            break
+    network.eval()
+    return model
+
+
+def train_and_save_model(search: bool = False, workers: int = None, n_folds: int = 5, seeds=(42,),
+                         distill: bool = False, surrogate_depth: int = SURROGATE_MAX_DEPTH):
+    """
+    Train the scaffold-level ANFIS model and save it (plus preprocessing) to model_files/.
+
+    Args:
+        search: bool - run the parallel cross-validated hyperparameter search first
+        workers: int - process-pool size for the search
+        n_folds: int - CV folds for the search
+        seeds: iterable of int - seeds per fold for the search
+        distill: bool - also distill a surrogate tree into the published artifact
+        surrogate_depth: int - surrogate tree depth
+    """
+    base_dir = os.path.dirname(os.path.abspath(__file__))
+    X_preprocessed, y, scaler, encoder = _load_training_data(base_dir)
 
     # 8. Train/test split
     X_train, X_test, y_train, y_test = train_test_split(
         X_preprocessed, y, test_size=0.2, random_state=42
     )
 
-    # 9. Grid search best num_rules
-    num_rules_options = [15]
+    # 9. Pick the configuration: CV search over SEARCH_SPACE, or the fixed default
+    if search:
+        search_init_params, _ = search_hyperparameters(
+            X_train, y_train, n_folds=n_folds, seeds=seeds, workers=workers
+        )
+        candidate_params = [search_init_params]
+    else:
+        candidate_params = [dict(BASE_INIT_PARAMS, num_rules=num_rules) for num_rules in [15]]
+
     best_accuracy = 0
     best_num_rules = None
     best_model = None
 
-    for num_rules in num_rules_options:
+    for init_params in candidate_params:
+        num_rules = init_params["num_rules"]
         print(f"🚀 Training ANFIS with num_rules={num_rules} ...")
-        init_params = dict(
-            mf_class="Gaussian",
-            num_rules=num_rules,
-            epochs=200,
-            n_patience=10,
-            batch_size=32,
-            optim="Adam",
-            verbose=False,
-        )
         model = AnfisClassifier(**init_params)
         model.fit(X_train, y_train)
 
@@ -93,7 +578,7 @@ def train_and_save_model():
         test_acc = accuracy_score(y_test, y_test_pred)
         print(f"✅ num_rules={num_rules}, Test Accuracy={test_acc:.4f}")
 
-        if test_acc > best_accuracy:
+        if best_model is None or test_acc > best_accuracy:
             best_accuracy = test_acc
             best_num_rules = num_rules
             best_model = model
@@ -109,6 +594,7 @@ def train_and_save_model():
     scaler_path = os.path.join(model_dir, "scaler.pkl")
     encoder_path = os.path.join(model_dir, "encoder.pkl")
     model_path = os.path.join(model_dir, "anfis_model.pkl")
+    artifact_root = os.path.join(model_dir, "artifacts")
 
     # Build a serializable bundle instead of dumping the raw model object
     print("🧱 Building serializable model bundle...")
@@ -141,8 +627,64 @@ def train_and_save_model():
         print(f"❌ Failed to save model: {e}")
         raise
 
+    # Export plain arrays for the NumPy serving path, but only if it reproduces
+    # AnfisClassifier.predict exactly on the held-out split
+    print("🧮 Exporting inference arrays for NumPy serving...")
+    try:
+        arrays = export_inference_arrays(best_model.network, scaler, encoder)
+        parity = check_inference_parity(best_model, arrays, X_test)
+    except ValueError as e:
+        # e.g. a non-Gaussian membership won the search
+        print(f"⚠️ {e}")
+        arrays, parity = None, 0.0
+    print(f"🔍 NumPy/AnfisClassifier agreement on test split: {parity:.4f}")
+    if parity == 1.0:
+        metadata = {
+            "source": "train_and_save_model",
+            "init_params": best_init_params,
+            "test_accuracy": float(best_accuracy),
+            "parity": parity,
+            "n_train": int(len(X_train)),
+            "n_test": int(len(X_test)),
+        }
+        if distill:
+            surrogate_arrays, metadata["surrogate"] = distill_surrogate(
+                arrays, scaler, encoder, X_train, X_test, y_test, surrogate_depth
+            )
+            arrays.update(surrogate_arrays)
+        publish_inference_artifact(arrays, metadata, artifact_root)
+    else:
+        # A stale artifact would silently serve the previous model
+        clear_current_version(artifact_root)
+        print("⚠️ Parity check failed; app will fall back to the pickled model")
+
     print("🎉 ✅ Model and preprocessing saved in 'model_files/'")
 
 if __name__ == "__main__":
-    train_and_save_model()
+    import argparse
+    parser = argparse.ArgumentParser(description="Train the scaffold-level ANFIS model.")
+    parser.add_argument("--export-only", action="store_true",
+                        help="export inference arrays from the existing pickles without retraining")
+    parser.add_argument("--search", action="store_true",
+                        help="run the parallel cross-validated hyperparameter search before training")
+    parser.add_argument("--workers", type=int, default=None, help="search process-pool size (default: CPU count)")
+    parser.add_argument("--folds", type=int, default=5, help="CV folds per search candidate")
+    parser.add_argument("--seeds", default="42", help="comma-separated model seeds per fold, e.g. 42,7,1234")
+    parser.add_argument("--distill", action="store_true",
+                        help="also distill a shallow decision-tree surrogate into the artifact (SCAFFOLD_PREDICTOR=surrogate)")
+    parser.add_argument("--surrogate-depth", type=int, default=SURROGATE_MAX_DEPTH,
+                        help=f"surrogate tree depth (default {SURROGATE_MAX_DEPTH})")
+    args = parser.parse_args()
+
+    if args.export_only:
+        export_saved_model(distill=args.distill, surrogate_depth=args.surrogate_depth)
+    else:
+        train_and_save_model(
+            search=args.search,
+            workers=args.workers,
+            n_folds=args.folds,
+            seeds=[int(s) for s in args.seeds.split(",") if s.strip()],
+            distill=args.distill,
+            surrogate_depth=args.surrogate_depth,
+        )
 
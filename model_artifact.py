@@ -0,0 +1,161 @@
+# model_artifact.py
+"""
+Single versioned model artifact for serving.
+
+Layout under model_files/artifacts/:
+
+    CURRENT                   name of the live version (replaced atomically)
+    <version>/manifest.json   checksum, training metadata, feature schema
+    <version>/<array>.npy     one uncompressed array per inference parameter
+
+The .npy files are opened with np.load(mmap_mode='r'), so every worker
+process maps the same page-cache pages instead of holding a private copy.
+"""
+import hashlib
+import json
+import os
+import shutil
+import time
+
+import numpy as np
+
+
+ARTIFACT_FORMAT_VERSION = 1
+CURRENT_POINTER = "CURRENT"
+MANIFEST_NAME = "manifest.json"
+
+
+def default_artifact_root(base_dir: str = None) -> str:
+    base_dir = base_dir or os.path.dirname(os.path.abspath(__file__))
+    return os.path.join(base_dir, "model_files", "artifacts")
+
+
+def _array_digest(array: np.ndarray) -> str:
+    return hashlib.sha256(np.ascontiguousarray(array).tobytes()).hexdigest()
+
+
+def _combined_checksum(array_entries: dict) -> str:
+    digest = hashlib.sha256()
+    for name in sorted(array_entries):
+        digest.update(name.encode("utf-8"))
+        digest.update(array_entries[name]["sha256"].encode("ascii"))
+    return digest.hexdigest()
+
+
+def write_artifact(root: str, arrays: dict, metadata: dict = None, feature_schema: dict = None,
+                   make_current: bool = True) -> str:
+    """
+    Write arrays + manifest as a new version and (optionally) make it current.
+
+    The version directory is assembled under a temporary name and renamed into
+    place, then CURRENT is swapped with os.replace, so readers never observe a
+    half-written artifact.
+
+    Returns:
+        str - the new version name
+    """
+    os.makedirs(root, exist_ok=True)
+    entries = {}
+    for name, array in arrays.items():
+        array = np.ascontiguousarray(array)
+        entries[name] = {
+            "file": f"{name}.npy",
+            "dtype": array.dtype.str,
+            "shape": list(array.shape),
+            "sha256": _array_digest(array),
+        }
+    checksum = _combined_checksum(entries)
+    version = time.strftime("%Y%m%dT%H%M%SZ", time.gmtime()) + "-" + checksum[:8]
+
+    tmp_dir = os.path.join(root, f".tmp-{version}-{os.getpid()}")
+    os.makedirs(tmp_dir)
+    try:
+        for name, array in arrays.items():
+            np.save(os.path.join(tmp_dir, entries[name]["file"]), np.ascontiguousarray(array), allow_pickle=False)
+        manifest = {
+            "format_version": ARTIFACT_FORMAT_VERSION,
+            "version": version,
+            "created_at": time.strftime("%Y-%m-%dT%H:%M:%SZ", time.gmtime()),
+            "checksum": checksum,
+            "arrays": entries,
+            "feature_schema": feature_schema or {},
+            "metadata": metadata or {},
+        }
+        with open(os.path.join(tmp_dir, MANIFEST_NAME), "w", encoding="utf-8") as f:
+            json.dump(manifest, f, indent=2, sort_keys=True, default=str)
+        final_dir = os.path.join(root, version)
+        if os.path.exists(final_dir):
+            # Identical content written within the same second
+            shutil.rmtree(tmp_dir)
+        else:
+            os.replace(tmp_dir, final_dir)
+    except Exception:
+        shutil.rmtree(tmp_dir, ignore_errors=True)
+        raise
+
+    if make_current:
+        set_current_version(root, version)
+    return version
+
+
+def set_current_version(root: str, version: str):
+    """Atomically point CURRENT at an existing version."""
+    if not os.path.isfile(os.path.join(root, version, MANIFEST_NAME)):
+        raise FileNotFoundError(f"No artifact version {version} under {root}")
+    tmp_path = os.path.join(root, f".{CURRENT_POINTER}.{os.getpid()}.tmp")
+    with open(tmp_path, "w", encoding="utf-8") as f:
+        f.write(version + "\n")
+    os.replace(tmp_path, os.path.join(root, CURRENT_POINTER))
+
+
+def clear_current_version(root: str):
+    """Unpublish: serving falls back to the pickled model until a new version is set."""
+    try:
+        os.remove(os.path.join(root, CURRENT_POINTER))
+    except FileNotFoundError:
+        pass
+
+
+def read_current_version(root: str):
+    """Return the live version name, or None if no artifact has been published."""
+    try:
+        with open(os.path.join(root, CURRENT_POINTER), encoding="utf-8") as f:
+            return f.read().strip() or None
+    except FileNotFoundError:
+        return None
+
+
+def load_artifact(root: str, version: str = None, mmap: bool = True, verify: bool = True):
+    """
+    Open a published artifact.
+
+    Args:
+        root: str - artifact root directory
+        version: str - version to open (defaults to CURRENT)
+        mmap: bool - memory-map the arrays read-only instead of reading them into private memory
+        verify: bool - check every array against the manifest checksums
+
+    Returns:
+        tuple - (arrays dict, manifest dict)
+    """
+    version = version or read_current_version(root)
+    if not version:
+        raise FileNotFoundError(f"No current model artifact under {root}")
+    version_dir = os.path.join(root, version)
+    with open(os.path.join(version_dir, MANIFEST_NAME), encoding="utf-8") as f:
+        manifest = json.load(f)
+    if manifest.get("format_version") != ARTIFACT_FORMAT_VERSION:
+        raise ValueError(f"Unsupported artifact format {manifest.get('format_version')}")
+
+    arrays = {}
+    for name, entry in manifest["arrays"].items():
+        array = np.load(os.path.join(version_dir, entry["file"]), mmap_mode="r" if mmap else None,
+                        allow_pickle=False)
+        if array.dtype.str != entry["dtype"] or list(array.shape) != entry["shape"]:
+            raise ValueError(f"Artifact array {name} does not match its manifest entry")
+        if verify and _array_digest(array) != entry["sha256"]:
+            raise ValueError(f"Checksum mismatch for artifact array {name}")
+        arrays[name] = array
+    if verify and _combined_checksum(manifest["arrays"]) != manifest["checksum"]:
+        raise ValueError("Artifact manifest checksum mismatch")
+    return arrays, manifest
@@ -0,0 +1,141 @@
+# prediction_cache.py
+"""
+Memoized scaffold-level predictions over the model's discrete input space.
+
+The model inputs are coarse: difficulty has 3 values, ability is -1/0/1,
+mistake_count is a small integer, and accuracy/hint_usage arrive rounded to
+3 decimals by quiz.js. Rows on that grid are keyed exactly and served from
+memory; anything off the grid is reported as a fallback so the caller runs
+the real model.
+"""
+import threading
+from collections import OrderedDict
+
+
+# Grid resolution of accuracy / hint_usage (quiz.js uses toFixed(3))
+GRID_DECIMALS = 3
+
+# A round ends after at most this many main questions, so accuracy and
+# hint_usage are k/n fractions with n <= this value
+MAX_ROUND_QUESTIONS = 10
+
+ABILITY_VALUES = (-1, 0, 1)
+
+
+def _on_grid(value: float) -> bool:
+    return 0.0 <= value <= 1.0 and abs(value - round(value, GRID_DECIMALS)) < 1e-9
+
+
+def make_cache_key(numerical, difficulty):
+    """
+    Map a normalized feature row onto the discrete grid.
+
+    Args:
+        numerical: tuple - (accuracy, hint_usage, mistake_count, ability) as floats
+        difficulty: str - title-cased difficulty
+
+    Returns:
+        tuple - hashable grid key, or None if the row is off the grid
+    """
+    accuracy, hint_usage, mistake_count, ability = numerical
+    if not (_on_grid(accuracy) and _on_grid(hint_usage)):
+        return None
+    if mistake_count < 0 or not float(mistake_count).is_integer():
+        return None
+    if ability not in ABILITY_VALUES:
+        return None
+    return (
+        round(accuracy, GRID_DECIMALS),
+        round(hint_usage, GRID_DECIMALS),
+        int(mistake_count),
+        int(ability),
+        difficulty,
+    )
+
+
+def round_fraction_values(max_questions: int = MAX_ROUND_QUESTIONS):
+    """All distinct k/n ratios (n <= max_questions) as quiz.js would round them."""
+    values = {0.0}
+    for n in range(1, max_questions + 1):
+        for k in range(n + 1):
+            values.add(round(k / n, GRID_DECIMALS))
+    return sorted(values)
+
+
+class PredictionCache:
+    """
+    Thread-safe scaffold-level lookup table.
+
+    Keys pinned by warm() (the eagerly enumerated grid) are never evicted;
+    everything else lives in a bounded LRU.
+    """
+
+    def __init__(self, maxsize: int = 50000):
+        self.maxsize = maxsize
+        self._pinned = {}
+        self._lru = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.fallbacks = 0
+        self.evictions = 0
+        # Bumped by clear(); put() drops levels computed against an older generation
+        self.generation = 0
+
+    def get(self, key):
+        """Return the memoized level for key, or None on a miss."""
+        with self._lock:
+            level = self._pinned.get(key)
+            if level is None:
+                level = self._lru.get(key)
+                if level is not None:
+                    self._lru.move_to_end(key)
+            if level is None:
+                self.misses += 1
+            else:
+                self.hits += 1
+            return level
+
+    def put(self, key, level: int, generation: int = None):
+        with self._lock:
+            if key in self._pinned or (generation is not None and generation != self.generation):
+                return
+            self._lru[key] = level
+            self._lru.move_to_end(key)
+            while len(self._lru) > self.maxsize:
+                self._lru.popitem(last=False)
+                self.evictions += 1
+
+    def record_fallback(self, count: int = 1):
+        """Count rows that were off the grid and went straight to the model."""
+        with self._lock:
+            self.fallbacks += count
+
+    def warm(self, keys, levels):
+        """Pin precomputed levels for an eagerly enumerated grid."""
+        with self._lock:
+            for key, level in zip(keys, levels):
+                self._pinned[key] = level
+                self._lru.pop(key, None)
+
+    def clear(self):
+        """Drop all memoized levels, e.g. after the model changes."""
+        with self._lock:
+            self._pinned.clear()
+            self._lru.clear()
+            self.generation += 1
+
+    def stats(self) -> dict:
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                'pinned_entries': len(self._pinned),
+                'lru_entries': len(self._lru),
+                'lru_maxsize': self.maxsize,
+                'hits': self.hits,
+                'misses': self.misses,
+                'fallbacks': self.fallbacks,
+                'evictions': self.evictions,
+                'hit_rate': round(self.hits / lookups, 4) if lookups else 0.0,
+                'generation': self.generation,
+            }
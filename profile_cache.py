@@ -0,0 +1,130 @@
+# profile_cache.py
+"""
+Per-student profile cache for page renders and the front-end.
+
+Pages only need a student's name, email and scaffold level, so profiles are
+read with a narrow projection and kept in a bounded LRU with a TTL. When
+this process stores a new scaffold level the cached copy is updated in
+place, so the next page load sees it without another read; other workers
+pick it up when their entry expires.
+"""
+import threading
+import time
+from collections import OrderedDict
+
+
+PROFILE_COLUMNS = ('id', 'full_name', 'email', 'scaffold_level')
+
+
+class ProfileCache:
+    """
+    Bounded LRU + TTL cache of user_profiles rows keyed by student id.
+
+    Args:
+        client: Supabase client
+        maxsize: int - profiles kept before the least recently used is evicted
+        ttl: float - seconds an entry stays fresh (<= 0 disables expiry)
+        table: str - profiles table
+    """
+
+    def __init__(self, client, maxsize: int = 10000, ttl: float = 60.0, table: str = 'user_profiles'):
+        self.client = client
+        self.maxsize = max(1, int(maxsize))
+        self.ttl = float(ttl)
+        self.table = table
+        self._entries = OrderedDict()   # student_id -> (loaded_at, profile)
+        self._loading = {}              # student_id -> [readers, fields written during the read]
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.updates = 0
+
+    def _fresh(self, entry) -> bool:
+        return entry is not None and (self.ttl <= 0 or time.monotonic() - entry[0] < self.ttl)
+
+    def _load(self, student_id):
+        response = (
+            self.client.table(self.table)
+            .select(', '.join(PROFILE_COLUMNS))
+            .eq('id', student_id)
+            .limit(1)
+            .execute()
+        )
+        return response.data[0] if response.data else None
+
+    def _store(self, student_id, profile: dict):
+        """Insert or refresh an entry (lock held)."""
+        self._entries[student_id] = (time.monotonic(), profile)
+        self._entries.move_to_end(student_id)
+        while len(self._entries) > self.maxsize:
+            self._entries.popitem(last=False)
+            self.evictions += 1
+
+    def get(self, student_id):
+        """
+        Return the student's profile, reading user_profiles only on a miss.
+
+        Args:
+            student_id: str - user_profiles.id
+
+        Returns:
+            dict - PROFILE_COLUMNS of the row (a copy), or None if there is no profile
+        """
+        with self._lock:
+            entry = self._entries.get(student_id)
+            if self._fresh(entry):
+                self._entries.move_to_end(student_id)
+                self.hits += 1
+                return dict(entry[1])
+            self.misses += 1
+            loading = self._loading.setdefault(student_id, [0, {}])
+            loading[0] += 1
+        try:
+            profile = self._load(student_id)
+        finally:
+            with self._lock:
+                loading[0] -= 1
+                if loading[0] == 0:
+                    self._loading.pop(student_id, None)
+        if profile is None:
+            # Not cached: the profile may be created right after sign-up
+            return None
+        with self._lock:
+            # A level stored while we were reading is newer than what we read
+            profile.update(loading[1])
+            self._store(student_id, profile)
+            return dict(profile)
+
+    def record_scaffold_level(self, student_id, scaffold_level: int):
+        """Apply a scaffold level this process just stored (or queued) to the cached profile."""
+        with self._lock:
+            loading = self._loading.get(student_id)
+            if loading is not None:
+                loading[1]['scaffold_level'] = scaffold_level
+            entry = self._entries.get(student_id)
+            if entry is not None:
+                self._entries[student_id] = (entry[0], {**entry[1], 'scaffold_level': scaffold_level})
+                self.updates += 1
+
+    def invalidate(self, student_id=None):
+        """Drop one student's profile (or every profile) so the next read goes to Supabase."""
+        with self._lock:
+            if student_id is None:
+                self._entries.clear()
+            else:
+                self._entries.pop(student_id, None)
+
+    def stats(self) -> dict:
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                'entries': len(self._entries),
+                'maxsize': self.maxsize,
+                'ttl_seconds': self.ttl,
+                'hits': self.hits,
+                'misses': self.misses,
+                'evictions': self.evictions,
+                'updates': self.updates,
+                'hit_rate': round(self.hits / lookups, 4) if lookups else 0.0,
+            }
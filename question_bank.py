@@ -0,0 +1,152 @@
+# question_bank.py
+"""
+In-process question bank for the quiz.
+
+The full main_question -> sub_questions -> hints tree for a difficulty is
+read with one embedded PostgREST select and kept in memory for a TTL (or
+until invalidated), so starting a round is a single request to the app
+instead of one Supabase round trip per main question.
+"""
+import threading
+import time
+
+from instrumentation import get_logger
+
+
+log = get_logger()
+
+
+# Canonical difficulty -> spellings found in main_questions.difficulty
+DIFFICULTY_VARIANTS = {
+    'easy': ('Easy', 'easy', 'EASY'),
+    'medium': ('Medium', 'medium', 'MEDIUM', 'Average', 'average', 'AVERAGE'),
+    'hard': ('Hard', 'hard', 'HARD', 'Difficult', 'difficult', 'DIFFICULT'),
+}
+
+_DIFFICULTY_ALIASES = {
+    variant.lower(): canonical
+    for canonical, variants in DIFFICULTY_VARIANTS.items()
+    for variant in variants
+}
+
+# Same page size fetchQuestions used to request
+DEFAULT_QUESTION_LIMIT = 100
+
+QUESTION_TREE_SELECT = '*, sub_questions(*, hints(first_hint, second_hint, third_hint))'
+
+
+def normalize_difficulty(value):
+    """Map 'Average'/'Difficult'/any casing onto 'easy' | 'medium' | 'hard' (None if unknown)."""
+    if value is None:
+        return None
+    return _DIFFICULTY_ALIASES.get(str(value).strip().lower())
+
+
+def _step_key(sub_question: dict):
+    step = sub_question.get('step_number')
+    return (step is None, step if step is not None else 0)
+
+
+class QuestionBank:
+    """
+    TTL cache of question trees keyed by canonical difficulty.
+
+    Args:
+        client: Supabase client
+        ttl: float - seconds a loaded difficulty stays fresh (<= 0 disables expiry)
+    """
+
+    def __init__(self, client, ttl: float = 300.0):
+        self.client = client
+        self.ttl = float(ttl)
+        self._entries = {}       # difficulty -> (loaded_at, questions)
+        self._lock = threading.Lock()
+        self._load_locks = {d: threading.Lock() for d in DIFFICULTY_VARIANTS}
+        self.hits = 0
+        self.loads = 0
+        self.invalidations = 0
+
+    def _fresh(self, entry) -> bool:
+        return entry is not None and (self.ttl <= 0 or time.monotonic() - entry[0] < self.ttl)
+
+    def _load(self, difficulty: str):
+        response = (
+            self.client.table('main_questions')
+            .select(QUESTION_TREE_SELECT)
+            .in_('difficulty', list(DIFFICULTY_VARIANTS[difficulty]))
+            .order('id')
+            .execute()
+        )
+        questions = response.data or []
+        for question in questions:
+            question['sub_questions'] = sorted(question.get('sub_questions') or [], key=_step_key)
+        return questions
+
+    def get(self, difficulty: str):
+        """
+        Return every main question (with sub_questions and hints) for a difficulty.
+
+        Args:
+            difficulty: str - canonical difficulty from normalize_difficulty()
+
+        Returns:
+            list[dict] - shared cached rows; callers must not mutate them
+        """
+        with self._lock:
+            entry = self._entries.get(difficulty)
+            if self._fresh(entry):
+                self.hits += 1
+                return entry[1]
+        # One loader per difficulty; concurrent misses wait for its result
+        with self._load_locks[difficulty]:
+            with self._lock:
+                entry = self._entries.get(difficulty)
+                if self._fresh(entry):
+                    self.hits += 1
+                    return entry[1]
+            questions = self._load(difficulty)
+            with self._lock:
+                self._entries[difficulty] = (time.monotonic(), questions)
+                self.loads += 1
+            log.info(f"✅ Question bank loaded {len(questions)} {difficulty} questions")
+            return questions
+
+    def select(self, difficulty: str, exclude_ids=(), limit: int = DEFAULT_QUESTION_LIMIT):
+        """
+        Pick the next questions for a round, skipping ones the student has already seen.
+
+        When every question has been used the exclusions are dropped and the
+        pool starts over, which the caller reports back as a reset.
+
+        Returns:
+            tuple - (questions list, reset bool)
+        """
+        questions = self.get(difficulty)
+        excluded = {str(qid) for qid in exclude_ids}
+        remaining = [q for q in questions if str(q.get('id')) not in excluded]
+        if remaining or not excluded:
+            return remaining[:limit], False
+        return questions[:limit], True
+
+    def invalidate(self, difficulty: str = None):
+        """Drop one difficulty (or everything) so the next request reloads from Supabase."""
+        with self._lock:
+            if difficulty is None:
+                self._entries.clear()
+            else:
+                self._entries.pop(difficulty, None)
+            self.invalidations += 1
+
+    def stats(self) -> dict:
+        with self._lock:
+            now = time.monotonic()
+            return {
+                'ttl_seconds': self.ttl,
+                'hits': self.hits,
+                'loads': self.loads,
+                'invalidations': self.invalidations,
+                'difficulties': {
+                    d: {'questions': len(entry[1]), 'age_seconds': round(now - entry[0], 3)}
+                    for d, entry in self._entries.items()
+                },
+            }
@@ -0,0 +1,340 @@
+# rescore.py
+"""
+Re-score every student's stored scaffold level with the current model.
+
+After a retrain, students keep the level the previous model wrote to
+user_profiles until they finish another round. This job walks each
+student's latest user_progress row in keyset-paginated pages, scores a
+page at a time through the vectorized serving path, and bulk-updates only
+the levels that changed. Progress is checkpointed after every page so an
+interrupted run resumes where it stopped.
+
+    python rescore.py --dry-run --report diff.jsonl
+    python rescore.py --resume
+    python rescore.py --store sqlite --sqlite-path local.db --make-fixture 200000
+
+Levels are scored with the same predictor the app serves (SCAFFOLD_PREDICTOR,
+or --predictor), so rescored levels match what the app would return.
+"""
+import argparse
+import json
+import os
+import random
+import sqlite3
+import sys
+import time
+from collections import Counter
+
+from anfis_inference import PREDICTORS, build_inference_components, servable_predictor
+from model_artifact import default_artifact_root, load_artifact
+from scaffold_scoring import normalize_feature_row, score_normalized_rows
+from write_behind import SQLiteProfileStore, SupabaseProfileStore
+
+
+DEFAULT_PAGE_SIZE = 1000
+DEFAULT_CHECKPOINT = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'instance', 'rescore_checkpoint.json')
+
+PROGRESS_COLUMNS = ('student_id', 'accuracy', 'hint_usage', 'mistake', 'ability', 'difficulty', 'last_updated')
+
+
+# ----------------------
+# Latest-progress sources
+# ----------------------
+
+def _first_row_per_student(rows):
+    """Rows arrive ordered by student, newest first: keep each student's first row."""
+    latest = []
+    previous = object()
+    for row in rows:
+        if row['student_id'] != previous:
+            latest.append(row)
+            previous = row['student_id']
+    return latest
+
+
+class SupabaseProgressSource:
+    """Reads user_progress through PostgREST, which has no DISTINCT ON."""
+
+    def __init__(self, client, table: str = 'user_progress'):
+        self.client = client
+        self.table = table
+
+    def latest_page(self, after_student_id, page_size: int):
+        """
+        Next page of students after `after_student_id`, each with their newest progress row.
+
+        Paging continues strictly after the last student seen, so a student
+        whose rows straddle the page boundary is only counted once (their
+        first row in the page is already the newest).
+
+        Returns:
+            tuple - (latest rows, last student_id in the page or None when exhausted)
+        """
+        query = (
+            self.client.table(self.table)
+            .select(', '.join(PROGRESS_COLUMNS))
+            .order('student_id')
+            .order('last_updated', desc=True)
+            .limit(page_size)
+        )
+        if after_student_id is not None:
+            query = query.gt('student_id', after_student_id)
+        rows = query.execute().data or []
+        if not rows:
+            return [], None
+        return _first_row_per_student(rows), rows[-1]['student_id']
+
+
+class SQLiteProgressSource:
+    """Local stand-in: user_progress in a SQLite file."""
+
+    def __init__(self, path: str):
+        self.path = path
+        self._conn = sqlite3.connect(path)
+        self._conn.row_factory = sqlite3.Row
+
+    def latest_page(self, after_student_id, page_size: int):
+        rows = self._conn.execute(
+            f"SELECT {', '.join(PROGRESS_COLUMNS)} FROM user_progress "
+            "WHERE (? IS NULL OR student_id > ?) "
+            "ORDER BY student_id, last_updated DESC LIMIT ?",
+            (after_student_id, after_student_id, page_size),
+        ).fetchall()
+        if not rows:
+            return [], None
+        rows = [dict(row) for row in rows]
+        return _first_row_per_student(rows), rows[-1]['student_id']
+
+
+def create_fixture(path: str, n_students: int, rounds_per_student: int = 3, seed: int = 42):
+    """Fill a SQLite file with synthetic user_progress / user_profiles rows for local runs."""
+    rng = random.Random(seed)
+    conn = sqlite3.connect(path)
+    conn.executescript(
+        'CREATE TABLE IF NOT EXISTS user_progress (student_id TEXT, accuracy REAL, hint_usage REAL, '
+        'mistake INTEGER, ability INTEGER, difficulty TEXT, last_updated TEXT);'
+        'CREATE INDEX IF NOT EXISTS user_progress_student ON user_progress (student_id, last_updated);'
+        'CREATE TABLE IF NOT EXISTS user_profiles (id TEXT PRIMARY KEY, scaffold_level INTEGER);'
+    )
+    for start in range(0, n_students, 10000):
+        progress, profiles = [], []
+        for i in range(start, min(start + 10000, n_students)):
+            sid = f"student-{i:08d}"
+            profiles.append((sid, rng.choice((0, 1, 2))))
+            for r in range(rounds_per_student):
+                n = rng.randint(3, 10)
+                progress.append((
+                    sid,
+                    round(rng.randint(0, n) / n, 3),
+                    round(rng.randint(0, n) / n, 3),
+                    rng.randint(0, 10),
+                    rng.choice((-1, 0, 1)),
+                    rng.choice(('easy', 'medium', 'hard')),
+                    f"2025-{1 + r:02d}-01T00:00:00+00:00",
+                ))
+        conn.executemany('INSERT INTO user_progress VALUES (?, ?, ?, ?, ?, ?, ?)', progress)
+        conn.executemany('INSERT OR REPLACE INTO user_profiles VALUES (?, ?)', profiles)
+        conn.commit()
+    conn.close()
+    print(f"✅ Fixture with {n_students} students written to {path}")
+
+
+# ----------------------
+# Checkpointing
+# ----------------------
+
+def load_checkpoint(path: str):
+    try:
+        with open(path, encoding='utf-8') as f:
+            return json.load(f)
+    except FileNotFoundError:
+        return None
+
+
+def save_checkpoint(path: str, state: dict):
+    os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+    tmp_path = path + '.tmp'
+    with open(tmp_path, 'w', encoding='utf-8') as f:
+        json.dump(state, f, indent=2)
+    os.replace(tmp_path, path)
+
+
+# ----------------------
+# Job
+# ----------------------
+
+def rescore(source, store, components, model_version: str, page_size: int = DEFAULT_PAGE_SIZE,
+            dry_run: bool = False, checkpoint_path: str = None, resume: bool = False, report=None,
+            limit: int = None) -> dict:
+    """
+    Stream latest progress rows, re-score them and write changed levels.
+
+    Args:
+        source: progress source exposing latest_page(after_student_id, page_size)
+        store: profile store exposing get_scaffold_levels / update_scaffold_levels
+        components: tuple - (model, scaler, encoder)
+        model_version: str - recorded in the checkpoint; a resume must use the same model
+            (include the predictor, e.g. "<version>/surrogate", when it is not anfis)
+        page_size: int - progress rows fetched per page
+        dry_run: bool - report differences without writing them
+        checkpoint_path: str - where progress is saved after each page (None disables)
+        resume: bool - continue after the student recorded in the checkpoint
+        report: file - receives one JSON line per changed student
+        limit: int - stop after this many students (for trial runs)
+
+    Returns:
+        dict - run totals
+    """
+    state = {
+        'model_version': model_version,
+        'dry_run': dry_run,
+        'last_student_id': None,
+        'students': 0,
+        'scored': 0,
+        'skipped': 0,
+        'missing_profile': 0,
+        'changed': 0,
+        'transitions': {},
+    }
+    if resume and checkpoint_path:
+        saved = load_checkpoint(checkpoint_path)
+        if saved:
+            if saved.get('model_version') != model_version:
+                raise RuntimeError(
+                    f"Checkpoint was written for model {saved.get('model_version')}, not {model_version}; "
+                    "rerun without --resume"
+                )
+            if saved.get('dry_run') != dry_run:
+                raise RuntimeError("Checkpoint dry-run mode differs from this run; rerun without --resume")
+            state.update(saved)
+            print(f"ℹ️ Resuming after student {state['last_student_id']} ({state['students']} already done)")
+
+    transitions = Counter(state['transitions'])
+    encoder = components[2]
+    started = time.perf_counter()
+    run_students = 0
+
+    while limit is None or run_students < limit:
+        latest, last_student_id = source.latest_page(state['last_student_id'], page_size)
+        if last_student_id is None:
+            break
+        if limit is not None:
+            latest = latest[:limit - run_students]
+            if latest:
+                last_student_id = latest[-1]['student_id']
+
+        ids, numerical_rows, difficulty_rows = [], [], []
+        for row in latest:
+            normalized = normalize_feature_row({
+                'accuracy': row.get('accuracy'),
+                'hint_usage': row.get('hint_usage'),
+                'mistake_count': row.get('mistake'),
+                'ability': row.get('ability'),
+                'difficulty': row.get('difficulty'),
+            }, encoder)
+            if normalized is None:
+                state['skipped'] += 1
+                continue
+            ids.append(row['student_id'])
+            numerical_rows.append(normalized[0])
+            difficulty_rows.append(normalized[1])
+
+        new_levels = score_normalized_rows(numerical_rows, difficulty_rows, components) if ids else []
+        current_levels = store.get_scaffold_levels(ids) if ids else {}
+        changed = {}
+        for sid, level in zip(ids, new_levels):
+            if sid not in current_levels:
+                state['missing_profile'] += 1
+                continue
+            old_level = current_levels[sid]
+            if old_level != level:
+                changed[sid] = level
+                transitions[f"{old_level}->{level}"] += 1
+                if report is not None:
+                    report.write(json.dumps({'student_id': sid, 'old_level': old_level, 'new_level': level}) + '\n')
+
+        if changed and not dry_run:
+            store.update_scaffold_levels(changed)
+
+        state['last_student_id'] = last_student_id
+        state['students'] += len(latest)
+        state['scored'] += len(ids)
+        state['changed'] += len(changed)
+        state['transitions'] = dict(transitions)
+        run_students += len(latest)
+        if checkpoint_path:
+            save_checkpoint(checkpoint_path, state)
+
+        elapsed = time.perf_counter() - started
+        print(f"… {state['students']} students, {state['changed']} changed "
+              f"({run_students / elapsed if elapsed else 0:.0f} rows/sec)")
+
+    elapsed = time.perf_counter() - started
+    state['elapsed_seconds'] = round(elapsed, 3)
+    state['rows_per_second'] = round(run_students / elapsed, 1) if elapsed else 0.0
+    return state
+
+
+def _build_backends(args):
+    if args.store == 'sqlite':
+        return SQLiteProgressSource(args.sqlite_path), SQLiteProfileStore(args.sqlite_path)
+    url = os.environ.get('SUPABASE_URL')
+    key = os.environ.get('SUPABASE_SERVICE_KEY')
+    if not url or not key:
+        sys.exit("SUPABASE_URL and SUPABASE_SERVICE_KEY must be set for --store supabase")
+    from supabase import create_client
+    client = create_client(url, key)
+    return SupabaseProgressSource(client), SupabaseProfileStore(client)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Re-score stored scaffold levels with the current model.")
+    parser.add_argument("--store", choices=("supabase", "sqlite"), default="supabase")
+    parser.add_argument("--sqlite-path", default="rescore_local.db",
+                        help="SQLite file with user_progress and user_profiles (for --store sqlite)")
+    parser.add_argument("--make-fixture", type=int, metavar="N",
+                        help="Write N synthetic students into --sqlite-path and exit")
+    parser.add_argument("--artifact-root", default=default_artifact_root())
+    parser.add_argument("--predictor", choices=PREDICTORS,
+                        default=os.environ.get("SCAFFOLD_PREDICTOR", "anfis").strip().lower(),
+                        help="anfis or surrogate (default SCAFFOLD_PREDICTOR, like the app)")
+    parser.add_argument("--page-size", type=int, default=DEFAULT_PAGE_SIZE)
+    parser.add_argument("--dry-run", action="store_true", help="Report changes without writing them")
+    parser.add_argument("--report", help="Write one JSON line per changed student to this file")
+    parser.add_argument("--checkpoint", default=DEFAULT_CHECKPOINT)
+    parser.add_argument("--resume", action="store_true", help="Continue from the checkpoint")
+    parser.add_argument("--limit", type=int, help="Stop after this many students")
+    args = parser.parse_args()
+
+    if args.make_fixture:
+        create_fixture(args.sqlite_path, args.make_fixture)
+        sys.exit(0)
+
+    arrays, manifest = load_artifact(args.artifact_root)
+    predictor = servable_predictor(arrays, args.predictor)
+    if predictor != args.predictor:
+        print(f"⚠️ Artifact {manifest['version']} has no distilled surrogate; scoring with the full ANFIS model")
+    components = build_inference_components(arrays, predictor)
+    model_version = manifest['version'] if predictor == 'anfis' else f"{manifest['version']}/{predictor}"
+    source, store = _build_backends(args)
+    print(f"ℹ️ Re-scoring with model {model_version}{' (dry run)' if args.dry_run else ''}")
+
+    report = open(args.report, 'a' if args.resume else 'w', encoding='utf-8') if args.report else None
+    try:
+        totals = rescore(
+            source, store, components, model_version,
+            page_size=args.page_size,
+            dry_run=args.dry_run,
+            checkpoint_path=args.checkpoint,
+            resume=args.resume,
+            report=report,
+            limit=args.limit,
+        )
+    finally:
+        if report is not None:
+            report.close()
+
+    print(f"✅ {totals['students']} students, {totals['scored']} scored, {totals['changed']} "
+          f"{'would change' if args.dry_run else 'updated'}, {totals['skipped']} skipped, "
+          f"{totals['missing_profile']} without a profile ({totals['rows_per_second']} rows/sec)")
+    print(json.dumps({'transitions': totals['transitions']}, indent=2))
@@ -0,0 +1,431 @@
+# retrain.py
+"""
+Incrementally fine-tune the live model on new labeled user_progress rows.
+
+Every finished round inserts a user_progress row with the model inputs
+(accuracy, hint_usage, mistake, ability, difficulty), but not a
+ground-truth scaffold level: the level the app predicts goes to
+user_profiles, and training on it would only teach the model its own
+answers. The job therefore reads labels from a column you name with
+--label-column (e.g. a teacher-confirmed level) and skips rows where it is
+empty.
+
+Instead of a 200-epoch retrain from scratch, a run:
+
+  1. streams labeled rows newer than the checkpoint cursor in keyset pages,
+  2. fine-tunes the ANFIS network warm-started from the live artifact on each
+     page (plus a replay sample of scaffold_data.csv) for at most --epochs,
+     holding out every student whose id hashes into the --holdout fraction,
+  3. compares the candidate with the live model on those held-out students
+     and on the scaffold_data.csv test split,
+  4. writes and promotes a new artifact only if it is no worse on the live
+     holdout and within --max-regression on the test split.
+
+The cursor only advances when a candidate is promoted, so a rejected run's
+rows are retried together with newer ones. Serving workers pick the new
+version up through their artifact watcher.
+
+    python retrain.py --label-column confirmed_level --dry-run
+    python retrain.py --label-column confirmed_level --epochs 10 --max-rows 20000
+    python retrain.py --store sqlite --sqlite-path local.db --label-column confirmed_level
+"""
+import argparse
+import json
+import os
+import re
+import sqlite3
+import sys
+import time
+import zlib
+
+import numpy as np
+from sklearn.metrics import accuracy_score
+from sklearn.model_selection import train_test_split
+
+from anfis_inference import INFERENCE_ARRAY_KEYS, SURROGATE_ARRAY_KEYS, build_inference_components
+from model import (
+    FEATURE_SCHEMA, FINE_TUNE_LR, SURROGATE_MAX_DEPTH, _read_training_frame, check_inference_parity, distill_surrogate,
+    export_inference_arrays, fine_tune_model, load_model_bundle, warm_start_model,
+)
+from model_artifact import default_artifact_root, load_artifact, read_current_version, set_current_version, write_artifact
+from rescore import load_checkpoint, save_checkpoint
+from scaffold_scoring import normalize_feature_row, preprocess_normalized_rows
+
+
+DEFAULT_PAGE_SIZE = 1000
+DEFAULT_CHECKPOINT = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'instance', 'retrain_checkpoint.json')
+DEFAULT_EPOCHS = 10
+DEFAULT_MAX_ROWS = 50000
+DEFAULT_MIN_ROWS = 200
+DEFAULT_HOLDOUT = 0.2
+DEFAULT_REPLAY = 1.0
+DEFAULT_MAX_REGRESSION = 0.02
+
+TRAINING_COLUMNS = ('student_id', 'accuracy', 'hint_usage', 'mistake', 'ability', 'difficulty', 'last_updated')
+
+_IDENTIFIER = re.compile(r'^[A-Za-z_][A-Za-z0-9_]*$')
+
+
+def _check_column(name: str) -> str:
+    if not _IDENTIFIER.match(name or ''):
+        raise ValueError(f"Invalid label column name: {name!r}")
+    return name
+
+
+# ----------------------
+# Labeled-progress sources
+# ----------------------
+
+class SupabaseLabeledProgressSource:
+    """Reads labeled user_progress rows through PostgREST, oldest first."""
+
+    def __init__(self, client, label_column: str, table: str = 'user_progress'):
+        self.client = client
+        self.label_column = _check_column(label_column)
+        self.table = table
+
+    def page(self, cursor, page_size: int):
+        """
+        Next labeled rows strictly after `cursor`, ordered by (last_updated, student_id).
+
+        Args:
+            cursor: dict with last_updated and student_id of the last row consumed, or None
+            page_size: int - rows per page
+
+        Returns:
+            list[dict] - rows with TRAINING_COLUMNS and the label column
+        """
+        query = (
+            self.client.table(self.table)
+            .select(', '.join(TRAINING_COLUMNS + (self.label_column,)))
+            .not_.is_(self.label_column, 'null')
+            .order('last_updated')
+            .order('student_id')
+            .limit(page_size)
+        )
+        if cursor:
+            ts, sid = cursor['last_updated'], cursor['student_id']
+            query = query.or_(f'last_updated.gt."{ts}",and(last_updated.eq."{ts}",student_id.gt."{sid}")')
+        return query.execute().data or []
+
+
+class SQLiteLabeledProgressSource:
+    """Local stand-in: labeled user_progress rows in a SQLite file."""
+
+    def __init__(self, path: str, label_column: str):
+        self.label_column = _check_column(label_column)
+        self._conn = sqlite3.connect(path)
+        self._conn.row_factory = sqlite3.Row
+
+    def page(self, cursor, page_size: int):
+        ts = cursor['last_updated'] if cursor else None
+        sid = cursor['student_id'] if cursor else None
+        rows = self._conn.execute(
+            f"SELECT {', '.join(TRAINING_COLUMNS + (self.label_column,))} FROM user_progress "
+            f"WHERE {self.label_column} IS NOT NULL "
+            "AND (? IS NULL OR last_updated > ? OR (last_updated = ? AND student_id > ?)) "
+            "ORDER BY last_updated, student_id LIMIT ?",
+            (ts, ts, ts, sid, page_size),
+        ).fetchall()
+        return [dict(row) for row in rows]
+
+
+# ----------------------
+# Features
+# ----------------------
+
+def _parse_label(value):
+    try:
+        label = float(value)
+    except (TypeError, ValueError):
+        return None
+    if not label.is_integer() or int(label) not in FEATURE_SCHEMA['classes']:
+        return None
+    return int(label)
+
+
+def _in_holdout(student_id, fraction: float) -> bool:
+    """Stable per-student split, so a student's rounds never land on both sides."""
+    return zlib.crc32(str(student_id).encode('utf-8')) % 10000 < fraction * 10000
+
+
+def labeled_features(rows, label_column: str, scaler, encoder):
+    """
+    Preprocess labeled progress rows exactly like serving requests.
+
+    Returns:
+        tuple - (X, y, student_ids, skipped) where skipped counts invalid rows
+    """
+    ids, numerical_rows, difficulty_rows, labels = [], [], [], []
+    skipped = 0
+    for row in rows:
+        normalized = normalize_feature_row({
+            'accuracy': row.get('accuracy'),
+            'hint_usage': row.get('hint_usage'),
+            'mistake_count': row.get('mistake'),
+            'ability': row.get('ability'),
+            'difficulty': row.get('difficulty'),
+        }, encoder)
+        label = _parse_label(row.get(label_column))
+        if normalized is None or label is None:
+            skipped += 1
+            continue
+        ids.append(row['student_id'])
+        numerical_rows.append(normalized[0])
+        difficulty_rows.append(normalized[1])
+        labels.append(label)
+    if not ids:
+        return np.empty((0, len(FEATURE_SCHEMA['column_order']))), np.empty(0, dtype=int), [], skipped
+    X = preprocess_normalized_rows(numerical_rows, difficulty_rows, scaler, encoder)
+    return X, np.array(labels, dtype=int), ids, skipped
+
+
+def base_training_rows(scaler, encoder, base_dir: str = None):
+    """
+    scaffold_data.csv through the serving preprocessing, split like model.py.
+
+    Returns:
+        tuple - (X_train, X_test, y_train, y_test); the train part is the replay pool
+    """
+    base_dir = base_dir or os.path.dirname(os.path.abspath(__file__))
+    numerical, categorical, y = _read_training_frame(base_dir)
+    X = preprocess_normalized_rows(numerical.values, categorical['difficulty'].astype(str).values, scaler, encoder)
+    return train_test_split(X, np.asarray(y, dtype=int), test_size=0.2, random_state=42)
+
+
+# ----------------------
+# Job
+# ----------------------
+
+def retrain(source, bundle: dict, artifact_root: str, label_column: str, page_size: int = DEFAULT_PAGE_SIZE,
+            epochs: int = DEFAULT_EPOCHS, lr: float = FINE_TUNE_LR, max_rows: int = DEFAULT_MAX_ROWS,
+            min_rows: int = DEFAULT_MIN_ROWS, holdout: float = DEFAULT_HOLDOUT, replay: float = DEFAULT_REPLAY,
+            max_regression: float = DEFAULT_MAX_REGRESSION, checkpoint_path: str = None,
+            dry_run: bool = False) -> dict:
+    """
+    Stream new labeled rows, fine-tune the live model and promote it if it validates.
+
+    Args:
+        source: labeled progress source exposing page(cursor, page_size)
+        bundle: dict - pickled model bundle (architecture and training settings)
+        artifact_root: str - artifact root; CURRENT is the warm-start point
+        label_column: str - user_progress column holding the true scaffold level
+        page_size: int - rows fetched (and fine-tuned on) per page
+        epochs: int - maximum fine-tuning epochs per page
+        lr: float - fine-tuning learning rate
+        max_rows: int - stop streaming after this many rows
+        min_rows: int - labeled rows required before a candidate is considered
+        holdout: float - fraction of students held out for validation
+        replay: float - scaffold_data.csv rows mixed in per live training row
+        max_regression: float - allowed accuracy drop on the scaffold_data.csv test split
+        checkpoint_path: str - cursor file, advanced after a promotion (None disables)
+        dry_run: bool - validate and report without writing an artifact or checkpoint
+
+    Returns:
+        dict - run totals, validation metrics and the decision
+    """
+    saved = load_checkpoint(checkpoint_path) if checkpoint_path else None
+    cursor = (saved or {}).get('cursor')
+    if cursor:
+        print(f"ℹ️ Continuing after {cursor['last_updated']} / {cursor['student_id']}")
+
+    arrays, manifest = load_artifact(artifact_root, mmap=False)
+    base_version = manifest['version']
+    current, scaler, encoder = build_inference_components(arrays)
+    X_replay, X_test, y_replay, y_test = base_training_rows(scaler, encoder)
+    model = warm_start_model(bundle, arrays)
+    print(f"🔥 Warm-started from model {base_version}")
+
+    state = {
+        'base_version': base_version,
+        'label_column': label_column,
+        'dry_run': dry_run,
+        'rows': 0,
+        'labeled': 0,
+        'skipped': 0,
+        'trained': 0,
+        'holdout_rows': 0,
+        'pages': 0,
+        'decision': None,
+        'version': None,
+    }
+    rng = np.random.default_rng(42)
+    holdout_X, holdout_y = [], []
+    started = time.perf_counter()
+
+    while state['rows'] < max_rows:
+        rows = source.page(cursor, min(page_size, max_rows - state['rows']))
+        if not rows:
+            break
+        cursor = {'last_updated': rows[-1]['last_updated'], 'student_id': rows[-1]['student_id']}
+        X, y, ids, skipped = labeled_features(rows, label_column, scaler, encoder)
+        held = np.array([_in_holdout(sid, holdout) for sid in ids], dtype=bool)
+        holdout_X.append(X[held])
+        holdout_y.append(y[held])
+
+        X_fit, y_fit = X[~held], y[~held]
+        if len(X_fit):
+            # Replay keeps a small page of live rows from dragging the model off the original data
+            n_replay = min(len(X_replay), int(round(replay * len(X_fit))))
+            if n_replay:
+                idx = rng.choice(len(X_replay), size=n_replay, replace=False)
+                X_fit = np.vstack((X_fit, X_replay[idx]))
+                y_fit = np.concatenate((y_fit, y_replay[idx]))
+            fine_tune_model(model, X_fit, y_fit, epochs, lr)
+
+        state['rows'] += len(rows)
+        state['labeled'] += len(ids)
+        state['skipped'] += skipped
+        state['trained'] += int((~held).sum())
+        state['holdout_rows'] += int(held.sum())
+        state['pages'] += 1
+        print(f"… {state['rows']} rows, {state['trained']} trained on, {state['holdout_rows']} held out "
+              f"({time.perf_counter() - started:.1f}s)")
+
+    state['elapsed_seconds'] = round(time.perf_counter() - started, 3)
+    if state['labeled'] < min_rows:
+        state['decision'] = 'not_enough_rows'
+        print(f"ℹ️ Only {state['labeled']} new labeled rows (need {min_rows}); live model kept")
+        return state
+    if not state['holdout_rows']:
+        state['decision'] = 'no_holdout'
+        print("⚠️ No rows fell into the holdout; live model kept")
+        return state
+
+    # Validate the candidate against the live model
+    X_hold, y_hold = np.vstack(holdout_X), np.concatenate(holdout_y)
+    new_arrays = export_inference_arrays(model.network, scaler, encoder)
+    candidate, _, _ = build_inference_components(new_arrays)
+    state['parity'] = check_inference_parity(model, new_arrays, X_hold)
+    state['holdout_accuracy'] = {
+        'current': float(accuracy_score(y_hold, current.predict(X_hold))),
+        'candidate': float(accuracy_score(y_hold, candidate.predict(X_hold))),
+    }
+    state['test_accuracy'] = {
+        'current': float(accuracy_score(y_test, current.predict(X_test))),
+        'candidate': float(accuracy_score(y_test, candidate.predict(X_test))),
+    }
+    print(f"🔍 Live holdout accuracy: {state['holdout_accuracy']['current']:.4f} -> "
+          f"{state['holdout_accuracy']['candidate']:.4f} ({state['holdout_rows']} rows)")
+    print(f"🔍 scaffold_data.csv test accuracy: {state['test_accuracy']['current']:.4f} -> "
+          f"{state['test_accuracy']['candidate']:.4f}")
+
+    if state['parity'] != 1.0:
+        state['decision'] = 'parity_failed'
+    elif state['holdout_accuracy']['candidate'] < state['holdout_accuracy']['current']:
+        state['decision'] = 'worse_on_holdout'
+    elif state['test_accuracy']['candidate'] < state['test_accuracy']['current'] - max_regression:
+        state['decision'] = 'regressed_on_test'
+    else:
+        state['decision'] = 'promote'
+    if state['decision'] != 'promote':
+        print(f"❌ Candidate rejected ({state['decision']}); live model kept")
+        return state
+    if dry_run:
+        state['decision'] = 'would_promote'
+        print("✅ Candidate passes validation (dry run, nothing written)")
+        return state
+
+    metadata = {
+        'source': 'retrain',
+        'base_version': base_version,
+        'init_params': bundle.get('init_params', {}),
+        'label_column': label_column,
+        'cursor': cursor,
+        'rows': state['trained'],
+        'holdout_rows': state['holdout_rows'],
+        'epochs_per_page': int(epochs),
+        'holdout_accuracy': state['holdout_accuracy'],
+        'test_accuracy': state['test_accuracy']['candidate'],
+        'parity': state['parity'],
+    }
+    if all(key in arrays for key in SURROGATE_ARRAY_KEYS):
+        # Keep SCAFFOLD_PREDICTOR=surrogate serving a tree distilled from this model
+        depth = manifest.get('metadata', {}).get('surrogate', {}).get('max_depth', SURROGATE_MAX_DEPTH)
+        surrogate_arrays, metadata['surrogate'] = distill_surrogate(
+            new_arrays, scaler, encoder, X_replay, X_test, y_test, depth
+        )
+        new_arrays.update(surrogate_arrays)
+
+    version = write_artifact(
+        artifact_root,
+        {key: new_arrays[key] for key in INFERENCE_ARRAY_KEYS + SURROGATE_ARRAY_KEYS if key in new_arrays},
+        metadata=metadata,
+        feature_schema=FEATURE_SCHEMA,
+        make_current=False,
+    )
+    state['version'] = version
+    if read_current_version(artifact_root) != base_version:
+        # Someone published (e.g. a full retrain) while we were training; don't clobber it
+        state['decision'] = 'superseded'
+        print(f"⚠️ CURRENT moved off {base_version} during the run; {version} written but not promoted")
+        return state
+    set_current_version(artifact_root, version)
+    if checkpoint_path:
+        save_checkpoint(checkpoint_path, {
+            'cursor': cursor,
+            'model_version': version,
+            'base_version': base_version,
+            'label_column': label_column,
+            'promoted_at': time.strftime("%Y-%m-%dT%H:%M:%SZ", time.gmtime()),
+        })
+    state['decision'] = 'promoted'
+    print(f"✅ Model {version} promoted (from {base_version})")
+    return state
+
+
+def _build_source(args):
+    if args.store == 'sqlite':
+        return SQLiteLabeledProgressSource(args.sqlite_path, args.label_column)
+    url = os.environ.get('SUPABASE_URL')
+    key = os.environ.get('SUPABASE_SERVICE_KEY')
+    if not url or not key:
+        sys.exit("SUPABASE_URL and SUPABASE_SERVICE_KEY must be set for --store supabase")
+    from supabase import create_client
+    return SupabaseLabeledProgressSource(create_client(url, key), args.label_column)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Fine-tune the live model on new labeled user_progress rows.")
+    parser.add_argument("--label-column", required=True,
+                        help="user_progress column holding the true scaffold level (0/1/2); rows where it is null are skipped")
+    parser.add_argument("--store", choices=("supabase", "sqlite"), default="supabase")
+    parser.add_argument("--sqlite-path", default="rescore_local.db",
+                        help="SQLite file with a labeled user_progress table (for --store sqlite)")
+    parser.add_argument("--artifact-root", default=default_artifact_root())
+    parser.add_argument("--model-dir", default=None, help="directory with anfis_model.pkl (default model_files/)")
+    parser.add_argument("--page-size", type=int, default=DEFAULT_PAGE_SIZE)
+    parser.add_argument("--epochs", type=int, default=DEFAULT_EPOCHS, help="maximum fine-tuning epochs per page")
+    parser.add_argument("--lr", type=float, default=FINE_TUNE_LR, help=f"fine-tuning learning rate (default {FINE_TUNE_LR})")
+    parser.add_argument("--max-rows", type=int, default=DEFAULT_MAX_ROWS, help="stop streaming after this many rows")
+    parser.add_argument("--min-rows", type=int, default=DEFAULT_MIN_ROWS,
+                        help="labeled rows needed before a candidate is validated")
+    parser.add_argument("--holdout", type=float, default=DEFAULT_HOLDOUT, help="fraction of students held out")
+    parser.add_argument("--replay", type=float, default=DEFAULT_REPLAY,
+                        help="scaffold_data.csv rows mixed in per live training row")
+    parser.add_argument("--max-regression", type=float, default=DEFAULT_MAX_REGRESSION,
+                        help="allowed accuracy drop on the scaffold_data.csv test split")
+    parser.add_argument("--checkpoint", default=DEFAULT_CHECKPOINT)
+    parser.add_argument("--dry-run", action="store_true", help="Validate without writing an artifact or checkpoint")
+    args = parser.parse_args()
+
+    if not 0 < args.holdout < 1:
+        sys.exit("--holdout must be between 0 and 1")
+    try:
+        source = _build_source(args)
+    except ValueError as e:
+        sys.exit(str(e))
+    totals = retrain(
+        source, load_model_bundle(args.model_dir), args.artifact_root, args.label_column,
+        page_size=args.page_size,
+        epochs=args.epochs,
+        lr=args.lr,
+        max_rows=args.max_rows,
+        min_rows=args.min_rows,
+        holdout=args.holdout,
+        replay=args.replay,
+        max_regression=args.max_regression,
+        checkpoint_path=args.checkpoint,
+        dry_run=args.dry_run,
+    )
+    print(json.dumps(totals, indent=2, default=str))
@@ -0,0 +1,100 @@
+# round_metrics.py
+"""
+End-of-round metrics, computed the same way quiz.js did in the browser.
+
+compute_round_metrics mirrors insertUserProgress (accuracy and hint-usage
+ratios rounded to 3 decimals, so predictions stay on the prediction-cache
+grid) and calculate_ability_score is a port of calculateAbilityScore.
+"""
+
+
+def _ratio(numerator, denominator) -> float:
+    return round(numerator / denominator, 3) if denominator > 0 else 0.0
+
+
+def _number(value):
+    return value if isinstance(value, (int, float)) and not isinstance(value, bool) else None
+
+
+def calculate_ability_score(attempts, accuracy=None, hint_usage=None, mistakes=None) -> int:
+    """
+    Port of quiz.js calculateAbilityScore.
+
+    Args:
+        attempts: list[dict] - mainQuestionAttempts entries ({isPerfect, totalCount,
+            correctCount, mistakes, hintsUsed, ...}; any field may be missing)
+        accuracy, hint_usage, mistakes: explicit metrics; missing ones are derived from attempts
+
+    Returns:
+        int - 1 (high ability), 0 (average) or -1 (low)
+    """
+    attempts = attempts or []
+    if not attempts:
+        return 0
+
+    if accuracy is None or hint_usage is None or mistakes is None:
+        total_sub = 0
+        correct_subs = 0
+        attempts_with_hint = 0
+        mistakes_sum = 0
+        perfect_rounds = 0
+
+        for a in attempts:
+            total = _number(a.get('totalCount'))
+            if total is None:
+                total = _number(a.get('totalSubQuestions'))
+            correct = _number(a.get('correctCount'))
+            if correct is None:
+                correct = _number(a.get('correctSubQuestions'))
+
+            if total is not None:
+                total_sub += total
+            if correct is not None:
+                correct_subs += correct
+
+            if _number(a.get('mistakes')) is not None:
+                mistakes_sum += a['mistakes']
+            elif total is not None and correct is not None:
+                mistakes_sum += max(0, total - correct)
+            elif not a.get('isPerfect'):
+                # Conservative fallback: one mistake for a non-perfect attempt
+                mistakes_sum += 1
+
+            if _number(a.get('hintsUsed')) is not None:
+                if a['hintsUsed'] > 0:
+                    attempts_with_hint += 1
+            elif a.get('hintUsed') or a.get('usedHint') or a.get('hints'):
+                attempts_with_hint += 1
+
+            if a.get('isPerfect'):
+                perfect_rounds += 1
+
+        if accuracy is None:
+            accuracy = correct_subs / total_sub if total_sub > 0 else perfect_rounds / len(attempts)
+        if hint_usage is None:
+            hint_usage = attempts_with_hint / len(attempts)
+        if mistakes is None:
+            mistakes = mistakes_sum
+
+    if accuracy >= 0.75 and hint_usage < 0.3 and mistakes <= 2:
+        return 1
+    if accuracy < 0.5 or hint_usage > 0.5 or mistakes >= 5:
+        return -1
+    return 0
+
+
+def compute_round_metrics(total_main_questions: int, correct_main_questions: int,
+                          hint_usage_count: int) -> dict:
+    """
+    Args:
+        total_main_questions: int - main questions attempted this round
+        correct_main_questions: int - main questions answered perfectly
+        hint_usage_count: int - hints opened this round
+
+    Returns:
+        dict - accuracy and hint_usage as 0-1 ratios (3 decimals, hint_usage capped at 1)
+    """
+    return {
+        'accuracy': _ratio(correct_main_questions, total_main_questions),
+        'hint_usage': min(1.0, _ratio(hint_usage_count, total_main_questions)),
+    }
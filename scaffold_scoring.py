@@ -0,0 +1,125 @@
+# scaffold_scoring.py
+"""
+Feature preprocessing and scoring shared by the web app and offline jobs.
+
+Rows are normalized to the types used during training, then scaled,
+encoded and scored as one matrix by the (model, scaler, encoder)
+components, whichever engine built them.
+"""
+import numpy as np
+
+from instrumentation import span
+from question_bank import normalize_difficulty
+
+
+# Returned whenever a row cannot be scored (models missing, bad input, ...)
+DEFAULT_SCAFFOLD_LEVEL = 2
+
+# Column order of a feature row, matching predict_scaffold_level's arguments
+FEATURE_FIELDS = ('accuracy', 'hint_usage', 'mistake_count', 'ability', 'difficulty')
+
+
+def normalize_feature_row(row, encoder):
+    """
+    Coerce one feature row into the types used during training.
+
+    Args:
+        row: dict keyed by FEATURE_FIELDS, or a sequence in FEATURE_FIELDS order
+        encoder: fitted difficulty encoder (for its categories)
+
+    Returns:
+        tuple - (numerical_values, difficulty_title), or None if the row is invalid
+    """
+    try:
+        if isinstance(row, dict):
+            accuracy = row.get('accuracy', 0)
+            hint_usage = row.get('hint_usage', 0)
+            mistake_count = row.get('mistake_count', 0)
+            ability = row.get('ability', 0)
+            difficulty = row.get('difficulty', 'easy')
+        else:
+            accuracy, hint_usage, mistake_count, ability, difficulty = row
+
+        # Normalize difficulty to match training encoder categories: ["Easy", "Medium", "Hard"];
+        # accepts the same aliases ("Average", "Difficult", ...) as every other endpoint
+        canonical = normalize_difficulty(difficulty)
+        if canonical is None:
+            return None
+        difficulty_title = canonical.title()  # -> Easy/Medium/Hard
+        if difficulty_title not in encoder.categories_[0]:
+            return None
+
+        # Ensure accuracy is in decimal format (0-1) with 4 decimal places
+        accuracy_decimal = round(float(accuracy), 4)
+
+        # Numerical features order during training: [accuracy, hint_usage, mistake, ability]
+        numerical = (accuracy_decimal, float(hint_usage), float(mistake_count), float(ability))
+        return numerical, difficulty_title
+    except (ValueError, TypeError):
+        return None
+
+
+def preprocess_normalized_rows(numerical_rows, difficulty_rows, scaler, encoder):
+    """
+    Scale and encode already-normalized rows into the model's input matrix.
+
+    Args:
+        numerical_rows: sequence of (accuracy, hint_usage, mistake_count, ability)
+        difficulty_rows: sequence of title-cased difficulties
+        scaler, encoder: fitted preprocessing from the serving components
+
+    Returns:
+        ndarray (n_rows, 5) - features in training column order
+    """
+    # Prepare input arrays following the training pipeline order
+    numerical_scaled = scaler.transform(np.asarray(numerical_rows, dtype=float))
+
+    # Categorical features: [[difficulty], ...]
+    categorical_encoded = encoder.transform(np.asarray(difficulty_rows).reshape(-1, 1)).astype(float)
+
+    # Combine exactly as in training: numerical_scaled + categorical_encoded
+    return np.column_stack((numerical_scaled, categorical_encoded))
+
+
+def score_normalized_rows(numerical_rows, difficulty_rows, components):
+    """
+    Run preprocessing and the model on already-normalized rows.
+
+    Args:
+        numerical_rows: sequence of (accuracy, hint_usage, mistake_count, ability)
+        difficulty_rows: sequence of title-cased difficulties
+        components: tuple - (model, scaler, encoder)
+
+    Returns:
+        list[int] - scaffold level numbers
+    """
+    model, scaler, encoder = components
+
+    with span('scale_encode'):
+        X_preprocessed = preprocess_normalized_rows(numerical_rows, difficulty_rows, scaler, encoder)
+
+    # Predict all rows at once and convert to database numbers
+    with span('model_predict'):
+        predictions = model.predict(X_preprocessed)
+    return [map_scaffold_level_to_number(raw) for raw in predictions]
+
+
+def map_scaffold_level_to_number(scaffold_level_output):
+    """
+    Map ML model output to database storage format
+    
+    Args:
+        scaffold_level_output: int or str - predicted scaffold level from ML model
+    
+    Returns:
+        int - corresponding number for database storage (0=Low, 1=Medium, 2=High)
+    """
+    # Convert to int and return directly (0, 1, 2 mapping)
+    try:
+        result = int(scaffold_level_output)
+        if result in [0, 1, 2]:
+            return result
+        else:
+            return 1  # Default to Medium (1) for invalid values
+    except (ValueError, TypeError):
+        return 1  # Default to Medium (1) if conversion fails
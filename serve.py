@@ -0,0 +1,60 @@
+# serve.py
+"""
+Production entry point: a preforking multi-worker server for app.py.
+
+    python serve.py
+    python serve.py --bind 0.0.0.0:8080 --workers 4 --threads 8
+
+Runs gunicorn with gunicorn.conf.py (the model is loaded once in the parent
+and shared copy-on-write by the forked workers); command-line flags override
+the SCAFFOLD_* environment settings described there. SIGTERM drains
+in-flight requests and pending scaffold-level writes before exiting.
+`python app.py` remains the single-threaded development server.
+"""
+import argparse
+import os
+import runpy
+import sys
+
+
+CONFIG_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'gunicorn.conf.py')
+
+
+def build_server(overrides: dict):
+    """
+    Args:
+        overrides: dict - gunicorn settings that take precedence over gunicorn.conf.py
+
+    Returns:
+        gunicorn application whose run() starts the master process
+    """
+    from gunicorn.app.base import BaseApplication
+
+    class ScaffoldServer(BaseApplication):
+        def load_config(self):
+            settings = runpy.run_path(CONFIG_PATH)
+            for key, value in {**settings, **overrides}.items():
+                if key in self.cfg.settings and value is not None:
+                    self.cfg.set(key, value)
+
+        def load(self):
+            from app import app
+            return app
+
+    return ScaffoldServer()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Serve the app with multiple preforked workers.")
+    parser.add_argument("--bind", help="HOST:PORT to listen on (default SCAFFOLD_BIND or 0.0.0.0:8000)")
+    parser.add_argument("--workers", type=int, help="Worker processes (default SCAFFOLD_WORKERS or CPU count)")
+    parser.add_argument("--threads", type=int, help="Threads per worker (default SCAFFOLD_THREADS or 4)")
+    args = parser.parse_args()
+
+    if os.name == 'nt':
+        sys.exit("serve.py needs fork(); on Windows run the app under WSL or a container")
+    try:
+        server = build_server({'bind': args.bind, 'workers': args.workers, 'threads': args.threads})
+    except ImportError:
+        sys.exit("gunicorn is required for serve.py: pip install gunicorn")
+    server.run()
@@ -0,0 +1,128 @@
+-- student_answer_stats.sql
+--
+-- Running per-student answer counters behind /api/students/<id>/summary
+-- (student_stats.StudentSummaryStore). An insert trigger on user_answers
+-- keeps them current for every writer, so a summary read is one row
+-- instead of a scan of the student's answer history.
+--
+-- Run once in the Supabase SQL editor. The trigger is created and the
+-- existing history backfilled in one transaction, with user_answers
+-- locked against inserts, so no answer is counted twice or missed.
+
+begin;
+
+create table if not exists public.student_answer_stats (
+    student_id uuid primary key,
+    total_answered bigint not null default 0,
+    correct_count bigint not null default 0,
+    total_time_seconds double precision not null default 0,
+    last_active timestamptz,
+    updated_at timestamptz not null default now()
+);
+
+alter table public.student_answer_stats enable row level security;
+
+drop policy if exists "Students read their own answer stats" on public.student_answer_stats;
+create policy "Students read their own answer stats" on public.student_answer_stats
+    for select using (auth.uid() = student_id);
+
+create or replace function public.bump_student_answer_stats()
+returns trigger
+language plpgsql
+security definer
+set search_path = public
+as $$
+begin
+    insert into public.student_answer_stats as s
+        (student_id, total_answered, correct_count, total_time_seconds, last_active, updated_at)
+    values (
+        new.student_id,
+        1,
+        case when new.is_correct then 1 else 0 end,
+        coalesce(new.time_taken_seconds::double precision, 0),
+        new.answered_at,
+        now()
+    )
+    on conflict (student_id) do update set
+        total_answered = s.total_answered + 1,
+        correct_count = s.correct_count + excluded.correct_count,
+        total_time_seconds = s.total_time_seconds + excluded.total_time_seconds,
+        last_active = greatest(s.last_active, excluded.last_active),
+        updated_at = now();
+    return new;
+end;
+$$;
+
+-- Repair one student's counters from their answer history
+-- (StudentSummaryStore.rebuild, ?rebuild=1). The counters row is locked
+-- first, so an answer inserted concurrently either commits before the
+-- recount (and is counted by it) or waits in the trigger and increments
+-- the recomputed row afterwards; the recount and write are one statement.
+create or replace function public.rebuild_student_answer_stats(p_student_id uuid)
+returns public.student_answer_stats
+language plpgsql
+security definer
+set search_path = public
+as $$
+declare
+    result public.student_answer_stats;
+begin
+    insert into public.student_answer_stats (student_id)
+    values (p_student_id)
+    on conflict (student_id) do nothing;
+
+    perform 1 from public.student_answer_stats
+    where student_id = p_student_id
+    for update;
+
+    insert into public.student_answer_stats as s
+        (student_id, total_answered, correct_count, total_time_seconds, last_active, updated_at)
+    select
+        p_student_id,
+        count(*),
+        count(*) filter (where is_correct),
+        coalesce(sum(time_taken_seconds::double precision), 0),
+        max(answered_at),
+        now()
+    from public.user_answers
+    where student_id = p_student_id
+    on conflict (student_id) do update set
+        total_answered = excluded.total_answered,
+        correct_count = excluded.correct_count,
+        total_time_seconds = excluded.total_time_seconds,
+        last_active = excluded.last_active,
+        updated_at = now()
+    returning s.* into result;
+
+    return result;
+end;
+$$;
+
+revoke execute on function public.rebuild_student_answer_stats(uuid) from public, anon, authenticated;
+
+lock table public.user_answers in share mode;
+
+drop trigger if exists user_answers_bump_stats on public.user_answers;
+create trigger user_answers_bump_stats
+    after insert on public.user_answers
+    for each row execute function public.bump_student_answer_stats();
+
+insert into public.student_answer_stats
+    (student_id, total_answered, correct_count, total_time_seconds, last_active, updated_at)
+select
+    student_id,
+    count(*),
+    count(*) filter (where is_correct),
+    coalesce(sum(time_taken_seconds::double precision), 0),
+    max(answered_at),
+    now()
+from public.user_answers
+group by student_id
+on conflict (student_id) do update set
+    total_answered = excluded.total_answered,
+    correct_count = excluded.correct_count,
+    total_time_seconds = excluded.total_time_seconds,
+    last_active = excluded.last_active,
+    updated_at = now();
+
+commit;
@@ -1,5 +1,5 @@
 // ---------------------- Supabase Setup ----------------------
-import { supabase } from "../utils/supabaseClient.js";
+import { supabase, authHeaders } from "../utils/supabaseClient.js";
 
 // ---------------------- Progress Management ----------------------
 class ProgressManager {
@@ -215,17 +215,23 @@ class ProgressManager {
     const { data: { session } } = await supabase.auth.getSession();
     const studentId = session?.user?.id || null;
     if (studentId) {
-      const { error: insertError } = await supabase
-        .from('user_answers')
-        .insert([{
-          student_id: studentId,
-          main_question_id: question.id,
-          is_correct: isCorrect,
-          time_taken_seconds: timeSpent,
-          difficulty: question.difficulty,
-          // add sub_question_id if you have it, otherwise leave as null
-        }]);
-      if (insertError) {
+      // Goes through the app so the dashboard's running summary counts it
+      try {
+        const response = await fetch(`/api/students/${encodeURIComponent(studentId)}/answers`, {
+          method: 'POST',
+          headers: await authHeaders({ 'Content-Type': 'application/json' }),
+          body: JSON.stringify({
+            main_question_id: question.id,
+            is_correct: isCorrect,
+            time_taken_seconds: timeSpent,
+            difficulty: question.difficulty,
+            // add sub_question_id if you have it, otherwise leave as null
+          })
+        });
+        if (!response.ok) {
+          console.error('Error inserting into user_answers:', await response.text());
+        }
+      } catch (insertError) {
         console.error('Error inserting into user_answers:', insertError);
       }
     }
@@ -378,12 +384,11 @@ async function fetchUserScaffoldLevel() {
     const { data: { session } } = await supabase.auth.getSession();
     const studentId = session?.user?.id || null;
     if (!studentId) return 0;
-    const { data: userProfile, error } = await supabase
-      .from('user_profiles')
-      .select('scaffold_level')
-      .eq('id', studentId)
-      .single();
-    if (error) return 0;
+    const response = await fetch(`/api/students/${encodeURIComponent(studentId)}/profile`, {
+      headers: await authHeaders()
+    });
+    if (!response.ok) return 0;
+    const userProfile = await response.json();
     return typeof userProfile?.scaffold_level === 'number' ? userProfile.scaffold_level : 0;
   } catch (_) {
     return 0;
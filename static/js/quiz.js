@@ -1,5 +1,5 @@
 ﻿// ---------------------- Supabase Setup ----------------------
-import { supabase } from "../utils/supabaseClient.js";
+import { supabase, authHeaders } from "../utils/supabaseClient.js";
 
 // Generate or retrieve user ID for tracking
 function getCurrentUserId() {
@@ -65,12 +65,20 @@ document.addEventListener('DOMContentLoaded', function() {
                 return;
             }
 
-            // Always check the database first to get the user's actual scaffold level
-            const { data: userProfile, error } = await supabase
-                .from('user_profiles')
-                .select('scaffold_level')
-                .eq('id', studentId)
-                .single();
+            // Always check the server first to get the user's actual scaffold level
+            // (served from its profile cache, which scaffold updates keep current)
+            let userProfile = null;
+            let error = null;
+            try {
+                const response = await fetch(`/api/students/${encodeURIComponent(studentId)}/profile`, {
+                    headers: await authHeaders()
+                });
+                const body = await response.json();
+                if (response.ok) userProfile = body;
+                else error = new Error(body.error || response.statusText);
+            } catch (fetchError) {
+                error = fetchError;
+            }
 
             if (error) {
                 console.error('❌ Error fetching user scaffold level:', error);
@@ -135,101 +143,10 @@ document.addEventListener('DOMContentLoaded', function() {
         return selectedHint;
     }
 
-    // Function to calculate ability score based on performance
-    function calculateAbilityScore() {
-        const attempts = (difficultyProgressData && difficultyProgressData.mainQuestionAttempts) || [];
-        if (attempts.length === 0) return 0;
-
-        // Prefer explicit metrics on difficultyProgressData if present
-        let accuracy = (typeof difficultyProgressData?.accuracy === 'number') ? difficultyProgressData.accuracy : null;
-        let hintUsage = (typeof difficultyProgressData?.hintUsage === 'number') ? difficultyProgressData.hintUsage : null;
-        let mistakes = (typeof difficultyProgressData?.mistakes === 'number') ? difficultyProgressData.mistakes : null;
-
-        // If any metric is missing, try to compute reasonable fallbacks from attempts
-        if (accuracy === null || hintUsage === null || mistakes === null) {
-            let totalSub = 0;
-            let correctSubs = 0;
-            let totalHintsCount = 0;
-            let attemptsWithHint = 0;
-            let mistakesSum = 0;
-            let perfectRounds = 0;
-
-            for (const a of attempts) {
-                // Sub-question level counts if available
-                const total = (typeof a.totalCount === 'number') ? a.totalCount
-                            : (typeof a.totalSubQuestions === 'number') ? a.totalSubQuestions
-                            : null;
-                const correct = (typeof a.correctCount === 'number') ? a.correctCount
-                            : (typeof a.correctSubQuestions === 'number') ? a.correctSubQuestions
-                            : null;
-
-                if (total != null) totalSub += total;
-                if (correct != null) correctSubs += (correct != null ? correct : 0);
-
-                // mistakes per attempt if available
-                if (typeof a.mistakes === 'number') {
-                    mistakesSum += a.mistakes;
-                } else if (total != null && correct != null) {
-                    mistakesSum += Math.max(0, total - correct);
-                } else {
-                    // fallback: if we know if the attempt was perfect or not
-                    if (a.isPerfect) {
-                        // zero mistakes for perfect
-                    } else {
-                        // count 1 mistake for a non-perfect attempt as a conservative fallback
-                        mistakesSum += 1;
-                    }
-                }
-
-                // hint usage: either numeric hintsUsed or boolean flags
-                if (typeof a.hintsUsed === 'number') {
-                    totalHintsCount += a.hintsUsed;
-                    if (a.hintsUsed > 0) attemptsWithHint++;
-                } else if (a.hintUsed || a.usedHint || a.hints) {
-                    attemptsWithHint++;
-                    totalHintsCount += 1;
-                }
-
-                if (a.isPerfect) perfectRounds++;
-            }
-
-            // Compute accuracy fallback: prefer sub-question accuracy, else use perfect-round ratio
-            if (accuracy === null) {
-                if (totalSub > 0) {
-                    accuracy = correctSubs / totalSub;
-                } else {
-                    accuracy = attempts.length > 0 ? (perfectRounds / attempts.length) : 0;
-                }
-            }
-
-            // Compute hintUsage fallback as fraction of attempts where a hint was used
-            if (hintUsage === null) {
-                hintUsage = attempts.length > 0 ? (attemptsWithHint / attempts.length) : 0;
-                // if we have totalHintsCount and totalSub, normalize to average hints per attempt (optional)
-                // but the rule expects a proportion, so fraction-of-attempts-with-hint is reasonable
-            }
-
-            // Compute mistakes fallback as total mistakes across attempts
-            if (mistakes === null) {
-                mistakes = mistakesSum;
-            }
-        }
-
-        // Apply the requested rule-set:
-        // if Accuracy >= 0.8 and HintUsage < 0.3 and Mistakes <= 2 → ability = 1
-        // else if Accuracy < 0.5 or HintUsage > 0.5 or Mistakes >= 5 → ability = -1
-        // else → ability = 0
-        if (accuracy >= 0.75 && hintUsage < 0.3 && mistakes <= 2) {
-            return 1;
-        } else if (accuracy < 0.5 || hintUsage > 0.5 || mistakes >= 5) {
-            return -1;
-        } else {
-            return 0;
-        }
-    }
-
-    // Function to insert user progress data into database
-    async function insertUserProgress(difficulty) {
+    // Finish a difficulty round in one request: the server computes accuracy, hint usage
+    // and ability, inserts user_progress, predicts and stores the scaffold level, and
+    // returns the new level so we don't have to wait and re-read user_profiles
+    async function finishRound(difficulty) {
         try {
             const { data: { session } } = await supabase.auth.getSession();
             const studentId = session?.user?.id || null;
@@ -239,87 +156,46 @@ document.addEventListener('DOMContentLoaded', function() {
                 return;
             }
 
-            // Calculate metrics - accuracy as decimal (0-1) with 3 decimal places
-            const accuracy = difficultyProgressData.totalMainQuestions > 0 
-                ? parseFloat(((difficultyProgressData.correctMainQuestions / difficultyProgressData.totalMainQuestions)).toFixed(3))
-                : 0;
-            
-            // Calculate hint usage as percentage (0-1), capped at 1.00 with 3 decimal places
-            const hintUsagePercentage = difficultyProgressData.totalMainQuestions > 0 
-                ? Math.min(1.00, parseFloat((difficultyProgressData.hintUsageCount / difficultyProgressData.totalMainQuestions).toFixed(3)))
-                : 0;
-            
-            const abilityScore = calculateAbilityScore();
-
-            const progressRecord = {
+            const roundRecord = {
                 student_id: studentId,
-                accuracy: accuracy,
-                hint_usage: hintUsagePercentage,  // Now storing as percentage (0-1)
-                mistake: difficultyProgressData.mistakeCount,
-                ability: abilityScore,
                 difficulty: difficulty.toLowerCase(),
-                correct_answers: difficultyProgressData.correctMainQuestions,
+                total_main_questions: difficultyProgressData.totalMainQuestions,
+                correct_main_questions: difficultyProgressData.correctMainQuestions,
+                hint_usage_count: difficultyProgressData.hintUsageCount,
+                mistake_count: difficultyProgressData.mistakeCount,
                 points: difficultyProgressData.points || 0,
+                attempts: difficultyProgressData.mainQuestionAttempts,
                 last_updated: new Date().toISOString()
             };
 
-            console.log(`Inserting progress data for ${difficulty}:`, progressRecord);
-
-            // Insert new record for each difficulty completion
-            const { error: insertError } = await supabase
-                .from('user_progress')
-                .insert(progressRecord);
-
-            if (insertError) {
-                console.error('❌ Error inserting user progress:', insertError);
-            } else {
-                console.log('✅ Successfully inserted user progress data.');
-                
-                // Call ML prediction endpoint to update scaffold level
-                await predictAndUpdateScaffoldLevel(studentId, accuracy, hintUsagePercentage, difficultyProgressData.mistakeCount, abilityScore, difficulty.toLowerCase());
-            }
+            console.log(`Finishing ${difficulty} round:`, roundRecord);
 
-        } catch (err) {
-            console.error('Exception in insertUserProgress:', err);
-        }
-    }
-
-    // Function to call ML prediction and update scaffold level
-    async function predictAndUpdateScaffoldLevel(studentId, accuracy, hintUsagePercentage, mistakeCount, ability, difficulty) {
-        try {
-            console.log('🤖 Calling ML prediction for scaffold level...');
-            
-            const predictionData = {
-                student_id: studentId,
-                accuracy: accuracy,
-                hint_usage: hintUsagePercentage,  // Now passing percentage (0-1)
-                mistake_count: mistakeCount,
-                ability: ability,
-                difficulty: difficulty
-            };
-
-            console.log('Prediction data:', predictionData);
-
-            const response = await fetch('/predict-scaffold-level', {
+            const response = await fetch('/api/rounds/finish', {
                 method: 'POST',
-                headers: {
+                headers: await authHeaders({
                     'Content-Type': 'application/json',
-                },
-                body: JSON.stringify(predictionData)
+                }),
+                body: JSON.stringify(roundRecord)
             });
-
             const result = await response.json();
 
-            if (result.success) {
-                console.log(`✅ Scaffold level updated to: ${result.scaffold_level}`);
-                // Optionally show a notification to the user
-                // You can add a UI notification here if desired
+            if (!response.ok || !result.success) {
+                console.error('❌ Error finishing round:', result.error);
+                await fetchUserScaffoldLevel();
+                return;
+            }
+
+            console.log('✅ Successfully inserted user progress data:', result.progress);
+            if (result.scaffold_level !== null && typeof result.scaffold_level !== 'undefined') {
+                userScaffoldLevel = result.scaffold_level;
+                console.log(`✅ Scaffold level ${result.predicted ? 'updated to' : 'kept at'}: ${userScaffoldLevel}`);
             } else {
-                console.error('❌ Failed to update scaffold level:', result.error);
+                await fetchUserScaffoldLevel();
             }
 
         } catch (err) {
-            console.error('❌ Error calling ML prediction:', err);
+            console.error('Exception in finishRound:', err);
+            await fetchUserScaffoldLevel();
         }
     }
 
@@ -569,63 +445,30 @@ document.addEventListener('DOMContentLoaded', function() {
     }
 
     async function fetchQuestions(difficulty) {
-        console.log(`Fetching ${difficulty} questions from database...`);
+        console.log(`Fetching ${difficulty} questions from server...`);
         try {
-            // Build case-insensitive difficulty variants including synonyms
-            const base = (difficulty || '').toLowerCase();
-            const variantsMap = {
-                easy: ['Easy','easy','EASY'],
-                medium: ['Medium','medium','MEDIUM','Average','average','AVERAGE'],
-                hard: ['Hard','hard','HARD','Difficult','difficult','DIFFICULT']
-            };
-            const diffVariants = variantsMap[base] || [difficulty, base, base.toUpperCase(), base.charAt(0).toUpperCase() + base.slice(1)];
-            let query = supabase
-                .from('main_questions')
-                .select('*')
-                .in('difficulty', diffVariants)
-                .order('id', { ascending: true })
-                .limit(100);
-            // Exclude usedQuestionIds only when there are any
+            // The server returns the whole main -> sub -> hint tree in one response,
+            // normalizes difficulty synonyms and skips questions we've already used
+            const params = new URLSearchParams({ difficulty: difficulty || '' });
             if (Array.isArray(usedQuestionIds) && usedQuestionIds.length > 0) {
-                query = query.not('id', 'in', `(${usedQuestionIds.join(',')})`);
+                params.set('exclude', usedQuestionIds.join(','));
             }
-            const { data: mains, error: mainErr } = await query;
+            const response = await fetch(`/api/questions?${params.toString()}`);
+            const result = await response.json();
 
-            if (mainErr) {
-                console.error('❌ Error fetching main questions:', mainErr);
-                alert('Error fetching main questions: ' + mainErr.message);
+            if (!response.ok) {
+                console.error('❌ Error fetching questions:', result.error);
+                alert('Error fetching main questions: ' + (result.error || response.statusText));
                 return [];
             }
 
-            console.log(`✅ Successfully fetched ${mains?.length || 0} main questions`);
-
-            if (!mains || mains.length === 0) {
-                console.log(`No more new ${difficulty} questions found. Resetting used questions list and re-fetching.`);
+            if (result.reset) {
+                console.log(`No more new ${difficulty} questions found. Resetting used questions list.`);
                 usedQuestionIds = [];
-                // Re-fetch without the 'not in' filter if no new questions are found
-                return fetchQuestions(difficulty);
             }
 
-            // For each main_question, fetch its sub_questions and hints
-            for (const mq of mains) {
-                console.log(`Fetching sub-questions for main question ${mq.id}...`);
-                const { data: subs, error: subErr } = await supabase
-                    .from('sub_questions')
-                    .select('*, hints(first_hint, second_hint, third_hint)')
-                    .eq('main_question_id', mq.id)
-                    .order('step_number', { ascending: true });
-
-                if (subErr) {
-                    console.error(`❌ Error fetching sub-questions for main question ${mq.id}:`, subErr);
-                    alert('Error fetching sub-questions: ' + subErr.message);
-                    mq.sub_questions = [];
-                } else {
-                    mq.sub_questions = subs || [];
-                    console.log(`✅ Found ${mq.sub_questions.length} sub-questions for main question ${mq.id}`);
-                }
-            }
-
-            console.log('✅ All questions fetched successfully');
+            const mains = result.questions || [];
+            console.log(`✅ Successfully fetched ${mains.length} main questions`);
             return mains;
 
         } catch (err) {
@@ -980,9 +823,7 @@ document.addEventListener('DOMContentLoaded', function() {
 
             console.log('Attempting to insert answer record:', answerRecord);
 
-            const { error: insertError } = await supabase
-                .from('user_answers')
-                .insert(answerRecord);
+            const insertError = await postAnswerRecord(answerRecord);
 
             if (insertError) {
                 console.error('❌ Error inserting into user_answers table:', insertError);
@@ -1079,6 +920,26 @@ document.addEventListener('DOMContentLoaded', function() {
     }
 
 
+    // Insert a user_answers row through the app so the dashboard summary stays current.
+    // Resolves to null on success or an { message } error like the Supabase client
+    async function postAnswerRecord(answerRecord) {
+        if (!answerRecord.student_id) {
+            return { message: 'No signed-in student; row violates row-level security policy' };
+        }
+        try {
+            const response = await fetch(`/api/students/${encodeURIComponent(answerRecord.student_id)}/answers`, {
+                method: 'POST',
+                headers: await authHeaders({ 'Content-Type': 'application/json' }),
+                body: JSON.stringify(answerRecord)
+            });
+            if (response.ok) return null;
+            const body = await response.json().catch(() => ({}));
+            return { message: body.error || response.statusText };
+        } catch (err) {
+            return { message: err.message };
+        }
+    }
+
     // --- Insert answer into user_answers on submit ---
     let submitLocked = false;
     submitBtn.addEventListener('click', async function(e) {
@@ -1157,7 +1018,7 @@ document.addEventListener('DOMContentLoaded', function() {
                         const answerRecord = { ...answer, student_id: session?.user?.id || null };
                         delete answerRecord.stored_locally;
                         delete answerRecord.timestamp;
-                        const { error: syncError } = await supabase.from('user_answers').insert(answerRecord);
+                        const syncError = await postAnswerRecord(answerRecord);
                         if (!syncError) {
                             console.log('✅ Successfully synced answer from localStorage');
                         } else {
@@ -1215,23 +1076,17 @@ document.addEventListener('DOMContentLoaded', function() {
                 const { data: { session } } = await supabase.auth.getSession();
                 const studentId = session?.user?.id || null;
                 if (studentId) {
-                    const [{ data: latestProgress }, userProfile] = await Promise.all([
-                        supabase
-                            .from('user_progress')
-                            .select('accuracy, difficulty')
-                            .eq('student_id', studentId)
-                            .order('last_updated', { ascending: false })
-                            .limit(1)
-                            .maybeSingle(),
-                        supabase
-                            .from('user_profiles')
-                            .select('scaffold_level')
-                            .eq('id', studentId)
-                            .single()
-                    ]);
+                    const { data: latestProgress } = await supabase
+                        .from('user_progress')
+                        .select('accuracy, difficulty')
+                        .eq('student_id', studentId)
+                        .order('last_updated', { ascending: false })
+                        .limit(1)
+                        .maybeSingle();
                     const lastDiff = latestProgress?.difficulty || 'easy';
                     const accDec = typeof latestProgress?.accuracy === 'number' ? latestProgress.accuracy : 0;
-                    const scaffold = typeof userProfile?.scaffold_level === 'number' ? userProfile.scaffold_level : 0;
+                    // fetchUserScaffoldLevel() above already loaded the level
+                    const scaffold = typeof userScaffoldLevel === 'number' ? userScaffoldLevel : 0;
                     const rec = (() => {
                         const accPct = accDec * 100;
                         const canAdjust = (scaffold === 0 || scaffold === 1) && accPct >= 75;
@@ -1363,31 +1218,20 @@ document.addEventListener('DOMContentLoaded', function() {
 
                 let showDifficultyModal = false;
                 let passedThisDifficulty = false;
-                if (currentDifficulty === 'Easy' && score >= easyGoal) {
-                    // Insert progress data for Easy difficulty
-                    await insertUserProgress('Easy');
-                    passedThisDifficulty = true;
-                    showDifficultyModal = true;
-                } else if (currentDifficulty === 'Medium' && score >= mediumGoal) {
-                    // Insert progress data for Medium difficulty
-                    await insertUserProgress('Medium');
-                    passedThisDifficulty = true;
-                    showDifficultyModal = true;
-                } else if (currentDifficulty === 'Hard' && score >= hardGoal) {
-                    // Insert progress data for Hard difficulty
-                    await insertUserProgress('Hard');
+                if ((currentDifficulty === 'Easy' && score >= easyGoal) ||
+                    (currentDifficulty === 'Medium' && score >= mediumGoal) ||
+                    (currentDifficulty === 'Hard' && score >= hardGoal)) {
                     passedThisDifficulty = true;
                     showDifficultyModal = true;
                 }
 
                 if (showDifficultyModal) {
-                    // Show a loading popup while we wait for the model update and scaffold fetch
+                    // Show a loading popup while the round is saved and the scaffold level predicted
                     showLoadingPopupFn(true, 'Preparing results...');
                     // yield a frame so the browser can render the popup before we start awaiting
                     await new Promise((res) => requestAnimationFrame(res));
-                    // Wait for model update then fetch scaffold level to decide next step
-                    await new Promise(resolve => setTimeout(resolve, 2500));
-                    await fetchUserScaffoldLevel();
+                    // Insert progress data for this difficulty; the response carries the new scaffold level
+                    await finishRound(currentDifficulty);
                     // Hide loading popup before showing the difficulty modal
                     showLoadingPopupFn(false);
 
@@ -1488,7 +1332,7 @@ document.addEventListener('DOMContentLoaded', function() {
                     const currentGoal = currentDifficulty === 'Easy' ? easyGoal : (currentDifficulty === 'Medium' ? mediumGoal : hardGoal);
                     if (difficultyProgressData.totalMainQuestions >= 10 && score < currentGoal) {
                         // Insert progress on failure to trigger ML prediction
-                        await insertUserProgress(currentDifficulty);
+                        await finishRound(currentDifficulty);
                         if (attemptsLimitModal) attemptsLimitModal.style.display = 'flex';
                         return; // Stop progressing further
                     }
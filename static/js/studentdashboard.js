@@ -1,5 +1,5 @@
 // --- Supabase Client Initialization ---
-import { supabase } from '../utils/supabaseClient.js';
+import { supabase, authHeaders } from '../utils/supabaseClient.js';
 
 document.addEventListener('DOMContentLoaded', async () => {
     const nameElement = document.getElementById('studentFullName');
@@ -30,12 +30,19 @@ document.addEventListener('DOMContentLoaded', async () => {
         }
         currentUser = user;
 
-        // Get profile from user_profiles, including class_id
-        const { data: profile, error: profileError } = await supabase
-            .from('user_profiles')
-            .select('full_name, email')
-            .eq('id', currentUser.id)
-            .single();
+        // Get the profile (full_name, email) from the server's profile cache
+        let profile = null;
+        let profileError = null;
+        try {
+            const response = await fetch(`/api/students/${encodeURIComponent(currentUser.id)}/profile`, {
+                headers: await authHeaders()
+            });
+            const body = await response.json();
+            if (response.ok) profile = body;
+            else profileError = new Error(body.error || response.statusText);
+        } catch (fetchError) {
+            profileError = fetchError;
+        }
 
         if (profileError || !profile) {
             alert('⚠️ Could not load student profile. Please ensure your profile exists.');
@@ -44,18 +51,31 @@ document.addEventListener('DOMContentLoaded', async () => {
         }
 
         // --- Academic Summary Stats ---
+        // One summary request feeds both the academic summary and total time spent;
+        // the server keeps running aggregates instead of sending every answer row
+        let studentSummaryPromise = null;
+        function fetchStudentSummary(userId) {
+            if (!studentSummaryPromise) {
+                studentSummaryPromise = authHeaders()
+                    .then((headers) => fetch(`/api/students/${encodeURIComponent(userId)}/summary`, { headers }))
+                    .then(async (response) => {
+                        const body = await response.json();
+                        if (!response.ok) throw new Error(body.error || response.statusText);
+                        return body;
+                    });
+            }
+            return studentSummaryPromise;
+        }
+
         async function updateAcademicSummary(userId) {
             const totalItemsElem = document.getElementById('totalItemsAnswered');
             const avgScoreElem = document.getElementById('averageScore');
             const lastActiveElem = document.getElementById('lastActive');
 
-            // Fetch all answers for this user (now from user_answers)
-            const { data: answers, error } = await supabase
-                .from('user_answers')
-                .select('is_correct, answered_at')
-                .eq('student_id', userId);
-
-            if (error) {
+            let summary;
+            try {
+                summary = await fetchStudentSummary(userId);
+            } catch (error) {
                 if (totalItemsElem) totalItemsElem.textContent = '-';
                 if (avgScoreElem) avgScoreElem.textContent = '-';
                 if (lastActiveElem) lastActiveElem.textContent = '-';
@@ -64,29 +84,18 @@ document.addEventListener('DOMContentLoaded', async () => {
             }
 
             // Total items answered
-            const totalAnswered = answers.length;
+            const totalAnswered = summary.total_answered || 0;
             if (totalItemsElem) totalItemsElem.textContent = totalAnswered;
 
             // Average score (percentage of correct answers)
-            const correctCount = answers.filter(a => a.is_correct === true).length;
-            const avgScore = totalAnswered > 0 ? Math.round((correctCount / totalAnswered) * 100) : 0;
-            if (avgScoreElem) avgScoreElem.textContent = totalAnswered > 0 ? `${avgScore}%` : '-';
+            if (avgScoreElem) avgScoreElem.textContent = totalAnswered > 0 ? `${summary.average_score}%` : '-';
 
             // Last active (latest answered_at)
             let lastActive = '-';
-            if (answers.length > 0) {
-                // answered_at may be null or undefined, so filter those out
-                const validDates = answers
-                    .map(a => a.answered_at)
-                    .filter(date => !!date)
-                    .sort();
-                if (validDates.length > 0) {
-                    // Get the latest date
-                    const latest = validDates[validDates.length - 1];
-                    // Format as readable date
-                    const dateObj = new Date(latest);
-                    lastActive = dateObj.toLocaleString(undefined, { year: 'numeric', month: 'short', day: 'numeric', hour: '2-digit', minute: '2-digit' });
-                }
+            if (summary.last_active) {
+                // Format as readable date
+                const dateObj = new Date(summary.last_active);
+                lastActive = dateObj.toLocaleString(undefined, { year: 'numeric', month: 'short', day: 'numeric', hour: '2-digit', minute: '2-digit' });
             }
             if (lastActiveElem) lastActiveElem.textContent = lastActive;
         }
@@ -146,24 +155,25 @@ document.addEventListener('DOMContentLoaded', async () => {
             });
         }
 
-        // Load leaderboard directly from the leaderboard table (server-side aggregated)
-        async function loadLeaderboard() {
+        // Load leaderboard from the app's ranked copy of the leaderboard table.
+        // The response has an ETag + no-cache, so the browser revalidates and an
+        // unchanged board comes back as a bodyless 304 served from its HTTP cache
+        async function loadLeaderboard(userId) {
             try {
                 // Fetch top 10 by total_points descending
-                const { data, error } = await supabase
-                    .from('leaderboard')
-                    .select('student_id, username, total_points, average_accuracy')
-                    .order('total_points', { ascending: false })
-                    .limit(10);
+                const params = new URLSearchParams({ limit: '10' });
+                if (userId) params.set('student_id', userId);
+                const response = await fetch(`/api/leaderboard?${params.toString()}`);
+                const body = await response.json();
 
-                if (error) {
-                    console.error('Error fetching leaderboard table:', error);
+                if (!response.ok) {
+                    console.error('Error fetching leaderboard:', body.error || response.statusText);
                     renderLeaderboard([]);
                     return;
                 }
 
                 // Normalize rows if necessary and render
-                const leaderboard = (data || []).map(r => ({
+                const leaderboard = (body.top || []).map(r => ({
                     id: r.student_id,
                     username: r.username,
                     total_points: r.total_points,
@@ -271,22 +281,9 @@ document.addEventListener('DOMContentLoaded', async () => {
 
         async function updateTotalTimeSpent(userId) {
             try {
-                const { data, error } = await supabase
-                    .from('user_answers')
-                    .select('time_taken_seconds')
-                    .eq('student_id', userId);
-                if (error) {
-                    console.error('Error fetching time_taken_seconds:', error);
-                    const el = document.getElementById('totalTimeSpent');
-                    if (el) el.textContent = '-';
-                    return;
-                }
-                const total = (data || []).reduce((sum, row) => {
-                    const v = Number(row?.time_taken_seconds);
-                    return sum + (Number.isFinite(v) ? v : 0);
-                }, 0);
+                const summary = await fetchStudentSummary(userId);
                 const el = document.getElementById('totalTimeSpent');
-                if (el) el.textContent = formatDuration(total);
+                if (el) el.textContent = formatDuration(Math.round(summary.total_time_seconds || 0));
             } catch (e) {
                 console.error('Failed to compute total time spent:', e);
                 const el = document.getElementById('totalTimeSpent');
@@ -0,0 +1,109 @@
+# student_auth.py
+"""
+Caller identity for the student endpoints.
+
+The app reads and writes with the service-role key, which bypasses row
+level security, so every per-student endpoint must check who is calling.
+Browsers send their Supabase access token as `Authorization: Bearer`; the
+token is verified with Supabase Auth and the resulting user id is cached
+in a bounded LRU until shortly before the token itself expires, so a page
+that makes several calls costs one verification, not one per call.
+"""
+import base64
+import json
+import threading
+import time
+from collections import OrderedDict
+
+from instrumentation import get_logger
+
+log = get_logger()
+
+
+def _token_expiry(token: str):
+    """`exp` claim of a JWT (unverified; only used to bound caching of a verified token)."""
+    try:
+        payload = token.split('.')[1]
+        claims = json.loads(base64.urlsafe_b64decode(payload + '=' * (-len(payload) % 4)))
+        return float(claims['exp'])
+    except (IndexError, KeyError, TypeError, ValueError):
+        return None
+
+
+def bearer_token(headers) -> str:
+    """Token from an `Authorization: Bearer <token>` header, or None."""
+    scheme, _, token = (headers.get('Authorization') or '').partition(' ')
+    if scheme.lower() != 'bearer' or not token.strip():
+        return None
+    return token.strip()
+
+
+class AccessTokenVerifier:
+    """
+    Resolves Supabase access tokens to user ids.
+
+    Args:
+        client: Supabase client (its auth.get_user verifies a token)
+        maxsize: int - verified tokens kept before the least recently used is evicted
+        ttl: float - longest a verified token is trusted without asking Supabase again
+    """
+
+    def __init__(self, client, maxsize: int = 10000, ttl: float = 300.0):
+        self.client = client
+        self.maxsize = max(1, int(maxsize))
+        self.ttl = float(ttl)
+        self._entries = OrderedDict()   # token -> (trusted_until, user_id)
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.verifications = 0
+        self.rejections = 0
+
+    def user_id(self, token: str):
+        """
+        Return the id of the user the token belongs to.
+
+        Args:
+            token: str - Supabase access token (JWT)
+
+        Returns:
+            str - auth user id, or None if the token is missing, invalid or expired
+        """
+        if not token:
+            return None
+        now = time.time()
+        with self._lock:
+            entry = self._entries.get(token)
+            if entry is not None and entry[0] > now:
+                self._entries.move_to_end(token)
+                self.hits += 1
+                return entry[1]
+        try:
+            self.verifications += 1
+            response = self.client.auth.get_user(token)
+            user = getattr(response, 'user', None)
+        except Exception as e:
+            log.warning(f"⚠️ Access token rejected: {e}")
+            user = None
+        if user is None:
+            self.rejections += 1
+            return None
+        trusted_until = now + self.ttl
+        expires_at = _token_expiry(token)
+        if expires_at is not None:
+            trusted_until = min(trusted_until, expires_at)
+        with self._lock:
+            self._entries[token] = (trusted_until, str(user.id))
+            self._entries.move_to_end(token)
+            while len(self._entries) > self.maxsize:
+                self._entries.popitem(last=False)
+        return str(user.id)
+
+    def stats(self) -> dict:
+        with self._lock:
+            cached = len(self._entries)
+        return {
+            'cached': cached,
+            'hits': self.hits,
+            'verifications': self.verifications,
+            'rejections': self.rejections,
+        }
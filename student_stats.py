@@ -0,0 +1,266 @@
+# student_stats.py
+"""
+Running per-student answer aggregates for the dashboard.
+
+The counters live in the student_answer_stats table, which an insert
+trigger on user_answers keeps current (sql/student_answer_stats.sql), so
+loading a summary reads one row no matter how long the history is. Each
+process keeps a bounded LRU of recently read summaries and folds in the
+answers it records itself; answers recorded by other workers show up when
+an entry expires. A full recount of the history is only done on request
+(?rebuild=1, admin only); the rebuild_student_answer_stats function
+recounts and rewrites the stored counters in one statement, so it cannot
+overwrite an increment made by a concurrent answer.
+"""
+import math
+import threading
+import time
+from collections import OrderedDict
+from dataclasses import dataclass, asdict, fields
+from datetime import datetime, timezone
+
+from instrumentation import get_logger
+
+log = get_logger()
+
+
+# Rows per page when rebuilding from user_answers
+HISTORY_PAGE_SIZE = 1000
+
+
+@dataclass
+class StudentSummary:
+    total_answered: int = 0
+    correct_count: int = 0
+    total_time_seconds: float = 0.0
+    last_active: str = None      # ISO-8601 answered_at of the latest answer
+
+    def add(self, is_correct: bool, time_taken_seconds, answered_at: str = None):
+        self.total_answered += 1
+        if is_correct is True:
+            self.correct_count += 1
+        try:
+            seconds = float(time_taken_seconds)
+        except (TypeError, ValueError):
+            seconds = 0.0
+        if math.isfinite(seconds):
+            self.total_time_seconds += seconds
+        if answered_at and (self.last_active is None or _is_later(answered_at, self.last_active)):
+            self.last_active = answered_at
+
+    @classmethod
+    def from_row(cls, row: dict):
+        """Summary from a student_answer_stats row."""
+        return cls(
+            total_answered=int(row.get('total_answered') or 0),
+            correct_count=int(row.get('correct_count') or 0),
+            total_time_seconds=float(row.get('total_time_seconds') or 0.0),
+            last_active=row.get('last_active'),
+        )
+
+    def to_dict(self) -> dict:
+        summary = asdict(self)
+        summary['average_score'] = (
+            round(self.correct_count / self.total_answered * 100) if self.total_answered else None
+        )
+        return summary
+
+
+def _is_later(a: str, b: str) -> bool:
+    try:
+        parsed_a = datetime.fromisoformat(str(a).replace('Z', '+00:00'))
+        parsed_b = datetime.fromisoformat(str(b).replace('Z', '+00:00'))
+    except ValueError:
+        return str(a) > str(b)
+    if parsed_a.tzinfo is None:
+        parsed_a = parsed_a.replace(tzinfo=timezone.utc)
+    if parsed_b.tzinfo is None:
+        parsed_b = parsed_b.replace(tzinfo=timezone.utc)
+    return parsed_a > parsed_b
+
+
+def utc_now_iso() -> str:
+    return datetime.now(timezone.utc).isoformat()
+
+
+class StudentSummaryStore:
+    """
+    Per-student aggregates over user_answers, backed by student_answer_stats.
+
+    Args:
+        client: Supabase client used to insert answers and read counters/history
+        ttl: float - seconds a cached summary is served before its counters are
+            re-read, which picks up answers recorded by other workers (<= 0 never expires)
+        table: str - answers table
+        stats_table: str - trigger-maintained counters table
+        rebuild_function: str - database function that recounts and rewrites one student's counters
+        maxsize: int - summaries kept before the least recently used is evicted
+        lock_stripes: int - per-student locks are striped over this many locks
+    """
+
+    def __init__(self, client, ttl: float = 60.0, table: str = 'user_answers',
+                 stats_table: str = 'student_answer_stats', rebuild_function: str = 'rebuild_student_answer_stats',
+                 maxsize: int = 10000, lock_stripes: int = 64):
+        self.client = client
+        self.ttl = float(ttl)
+        self.table = table
+        self.stats_table = stats_table
+        self.rebuild_function = rebuild_function
+        self.maxsize = max(1, int(maxsize))
+        self._summaries = OrderedDict()     # student_id -> (loaded_at, StudentSummary)
+        self._locks = [threading.Lock() for _ in range(max(1, int(lock_stripes)))]
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.loads = 0
+        self.rebuilds = 0
+        self.increments = 0
+        self.evictions = 0
+        self.fallbacks = 0
+
+    def _student_lock(self, student_id) -> threading.Lock:
+        return self._locks[hash(student_id) % len(self._locks)]
+
+    def _fresh(self, entry) -> bool:
+        return entry is not None and (self.ttl <= 0 or time.monotonic() - entry[0] < self.ttl)
+
+    def _store(self, student_id, summary: StudentSummary):
+        """Insert or refresh an entry (lock held)."""
+        self._summaries[student_id] = (time.monotonic(), summary)
+        self._summaries.move_to_end(student_id)
+        while len(self._summaries) > self.maxsize:
+            self._summaries.popitem(last=False)
+            self.evictions += 1
+
+    def _load_stats(self, student_id) -> StudentSummary:
+        response = (
+            self.client.table(self.stats_table)
+            .select(', '.join(f.name for f in fields(StudentSummary)))
+            .eq('student_id', student_id)
+            .limit(1)
+            .execute()
+        )
+        # No row yet: the trigger creates it with the student's first answer
+        return StudentSummary.from_row(response.data[0]) if response.data else StudentSummary()
+
+    def _load_history(self, student_id) -> StudentSummary:
+        summary = StudentSummary()
+        start = 0
+        while True:
+            response = (
+                self.client.table(self.table)
+                .select('is_correct, time_taken_seconds, answered_at')
+                .eq('student_id', student_id)
+                .order('answered_at')
+                .range(start, start + HISTORY_PAGE_SIZE - 1)
+                .execute()
+            )
+            rows = response.data or []
+            for row in rows:
+                summary.add(row.get('is_correct'), row.get('time_taken_seconds'), row.get('answered_at'))
+            if len(rows) < HISTORY_PAGE_SIZE:
+                return summary
+            start += HISTORY_PAGE_SIZE
+
+    def _rebuild_stats(self, student_id) -> StudentSummary:
+        response = self.client.rpc(self.rebuild_function, {'p_student_id': student_id}).execute()
+        row = response.data[0] if isinstance(response.data, list) else response.data
+        return StudentSummary.from_row(row or {})
+
+    def load(self, student_id) -> StudentSummary:
+        """Read a student's counters (one row), falling back to a history scan if the table is unavailable."""
+        with self._student_lock(student_id):
+            try:
+                summary = self._load_stats(student_id)
+                loaded = 'loads'
+            except Exception as e:
+                log.warning(f"⚠️ {self.stats_table} unavailable ({e}); summing answer history for {student_id}")
+                summary = self._load_history(student_id)
+                loaded = 'fallbacks'
+            with self._lock:
+                self._store(student_id, summary)
+                setattr(self, loaded, getattr(self, loaded) + 1)
+            return summary
+
+    def rebuild(self, student_id) -> StudentSummary:
+        """
+        Recount a student's aggregates from their full answer history and repair the stored counters.
+
+        The recount and the write happen in the database (rebuild_function); if it
+        is unavailable the history is summed here and nothing is written back.
+        """
+        with self._student_lock(student_id):
+            try:
+                summary = self._rebuild_stats(student_id)
+            except Exception as e:
+                log.warning(f"⚠️ Could not repair {self.stats_table} for {student_id} ({e}); summing answer history")
+                summary = self._load_history(student_id)
+            with self._lock:
+                self._store(student_id, summary)
+                self.rebuilds += 1
+            return summary
+
+    def get(self, student_id, rebuild: bool = False) -> dict:
+        """
+        Args:
+            student_id: user id
+            rebuild: bool - rescan the full answer history instead of reading the counters
+
+        Returns:
+            dict - total_answered, correct_count, total_time_seconds, last_active, average_score
+        """
+        if rebuild:
+            return self.rebuild(student_id).to_dict()
+        with self._lock:
+            entry = self._summaries.get(student_id)
+            if self._fresh(entry):
+                self._summaries.move_to_end(student_id)
+                self.hits += 1
+                return entry[1].to_dict()
+        return self.load(student_id).to_dict()
+
+    def record_answer(self, answer: dict) -> dict:
+        """
+        Insert one user_answers row and fold it into the cached summary.
+
+        The database trigger updates the stored counters; the cached copy is
+        bumped under the student's lock, so a concurrent load either sees the
+        new row or the increment, never both.
+
+        Returns:
+            dict - the inserted row as returned by Supabase (or the submitted record)
+        """
+        student_id = answer['student_id']
+        with self._student_lock(student_id):
+            response = self.client.table(self.table).insert(answer).execute()
+            row = (response.data or [answer])[0]
+            with self._lock:
+                entry = self._summaries.get(student_id)
+                if self._fresh(entry):
+                    entry[1].add(
+                        row.get('is_correct'),
+                        row.get('time_taken_seconds'),
+                        row.get('answered_at') or utc_now_iso(),
+                    )
+                    self.increments += 1
+            return row
+
+    def invalidate(self, student_id=None):
+        with self._lock:
+            if student_id is None:
+                self._summaries.clear()
+            else:
+                self._summaries.pop(student_id, None)
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {
+                'students': len(self._summaries),
+                'maxsize': self.maxsize,
+                'ttl_seconds': self.ttl,
+                'hits': self.hits,
+                'loads': self.loads,
+                'rebuilds': self.rebuilds,
+                'fallbacks': self.fallbacks,
+                'increments': self.increments,
+                'evictions': self.evictions,
+            }
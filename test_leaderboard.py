@@ -0,0 +1,49 @@
+import bisect
+import random
+
+import pytest
+
+from leaderboard import RankedSkipList
+
+
+def _check_against(ranked, oracle):
+    assert len(ranked) == len(oracle)
+    assert ranked.first(len(oracle) + 1) == oracle
+    for i, key in enumerate(oracle):
+        assert ranked.rank(key) == i
+
+
+def test_skip_list_matches_sorted_list_oracle():
+    rng = random.Random(7)
+    ranked, oracle = RankedSkipList(seed=1), []
+    for _ in range(2000):
+        if oracle and rng.random() < 0.4:
+            key = oracle[rng.randrange(len(oracle))]
+            ranked.remove(key)
+            oracle.remove(key)
+        else:
+            key = (-rng.randrange(50), -rng.random(), f"s{rng.randrange(10 ** 6)}")
+            if key in oracle:
+                continue
+            ranked.insert(key)
+            bisect.insort(oracle, key)
+        probe = (-rng.randrange(50), -rng.random(), '')
+        assert ranked.rank(probe) == bisect.bisect_left(oracle, probe)
+    _check_against(ranked, oracle)
+    assert ranked.first(10) == oracle[:10]
+
+
+def test_from_sorted_matches_incremental_inserts():
+    keys = sorted((-(i * 37 % 101), f"s{i}") for i in range(500))
+    ranked = RankedSkipList.from_sorted(keys, seed=3)
+    _check_against(ranked, keys)
+    ranked.insert((-1000, 'top'))
+    ranked.remove(keys[250])
+    _check_against(ranked, [(-1000, 'top')] + keys[:250] + keys[251:])
+
+
+def test_remove_missing_key_raises():
+    ranked = RankedSkipList.from_sorted([(0, 'a'), (1, 'b')])
+    with pytest.raises(KeyError):
+        ranked.remove((0, 'z'))
+    assert len(ranked) == 2
@@ -0,0 +1,95 @@
+import os
+
+import numpy as np
+import pytest
+from sklearn.preprocessing import OneHotEncoder, StandardScaler
+
+# Import the app without loading the real model or starting background threads
+os.environ.setdefault('SCAFFOLD_MODEL_LOAD', 'manual')
+os.environ.setdefault('SCAFFOLD_WRITE_BEHIND', '0')
+os.environ.setdefault('SCAFFOLD_MODEL_RELOAD_INTERVAL', '0')
+os.environ.setdefault('SCAFFOLD_PROFILE_STORE', 'memory')
+
+import app  # noqa: E402
+from scaffold_scoring import DEFAULT_SCAFFOLD_LEVEL  # noqa: E402
+
+
+class AccuracyModel:
+    """Level 0 above 50% accuracy, 1 otherwise (accuracy is the first scaled column)."""
+
+    def __init__(self):
+        self.calls = 0
+
+    def predict(self, X):
+        self.calls += 1
+        return np.where(X[:, 0] > 0, 0, 1)
+
+
+class BrokenModel:
+    def predict(self, X):
+        raise RuntimeError('model exploded')
+
+
+def _components(model):
+    scaler = StandardScaler().fit([[0.0, 0.0, 0.0, -1.0], [1.0, 1.0, 10.0, 1.0]])
+    encoder = OneHotEncoder(categories=[['Easy', 'Medium', 'Hard']], sparse_output=False)
+    encoder.fit([['Easy'], ['Medium'], ['Hard']])
+    return model, scaler, encoder
+
+
+@pytest.fixture
+def model(monkeypatch):
+    model = AccuracyModel()
+    monkeypatch.setattr(app, 'ml_components', _components(model))
+    monkeypatch.setattr(app, 'prediction_cache', None)
+    monkeypatch.setattr(app, 'prediction_batcher', None)
+    return model
+
+
+def _row(accuracy, difficulty='Easy'):
+    return {'accuracy': accuracy, 'hint_usage': 0.2, 'mistake_count': 1, 'ability': 0, 'difficulty': difficulty}
+
+
+def test_scores_dict_and_sequence_rows_in_one_pass(model):
+    rows = [_row(0.9), (0.1, 0.0, 3, -1, 'hard'), _row(0.8, 'Medium')]
+
+    assert app.predict_scaffold_levels(rows) == [0, 1, 0]
+    assert model.calls == 1
+
+
+def test_difficulty_aliases_are_accepted(model):
+    rows = [_row(0.9, 'Average'), _row(0.9, 'Difficult'), _row(0.9, ' easy ')]
+
+    assert app._score_feature_rows(rows) == ([0, 0, 0], [True, True, True])
+
+
+def test_invalid_rows_get_the_default_and_are_not_scored(model):
+    rows = [_row(0.9), _row(0.9, 'weird'), _row('lots'), {'accuracy': None}, _row(0.1)]
+
+    levels, scored = app._score_feature_rows(rows)
+
+    assert levels == [0, DEFAULT_SCAFFOLD_LEVEL, DEFAULT_SCAFFOLD_LEVEL, DEFAULT_SCAFFOLD_LEVEL, 1]
+    assert scored == [True, False, False, False, True]
+    assert app.predict_scaffold_levels(rows) == levels
+
+
+def test_all_invalid_rows_skip_the_model(model):
+    assert app._score_feature_rows([_row(0.5, 'weird')]) == ([DEFAULT_SCAFFOLD_LEVEL], [False])
+    assert model.calls == 0
+
+
+def test_empty_input():
+    assert app.predict_scaffold_levels([]) == []
+
+
+def test_model_failure_and_missing_model_fall_back_to_the_default(monkeypatch):
+    monkeypatch.setattr(app, 'prediction_cache', None)
+    monkeypatch.setattr(app, 'prediction_batcher', None)
+    rows = [_row(0.9), _row(0.1)]
+
+    monkeypatch.setattr(app, 'ml_components', _components(BrokenModel()))
+    assert app._score_feature_rows(rows) == ([DEFAULT_SCAFFOLD_LEVEL] * 2, [False, False])
+
+    monkeypatch.setattr(app, 'ml_components', None)
+    assert app._score_feature_rows(rows) == ([DEFAULT_SCAFFOLD_LEVEL] * 2, [False, False])
+    assert app.predict_scaffold_level(0.9, 0.2, 1, 0, 'Easy') is None
@@ -0,0 +1,82 @@
+import json
+import os
+import subprocess
+import sys
+
+from write_behind import InMemoryProfileStore, ScaffoldLevelWriteBehind
+
+
+def _dead_pid() -> int:
+    child = subprocess.Popen([sys.executable, '-c', 'pass'])
+    child.wait()
+    return child.pid
+
+
+def _write_spill(path, entries, torn_tail=False):
+    with open(path, 'w', encoding='utf-8') as f:
+        for student_id, level in entries:
+            f.write(json.dumps({'id': student_id, 'scaffold_level': level}) + '\n')
+        if torn_tail:
+            f.write('{"id": "half')
+
+
+def test_replays_spill_file_of_a_dead_process(tmp_path):
+    dead = _dead_pid()
+    _write_spill(tmp_path / f'scaffold_levels-{dead}-aaaa1111.jsonl',
+                 [('s1', 0), ('s2', 1), ('s1', 2)], torn_tail=True)
+    store = InMemoryProfileStore({'s1': 1, 's2': 2})
+
+    writer = ScaffoldLevelWriteBehind(store, spill_dir=str(tmp_path)).start()
+    writer.close()
+
+    assert store.levels == {'s1': 2, 's2': 1}
+    assert writer.recovered == 3
+    assert os.listdir(tmp_path) == []
+
+
+def test_replays_claim_abandoned_by_a_dead_recoverer(tmp_path):
+    dead = _dead_pid()
+    _write_spill(tmp_path / f'scaffold_levels-1-bbbb2222.jsonl.claimed-{dead}', [('s3', 0)])
+    store = InMemoryProfileStore()
+
+    writer = ScaffoldLevelWriteBehind(store, spill_dir=str(tmp_path)).start()
+    writer.close()
+
+    assert store.levels == {'s3': 0}
+    assert os.listdir(tmp_path) == []
+
+
+def test_leaves_live_processes_spill_files_alone(tmp_path):
+    live = os.getppid()
+    spill = tmp_path / f'scaffold_levels-{live}-cccc3333.jsonl'
+    claimed = tmp_path / f'scaffold_levels-1-dddd4444.jsonl.claimed-{live}'
+    _write_spill(spill, [('s4', 0)])
+    _write_spill(claimed, [('s5', 0)])
+    store = InMemoryProfileStore()
+
+    writer = ScaffoldLevelWriteBehind(store, spill_dir=str(tmp_path)).start()
+    writer.close()
+
+    assert store.levels == {}
+    assert writer.recovered == 0
+    assert sorted(os.listdir(tmp_path)) == sorted([spill.name, claimed.name])
+
+
+def test_recovered_writes_survive_a_second_crash(tmp_path):
+    dead = _dead_pid()
+    _write_spill(tmp_path / f'scaffold_levels-{dead}-eeee5555.jsonl', [('s6', 1)])
+
+    class FailingStore(InMemoryProfileStore):
+        def update_scaffold_levels(self, levels):
+            raise ConnectionError('database unavailable')
+
+    writer = ScaffoldLevelWriteBehind(FailingStore(), spill_dir=str(tmp_path), flush_interval=60).start()
+    # Simulate a crash: the recovered entry must already be in this process's own spill file
+    own_spill = [name for name in os.listdir(tmp_path) if not name.startswith(f'scaffold_levels-{dead}-')]
+    assert own_spill == [f'scaffold_levels-{os.getpid()}-{writer._spill_token}.jsonl']
+    with open(tmp_path / own_spill[0], encoding='utf-8') as f:
+        assert [json.loads(line) for line in f] == [{'id': 's6', 'scaffold_level': 1}]
+
+    writer.store = InMemoryProfileStore()
+    writer.close()
+    assert writer.store.levels == {'s6': 1}
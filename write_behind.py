@@ -0,0 +1,526 @@
+# write_behind.py
+"""
+Write-behind pipeline for scaffold-level updates.
+
+Request handlers enqueue (student_id, scaffold_level) and return
+immediately. A background thread coalesces repeated updates for the same
+student (latest level wins) and flushes them to a pluggable store in bulk
+updates, on a size or time trigger, retrying with exponential backoff.
+Every enqueued update is also appended to a per-process spill file so a
+crashed process's pending writes are replayed by the next one to start.
+
+Stores only UPDATE existing profile rows: an id without a profile is
+reported back as unknown rather than inserting a phantom row. If a bulk
+write keeps failing, the batch is retried one student at a time so a bad
+id cannot hold everyone else's levels hostage; an id that keeps failing
+while others succeed is moved to a dead-letter file.
+"""
+import glob
+import json
+import os
+import sqlite3
+import threading
+import time
+import uuid
+
+from instrumentation import DB_ERRORS, get_logger, span
+
+
+log = get_logger()
+
+
+class WriteQueueFull(Exception):
+    """Raised when the pending-update buffer is at capacity."""
+
+
+# Updates that kept failing, one JSON line each, next to the spill files
+DEAD_LETTER_NAME = 'scaffold_levels-dead_letters.jsonl'
+
+
+# ----------------------
+# Storage backends
+# ----------------------
+
+class SupabaseProfileStore:
+    """Writes scaffold levels to the Supabase user_profiles table."""
+
+    def __init__(self, client, table: str = 'user_profiles'):
+        self.client = client
+        self.table = table
+
+    def update_scaffold_levels(self, levels: dict, chunk_size: int = 100) -> set:
+        """
+        UPDATE existing profiles in bulk: one statement per (level, chunk of ids).
+
+        There are only three levels, so a batch costs a handful of statements,
+        and an id without a profile row simply matches nothing.
+
+        Returns:
+            set - ids that matched a profile row
+        """
+        by_level = {}
+        for sid, level in levels.items():
+            by_level.setdefault(level, []).append(sid)
+        updated = set()
+        for level, ids in by_level.items():
+            for start in range(0, len(ids), chunk_size):
+                response = (
+                    self.client.table(self.table)
+                    .update({'scaffold_level': level})
+                    .in_('id', ids[start:start + chunk_size])
+                    .execute()
+                )
+                updated.update(row['id'] for row in response.data or [])
+        return updated
+
+    def update_scaffold_level(self, student_id, level: int):
+        # Plain UPDATE: unknown ids are a no-op rather than a partial insert
+        self.client.table(self.table).update({'scaffold_level': level}).eq('id', student_id).execute()
+
+    def get_scaffold_level(self, student_id):
+        response = self.client.table(self.table).select('scaffold_level').eq('id', student_id).execute()
+        return response.data[0]['scaffold_level'] if response.data else None
+
+    def get_scaffold_levels(self, student_ids, chunk_size: int = 100) -> dict:
+        """Current levels of the students that have a profile row (chunked to keep URLs short)."""
+        student_ids = list(student_ids)
+        levels = {}
+        for start in range(0, len(student_ids), chunk_size):
+            response = (
+                self.client.table(self.table)
+                .select('id, scaffold_level')
+                .in_('id', student_ids[start:start + chunk_size])
+                .execute()
+            )
+            levels.update({row['id']: row['scaffold_level'] for row in response.data or []})
+        return levels
+
+
+class InMemoryProfileStore:
+    """
+    Process-local stand-in for tests and benchmarks.
+
+    Args:
+        levels: dict - initial profiles (student_id -> scaffold_level)
+        known_only: bool - behave like user_profiles and ignore ids without a profile;
+            by default every id is treated as an existing profile
+    """
+
+    def __init__(self, levels: dict = None, known_only: bool = False):
+        self.levels = dict(levels or {})
+        self.known_only = known_only
+        self.update_calls = 0
+        self._lock = threading.Lock()
+
+    def update_scaffold_levels(self, levels: dict) -> set:
+        with self._lock:
+            if self.known_only:
+                levels = {sid: level for sid, level in levels.items() if sid in self.levels}
+            self.levels.update(levels)
+            self.update_calls += 1
+            return set(levels)
+
+    def update_scaffold_level(self, student_id, level: int):
+        self.update_scaffold_levels({student_id: level})
+
+    def get_scaffold_level(self, student_id):
+        with self._lock:
+            return self.levels.get(student_id)
+
+    def get_scaffold_levels(self, student_ids) -> dict:
+        with self._lock:
+            return {sid: self.levels[sid] for sid in student_ids if sid in self.levels}
+
+
+class SQLiteProfileStore:
+    """Local SQLite stand-in for user_profiles(id, scaffold_level)."""
+
+    def __init__(self, path: str = ':memory:'):
+        self.path = path
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._lock = threading.Lock()
+        with self._lock:
+            self._conn.execute(
+                'CREATE TABLE IF NOT EXISTS user_profiles (id TEXT PRIMARY KEY, scaffold_level INTEGER)'
+            )
+            self._conn.commit()
+
+    def update_scaffold_levels(self, levels: dict, chunk_size: int = 500) -> set:
+        """UPDATE existing rows only. Returns the ids that matched a profile row."""
+        student_ids = list(levels)
+        with self._lock:
+            existing = set()
+            for start in range(0, len(student_ids), chunk_size):
+                chunk = student_ids[start:start + chunk_size]
+                existing.update(row[0] for row in self._conn.execute(
+                    f"SELECT id FROM user_profiles WHERE id IN ({','.join('?' * len(chunk))})", chunk,
+                ))
+            self._conn.executemany(
+                'UPDATE user_profiles SET scaffold_level = ? WHERE id = ?',
+                [(levels[sid], sid) for sid in existing],
+            )
+            self._conn.commit()
+        return existing
+
+    def update_scaffold_level(self, student_id, level: int):
+        self.update_scaffold_levels({student_id: level})
+
+    def get_scaffold_level(self, student_id):
+        with self._lock:
+            row = self._conn.execute(
+                'SELECT scaffold_level FROM user_profiles WHERE id = ?', (student_id,)
+            ).fetchone()
+        return row[0] if row else None
+
+    def get_scaffold_levels(self, student_ids, chunk_size: int = 500) -> dict:
+        student_ids = list(student_ids)
+        levels = {}
+        with self._lock:
+            for start in range(0, len(student_ids), chunk_size):
+                chunk = student_ids[start:start + chunk_size]
+                rows = self._conn.execute(
+                    f"SELECT id, scaffold_level FROM user_profiles WHERE id IN ({','.join('?' * len(chunk))})",
+                    chunk,
+                ).fetchall()
+                levels.update(dict(rows))
+        return levels
+
+
+def create_profile_store(kind: str, supabase_client=None, path: str = None):
+    """
+    Build a storage backend by name.
+
+    Args:
+        kind: str - 'supabase', 'sqlite' or 'memory'
+        supabase_client: Client - required for 'supabase'
+        path: str - database file for 'sqlite' (defaults to in-memory)
+    """
+    kind = (kind or 'supabase').strip().lower()
+    if kind == 'supabase':
+        return SupabaseProfileStore(supabase_client)
+    if kind == 'sqlite':
+        return SQLiteProfileStore(path or ':memory:')
+    if kind == 'memory':
+        return InMemoryProfileStore()
+    raise ValueError(f"Unknown profile store: {kind}")
+
+
+# ----------------------
+# Write-behind queue
+# ----------------------
+
+class ScaffoldLevelWriteBehind:
+    """
+    Coalescing, bounded, retrying write-behind buffer.
+
+    Args:
+        store: backend exposing update_scaffold_levels(dict) -> set of updated ids
+        flush_size: int - flush as soon as this many distinct students are pending
+        flush_interval: float - seconds between time-triggered flushes
+        max_pending: int - distinct students buffered before enqueue raises WriteQueueFull
+        max_retries: int - bulk attempts per flush before falling back to per-student writes
+        backoff_base: float - first retry delay in seconds, doubled per attempt
+        spill_dir: str - directory for crash-recovery spill files and dead letters (None disables both)
+        max_strikes: int - failed per-student writes (while others succeed) before an id is dead-lettered
+    """
+
+    def __init__(self, store, flush_size: int = 200, flush_interval: float = 0.5,
+                 max_pending: int = 10000, max_retries: int = 5, backoff_base: float = 0.2,
+                 spill_dir: str = None, max_strikes: int = 3):
+        self.store = store
+        self.flush_size = max(1, int(flush_size))
+        self.flush_interval = float(flush_interval)
+        self.max_pending = max(1, int(max_pending))
+        self.max_retries = max(1, int(max_retries))
+        self.backoff_base = float(backoff_base)
+        self.spill_dir = spill_dir
+        self.max_strikes = max(1, int(max_strikes))
+
+        self._pending = {}
+        self._strikes = {}              # student_id -> failed per-student writes
+        self._lock = threading.Lock()
+        self._wakeup = threading.Event()
+        self._flush_lock = threading.Lock()
+        self._closed = False
+        self._thread = None
+        self._pid = None
+        self._spill_file = None
+        self._spill_token = None
+
+        self.enqueued = 0
+        self.coalesced = 0
+        self.flushed = 0
+        self.flush_batches = 0
+        self.retries = 0
+        self.failures = 0
+        self.recovered = 0
+        self.unknown = 0
+        self.dead_lettered = 0
+
+    # --- spill file ---
+
+    def _spill_path(self) -> str:
+        # PID plus a per-start token: a restarted process that reuses a crashed one's PID
+        # must not append to (and later compact away) the crashed process's spill file
+        return os.path.join(self.spill_dir, f"scaffold_levels-{self._pid}-{self._spill_token}.jsonl")
+
+    def _open_spill(self):
+        if self.spill_dir is None:
+            return
+        os.makedirs(self.spill_dir, exist_ok=True)
+        self._spill_file = open(self._spill_path(), 'a', encoding='utf-8')
+
+    def _append_spill(self, student_id, level):
+        if self._spill_file is None:
+            return
+        self._spill_file.write(json.dumps({'id': student_id, 'scaffold_level': level}) + '\n')
+        self._spill_file.flush()
+
+    def _compact_spill(self):
+        """Rewrite this process's spill file with only what is still pending (lock held)."""
+        if self._spill_file is None:
+            return
+        self._spill_file.close()
+        path = self._spill_path()
+        tmp_path = path + '.tmp'
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            for sid, level in self._pending.items():
+                f.write(json.dumps({'id': sid, 'scaffold_level': level}) + '\n')
+        os.replace(tmp_path, path)
+        self._spill_file = open(path, 'a', encoding='utf-8')
+
+    @staticmethod
+    def _pid_alive(pid: int) -> bool:
+        if os.name == 'nt':
+            # os.kill(pid, 0) would terminate the process on Windows
+            import ctypes
+            handle = ctypes.windll.kernel32.OpenProcess(0x1000, False, pid)  # QUERY_LIMITED_INFORMATION
+            if not handle:
+                return False
+            ctypes.windll.kernel32.CloseHandle(handle)
+            return True
+        try:
+            os.kill(pid, 0)
+        except ProcessLookupError:
+            return False
+        except PermissionError:
+            return True
+        return True
+
+    def _recover_orphaned_spills(self) -> list:
+        """
+        Adopt spill files left behind by processes that are no longer running (lock held).
+
+        Covers both live spill files and ones a recovering process had claimed
+        (renamed to `.claimed-<pid>`) but died before replaying. Runs before this
+        process opens its own spill file, so a file carrying our PID can only come
+        from an earlier process that crashed under the same (reused) PID.
+
+        Returns:
+            list - claimed file paths; remove them once the recovered entries are in
+            this process's own spill file
+        """
+        if self.spill_dir is None:
+            return []
+        claimed_paths = []
+        candidates = (glob.glob(os.path.join(self.spill_dir, 'scaffold_levels-*.jsonl'))
+                      + glob.glob(os.path.join(self.spill_dir, 'scaffold_levels-*.jsonl.claimed-*')))
+        for path in candidates:
+            spill_path, _, claimer = path.partition('.claimed-')
+            try:
+                if claimer:
+                    owner = int(claimer)
+                else:
+                    owner = int(os.path.basename(path)[len('scaffold_levels-'):-len('.jsonl')].split('-')[0])
+            except ValueError:
+                continue  # dead letters
+            if owner != os.getpid() and self._pid_alive(owner):
+                continue
+            # Atomic claim: only one starting process wins the rename
+            claimed = f"{spill_path}.claimed-{os.getpid()}"
+            try:
+                os.rename(path, claimed)
+            except OSError:
+                continue
+            with open(claimed, encoding='utf-8') as f:
+                for line in f:
+                    try:
+                        entry = json.loads(line)
+                    except ValueError:
+                        continue  # torn final line from the crash
+                    self._pending[entry['id']] = entry['scaffold_level']
+                    self.recovered += 1
+            claimed_paths.append(claimed)
+        if self._pending:
+            log.info(f"ℹ️ Recovered {len(self._pending)} pending scaffold-level writes from spill files")
+        return claimed_paths
+
+    # --- lifecycle ---
+
+    def _ensure_worker(self):
+        # Threads do not survive fork(); each process starts its own flusher and spill file
+        if self._pid == os.getpid() and self._thread is not None and self._thread.is_alive():
+            return
+        with self._lock:
+            if self._pid == os.getpid() and self._thread is not None and self._thread.is_alive():
+                return
+            if self._pid != os.getpid():
+                # Inherited buffer belongs to the parent; it flushes its own copy
+                self._pending = {}
+                self._spill_file = None
+                self._pid = os.getpid()
+                self._spill_token = uuid.uuid4().hex[:8]
+                claimed_paths = self._recover_orphaned_spills()
+                self._open_spill()
+                if self._pending:
+                    self._compact_spill()
+                for path in claimed_paths:
+                    os.remove(path)
+            self._thread = threading.Thread(target=self._run, name="scaffold-write-behind", daemon=True)
+            self._thread.start()
+
+    def start(self):
+        self._ensure_worker()
+        return self
+
+    def close(self, timeout: float = 10.0):
+        """Stop accepting updates and drain everything pending."""
+        self._closed = True
+        self._wakeup.set()
+        if self._thread is not None and self._pid == os.getpid():
+            self._thread.join(timeout)
+        self.flush()
+        if self._spill_file is not None:
+            self._spill_file.close()
+            self._spill_file = None
+            with self._lock:
+                if not self._pending:
+                    os.remove(self._spill_path())
+
+    # --- public API ---
+
+    def enqueue(self, student_id, scaffold_level: int):
+        """
+        Buffer a scaffold-level update; newer updates for the same student replace older ones.
+
+        Raises:
+            WriteQueueFull - buffer is at capacity (caller should write synchronously)
+        """
+        if self._closed:
+            raise WriteQueueFull("Write-behind queue is closed")
+        self._ensure_worker()
+        with self._lock:
+            if student_id in self._pending:
+                self.coalesced += 1
+            elif len(self._pending) >= self.max_pending:
+                raise WriteQueueFull(f"{len(self._pending)} scaffold-level updates already pending")
+            self._pending[student_id] = scaffold_level
+            self.enqueued += 1
+            self._append_spill(student_id, scaffold_level)
+            should_flush = len(self._pending) >= self.flush_size
+        if should_flush:
+            self._wakeup.set()
+
+    def flush(self) -> int:
+        """Write everything pending now. Returns the number of students written."""
+        with self._flush_lock:
+            with self._lock:
+                batch, self._pending = self._pending, {}
+            if not batch:
+                return 0
+            for attempt in range(self.max_retries):
+                try:
+                    with span('db_update'):
+                        updated = self.store.update_scaffold_levels(batch)
+                    break
+                except Exception as e:
+                    DB_ERRORS.inc(operation='scaffold_flush')
+                    if attempt + 1 >= self.max_retries:
+                        self.failures += 1
+                        log.error(f"❌ Scaffold-level flush failed after {self.max_retries} attempts: {e}; "
+                                  f"retrying {len(batch)} students one at a time")
+                        return self._flush_individually(batch)
+                    self.retries += 1
+                    time.sleep(self.backoff_base * (2 ** attempt))
+            with self._lock:
+                self._record_written(batch, updated)
+                self._compact_spill()
+            return len(updated)
+
+    def _flush_individually(self, batch: dict) -> int:
+        """Write a batch whose bulk write keeps failing one student at a time, isolating bad ids."""
+        updated, failed = set(), {}
+        for sid, level in batch.items():
+            try:
+                with span('db_update'):
+                    updated.update(self.store.update_scaffold_levels({sid: level}))
+            except Exception:
+                DB_ERRORS.inc(operation='scaffold_flush')
+                failed[sid] = level
+        with self._lock:
+            self._record_written({sid: batch[sid] for sid in batch if sid not in failed}, updated)
+            # When nothing got through the store is down, not the ids: keep them all without a strike
+            blame = len(failed) < len(batch)
+            dead = {}
+            for sid, level in failed.items():
+                if blame:
+                    self._strikes[sid] = self._strikes.get(sid, 0) + 1
+                if self._strikes.get(sid, 0) >= self.max_strikes:
+                    dead[sid] = level
+                    self._strikes.pop(sid, None)
+                else:
+                    # Keep newer values that arrived while we were retrying
+                    self._pending.setdefault(sid, level)
+            if dead:
+                self._dead_letter(dead)
+            self._compact_spill()
+        return len(updated)
+
+    def _record_written(self, written: dict, updated: set):
+        """Account for a successful write (lock held); ids the store did not match have no profile."""
+        unknown = len(written) - len(updated)
+        if unknown:
+            self.unknown += unknown
+            log.warning(f"⚠️ {unknown} scaffold-level updates skipped: no user_profiles row")
+        for sid in written:
+            self._strikes.pop(sid, None)
+        self.flushed += len(updated)
+        self.flush_batches += 1
+
+    def _dead_letter(self, entries: dict):
+        """Stop retrying these updates and keep them for inspection (lock held)."""
+        self.dead_lettered += len(entries)
+        log.error(f"❌ Giving up on scaffold-level updates for {', '.join(map(str, entries))} "
+                  f"after {self.max_strikes} failed writes")
+        if self.spill_dir is None:
+            return
+        os.makedirs(self.spill_dir, exist_ok=True)
+        with open(os.path.join(self.spill_dir, DEAD_LETTER_NAME), 'a', encoding='utf-8') as f:
+            for sid, level in entries.items():
+                f.write(json.dumps({'id': sid, 'scaffold_level': level, 'at': time.time()}) + '\n')
+
+    def _run(self):
+        while not self._closed:
+            self._wakeup.wait(self.flush_interval)
+            self._wakeup.clear()
+            try:
+                self.flush()
+            except Exception as e:
+                log.error(f"❌ Write-behind flusher error: {e}")
+
+    def stats(self) -> dict:
+        with self._lock:
+            pending = len(self._pending)
+        return {
+            'pending': pending,
+            'max_pending': self.max_pending,
+            'enqueued': self.enqueued,
+            'coalesced': self.coalesced,
+            'flushed': self.flushed,
+            'flush_batches': self.flush_batches,
+            'retries': self.retries,
+            'failures': self.failures,
+            'recovered': self.recovered,
+            'unknown': self.unknown,
+            'dead_lettered': self.dead_lettered,
+        }